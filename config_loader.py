@@ -3,6 +3,7 @@ Configuration loader for database backup system.
 Supports both environment variables and YAML configuration files.
 """
 import os
+import functools
 from typing import Dict, List, Optional, Any
 from pathlib import Path
 
@@ -10,12 +11,32 @@ from pathlib import Path
 try:
     import yaml
     YAML_AVAILABLE = True
+    # Prefer the libyaml-backed loader when PyYAML was built with it
+    Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 except ImportError:
     YAML_AVAILABLE = False
+    Loader = None
 
 from models.database_config import MongoDBConfig, PostgreSQLConfig
 
 
+# Database type -> (config class, default port, extra fields with defaults)
+_DB_TYPES = {
+    'postgresql': (PostgreSQLConfig, 5432, {}),
+    'mongodb': (MongoDBConfig, 27017, {'uri': ''}),
+}
+
+
+@functools.lru_cache(maxsize=8)
+def _parse_yaml_cached(path: str, mtime_ns: int) -> Dict[str, Any]:
+    """Parse a YAML file; cached per (path, mtime) so repeated loads in one process are free.
+
+    The returned dict is shared between callers and must be treated as read-only.
+    """
+    with open(path, 'r') as f:
+        return yaml.load(f, Loader=Loader)
+
+
 class ConfigLoader:
     """Loads database configurations from environment variables or YAML files."""
     
@@ -34,15 +55,19 @@ class ConfigLoader:
         
         return self._load_from_yaml()
     
-    
-    def _load_from_yaml(self) -> List[Dict[str, Any]]:
-        """Load database configurations from YAML file."""
+    def _load_raw(self) -> Dict[str, Any]:
+        """Return the parsed YAML file, reparsing only when it changes on disk."""
         if not YAML_AVAILABLE:
             raise ValueError("YAML module not available. Install with: pip install pyyaml")
         
+        # Key on the resolved path so relative paths and symlinks to one file share a parse
+        path = os.path.realpath(self.config_file)
+        return _parse_yaml_cached(path, os.stat(path).st_mtime_ns)
+    
+    def _load_from_yaml(self) -> List[Dict[str, Any]]:
+        """Load database configurations from YAML file."""
         try:
-            with open(self.config_file, 'r') as f:
-                config = yaml.safe_load(f)
+            config = self._load_raw()
             
             databases = []
             
@@ -50,69 +75,49 @@ class ConfigLoader:
             if 'pgsql' in config:
                 pgsql_configs = config['pgsql']
                 if isinstance(pgsql_configs, list):
-                    # Multiple PostgreSQL databases
-                    for i, pgsql in enumerate(pgsql_configs):
-                        pgsql['type'] = 'postgresql'
-                        # Use explicit ID if provided, otherwise generate one
-                        if 'id' not in pgsql:
-                            pgsql['id'] = f"pgsql_{i}"  # Fallback to auto-generated ID
-                        databases.append(pgsql)
+                    # Multiple PostgreSQL databases; use explicit ID if provided, otherwise generate one
+                    databases.extend(
+                        {**pgsql, 'type': 'postgresql', 'id': pgsql.get('id', f"pgsql_{i}")}
+                        for i, pgsql in enumerate(pgsql_configs)
+                    )
             
             # Load MongoDB databases
             if 'mongodb' in config:
                 mongo_configs = config['mongodb']
                 if isinstance(mongo_configs, list):
-                    # Multiple MongoDB databases
-                    for i, mongo in enumerate(mongo_configs):
-                        mongo['type'] = 'mongodb'
-                        # Use explicit ID if provided, otherwise generate one
-                        if 'id' not in mongo:
-                            mongo['id'] = f"mongodb_{i}"  # Fallback to auto-generated ID
-                        databases.append(mongo)
+                    # Multiple MongoDB databases; use explicit ID if provided, otherwise generate one
+                    databases.extend(
+                        {**mongo, 'type': 'mongodb', 'id': mongo.get('id', f"mongodb_{i}")}
+                        for i, mongo in enumerate(mongo_configs)
+                    )
             
             return databases
             
         except Exception as e:
             raise ValueError(f"Failed to load configuration from {self.config_file}: {e}")
     
-    def load_ftp_config(self) -> Optional[Dict[str, Any]]:
-        """Load FTP configuration from YAML file."""
-        if not YAML_AVAILABLE:
-            return None
-        
+    def _load_section(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return one top-level section of the YAML file, or None if it cannot be loaded."""
         try:
-            with open(self.config_file, 'r') as f:
-                config = yaml.safe_load(f)
-            
-            return config.get('ftp')
+            return self._load_raw().get(name)
         except Exception:
             return None
     
+    def load_ftp_config(self) -> Optional[Dict[str, Any]]:
+        """Load FTP configuration from YAML file."""
+        return self._load_section('ftp')
+    
+    def load_s3_config(self) -> Optional[Dict[str, Any]]:
+        """Load S3 configuration from YAML file."""
+        return self._load_section('s3')
+    
     def load_telegram_config(self) -> Optional[Dict[str, Any]]:
         """Load Telegram configuration from YAML file."""
-        if not YAML_AVAILABLE:
-            return None
-        
-        try:
-            with open(self.config_file, 'r') as f:
-                config = yaml.safe_load(f)
-            
-            return config.get('telegram')
-        except Exception:
-            return None
+        return self._load_section('telegram')
     
     def load_backup_config(self) -> Optional[Dict[str, Any]]:
         """Load backup configuration from YAML file."""
-        if not YAML_AVAILABLE:
-            return None
-        
-        try:
-            with open(self.config_file, 'r') as f:
-                config = yaml.safe_load(f)
-            
-            return config.get('backup')
-        except Exception:
-            return None
+        return self._load_section('backup')
     
     def create_database_configs(self) -> List[tuple]:
         """Create database configuration objects and return (config, controller_id) tuples."""
@@ -124,27 +129,17 @@ class ConfigLoader:
                 # Use the unique ID from the config, or generate one
                 controller_id = db_config.get('id', f"{db_config['type']}_{db_config['database']}")
                 
-                if db_config['type'] == 'postgresql':
-                    config = PostgreSQLConfig(
-                        host=db_config['host'],
-                        port=db_config.get('port', 5432),
-                        database=db_config['database'],
-                        username=db_config.get('username', ''),
-                        password=db_config.get('password', '')
-                    )
-                
-                elif db_config['type'] == 'mongodb':
-                    config = MongoDBConfig(
-                        host=db_config['host'],
-                        port=db_config.get('port', 27017),
-                        database=db_config['database'],
-                        username=db_config.get('username', ''),
-                        password=db_config.get('password', ''),
-                        uri=db_config.get('uri', '')
-                    )
-                
-                else:
+                if db_config['type'] not in _DB_TYPES:
                     raise ValueError(f"Unsupported database type: {db_config['type']}")
+                config_class, default_port, extras = _DB_TYPES[db_config['type']]
+                config = config_class(
+                    host=db_config['host'],
+                    port=db_config.get('port', default_port),
+                    database=db_config['database'],
+                    username=db_config.get('username', ''),
+                    password=db_config.get('password', ''),
+                    **{key: db_config.get(key, default) for key, default in extras.items()}
+                )
                 
                 configs.append((config, controller_id))
                 
@@ -1,16 +1,26 @@
 """
 Backup manager for orchestrating backup operations.
 """
+import asyncio
 import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import List, Optional, Dict, Any
-from pathlib import Path
+from typing import List, Optional, Dict, Any, Tuple
 
-from controllers.base_controller import BaseBackupController
+from controllers.base_controller import BaseBackupController, StreamUploader
 from controllers.mongodb_controller import MongoDBBackupController
 from controllers.postgresql_controller import PostgreSQLBackupController
 from models.database_config import DatabaseConfig, MongoDBConfig, PostgreSQLConfig, BackupConfig
-from models.backup_result import BackupResult, BackupSummary
+from models.backup_result import BackupResult, BackupStatus, BackupSummary, BackupFileInfo, BACKUP_FILE_EXTENSIONS
+from services.chunk_store import ChunkStore, MANIFEST_SUFFIX
+
+# Upper bound on concurrent dump processes started by backup_all_databases
+MAX_PARALLEL_BACKUPS = 8
+
+# Upper bound on concurrent retention sweeps started by cleanup_all_backups
+MAX_PARALLEL_CLEANUPS = 4
 
 
 class BackupManager:
@@ -22,33 +32,51 @@ class BackupManager:
         self.logger = logging.getLogger(self.__class__.__name__)
         self.controllers: Dict[str, BaseBackupController] = {}
         self.backup_history: List[BackupResult] = []
+        self._history_lock = threading.Lock()
+        
+        # Content-addressed store shared by all databases, so chunks repeated across backups are kept once
+        self.chunk_store = ChunkStore(os.path.join(backup_config.backup_dir, "chunks")) if backup_config.dedup else None
+        
+        # Running aggregates for get_backup_summary, folded in from backup_history
+        self._summarized_history: Optional[List[BackupResult]] = None
+        self._summarized_count = 0
+        self._success_count = 0
+        self._size_total = 0
+        self._duration_sum = 0.0
+        self._duration_count = 0
+        self._last_backup: Optional[BackupResult] = None
     
     def add_database(self, db_config: DatabaseConfig, controller_id: Optional[str] = None) -> str:
         """Add a database to backup management."""
         if controller_id is None:
-            controller_id = f"{db_config.db_type.value}_{db_config.database}"
+            controller_id = f"{db_config.db_type}_{db_config.database}"
         
-        if db_config.db_type.value == "mongodb":
+        if db_config.db_type == "mongodb":
             controller = MongoDBBackupController(db_config, self.backup_config)
-        elif db_config.db_type.value == "postgresql":
+        elif db_config.db_type == "postgresql":
             controller = PostgreSQLBackupController(db_config, self.backup_config)
         else:
             raise ValueError(f"Unsupported database type: {db_config.db_type}")
         
         self.controllers[controller_id] = controller
-        self.logger.info(f"Added database controller: {controller_id}")
+        self.logger.info("Added database controller: %s", controller_id)
         return controller_id
     
-    def backup_database(self, controller_id: str) -> BackupResult:
-        """Backup a specific database."""
+    def backup_database(self, controller_id: str, upload: Optional[StreamUploader] = None,
+                        incremental: bool = False) -> BackupResult:
+        """Backup a specific database, streaming it to upload instead of the backup directory if given."""
         if controller_id not in self.controllers:
             raise ValueError(f"Controller not found: {controller_id}")
         
         controller = self.controllers[controller_id]
-        backup_result = controller.create_backup()
+        if incremental:
+            backup_result = controller.create_incremental_backup(upload=upload)
+        else:
+            backup_result = controller.create_backup(upload=upload)
         
         # Add to history
-        self.backup_history.append(backup_result)
+        with self._history_lock:
+            self.backup_history.append(backup_result)
         
         # Clean up old backups
         controller.cleanup_old_backups()
@@ -56,28 +84,62 @@ class BackupManager:
         return backup_result
     
     def backup_all_databases(self) -> List[BackupResult]:
-        """Backup all managed databases."""
-        results = []
-        
-        for controller_id in self.controllers:
-            try:
-                result = self.backup_database(controller_id)
-                results.append(result)
-            except Exception as e:
-                self.logger.error(f"Failed to backup {controller_id}: {e}")
-                # Create failed result
-                failed_result = BackupResult(
-                    backup_id=f"failed_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-                    database_type=controller_id.split('_')[0],
-                    database_name=controller_id.split('_', 1)[1],
-                    status=BackupResult.BackupStatus.FAILED,
-                    start_time=datetime.now(),
-                    end_time=datetime.now(),
-                    error_message=str(e)
-                )
-                results.append(failed_result)
+        """Backup all managed databases concurrently, returning results in registration order."""
+        if not self.controllers:
+            return []
         
-        return results
+        results: Dict[str, BackupResult] = {}
+        max_workers = min(len(self.controllers), self._max_parallel_backups())
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self.backup_database, controller_id): controller_id
+                for controller_id in self.controllers
+            }
+            
+            for future in as_completed(futures):
+                controller_id = futures[future]
+                try:
+                    results[controller_id] = future.result()
+                except Exception as e:
+                    results[controller_id] = self._failed_result(controller_id, e)
+        
+        return [results[controller_id] for controller_id in self.controllers]
+    
+    async def backup_all_databases_async(self) -> List[BackupResult]:
+        """Backup all managed databases concurrently from an event loop, returning results in registration order."""
+        semaphore = asyncio.Semaphore(self._max_parallel_backups())
+        
+        async def backup(controller_id: str) -> BackupResult:
+            async with semaphore:
+                try:
+                    return await asyncio.to_thread(self.backup_database, controller_id)
+                except Exception as e:
+                    return self._failed_result(controller_id, e)
+        
+        return list(await asyncio.gather(*(backup(controller_id) for controller_id in self.controllers)))
+    
+    def _max_parallel_backups(self) -> int:
+        """How many databases are backed up at once; 1 runs them one after another."""
+        return self.backup_config.max_parallel_backups or MAX_PARALLEL_BACKUPS
+    
+    def _failed_result(self, controller_id: str, error: Exception) -> BackupResult:
+        """Build the result for a backup that raised instead of returning a result."""
+        self.logger.error("Failed to backup %s: %s", controller_id, error)
+        # Create failed result from the controller's own config rather than its ID,
+        # which may be user-defined (e.g. 'pgsql-01') and need not encode type or name
+        db_config = self.controllers[controller_id].db_config
+        failed_at = datetime.now()
+        result = BackupResult(
+            backup_id=f"failed_{failed_at.strftime('%Y%m%d_%H%M%S')}",
+            database_type=db_config.db_type,
+            database_name=db_config.database,
+            status=BackupStatus.FAILED,
+            start_time=failed_at,
+            error_message=str(error)
+        )
+        result.finalize(failed_at)
+        return result
     
     def restore_database(self, controller_id: str, backup_file_path: str) -> bool:
         """Restore a specific database from backup."""
@@ -85,78 +147,173 @@ class BackupManager:
             raise ValueError(f"Controller not found: {controller_id}")
         
         controller = self.controllers[controller_id]
+        if backup_file_path.endswith(MANIFEST_SUFFIX):
+            if not self.chunk_store:
+                raise ValueError("Restoring a deduplicated backup requires dedup to be enabled")
+            with self.chunk_store.reassembled(backup_file_path) as archive_path:
+                return controller.restore_backup(archive_path)
         return controller.restore_backup(backup_file_path)
     
-    def get_backup_summary(self) -> BackupSummary:
-        """Get summary of backup operations."""
-        if not self.backup_history:
-            return BackupSummary(
-                total_backups=0,
-                successful_backups=0,
-                failed_backups=0,
-                total_size_bytes=0,
-                average_duration_seconds=0.0,
-                last_backup_time=None
-            )
+    def restore_databases(self, restores: Dict[str, str]) -> Dict[str, bool]:
+        """Restore several databases from {controller_id: backup_file_path}, creating missing ones in one batch per server."""
+        servers: Dict[tuple, List[PostgreSQLBackupController]] = {}
+        for controller_id in restores:
+            controller = self.controllers.get(controller_id)
+            if isinstance(controller, PostgreSQLBackupController):
+                db_config = controller.db_config
+                servers.setdefault((db_config.host, db_config.port, db_config.username), []).append(controller)
         
-        successful_backups = sum(1 for r in self.backup_history if r.is_successful)
-        failed_backups = len(self.backup_history) - successful_backups
-        total_size = sum(r.backup_size_bytes or 0 for r in self.backup_history)
+        for controllers in servers.values():
+            if controllers[0].ensure_databases_exist([c.db_config.database for c in controllers]):
+                for controller in controllers:
+                    controller.database_ensured = True
         
-        durations = [r.duration_seconds for r in self.backup_history if r.duration_seconds is not None]
-        avg_duration = sum(durations) / len(durations) if durations else 0.0
+        results = {}
+        try:
+            for controller_id, backup_file_path in restores.items():
+                try:
+                    results[controller_id] = self.restore_database(controller_id, backup_file_path)
+                except Exception as e:
+                    self.logger.error("Failed to restore %s: %s", controller_id, e)
+                    results[controller_id] = False
+        finally:
+            # Restore paths that never checked must not carry the flag over to a later restore
+            for controllers in servers.values():
+                for controller in controllers:
+                    controller.database_ensured = False
+        return results
+    
+    def deduplicate_backup(self, backup_result: BackupResult):
+        """Replace a backup's local archive with chunks in the chunk store and a manifest."""
+        if not self.chunk_store or not backup_result.is_successful or not backup_result.backup_file_path:
+            return
         
-        last_backup = max(self.backup_history, key=lambda r: r.start_time) if self.backup_history else None
+        manifest_path = self.chunk_store.store(backup_result.backup_file_path)
+        os.unlink(backup_result.backup_file_path)
+        backup_result.backup_file_path = manifest_path
+    
+    def _update_summary_counters(self):
+        """Fold results added to backup_history since the last summary into the running aggregates."""
+        history = self.backup_history
+        if history is not self._summarized_history or len(history) < self._summarized_count:
+            # History was replaced or truncated, start over
+            self._summarized_history = history
+            self._summarized_count = 0
+            self._success_count = 0
+            self._size_total = 0
+            self._duration_sum = 0.0
+            self._duration_count = 0
+            self._last_backup = None
         
-        return BackupSummary(
-            total_backups=len(self.backup_history),
-            successful_backups=successful_backups,
-            failed_backups=failed_backups,
-            total_size_bytes=total_size,
-            average_duration_seconds=avg_duration,
-            last_backup_time=last_backup.start_time if last_backup else None
-        )
+        # Index only the new tail, in a single pass and without copying it
+        for i in range(self._summarized_count, len(history)):
+            result = history[i]
+            if result.is_successful:
+                self._success_count += 1
+            self._size_total += result.backup_size_bytes or 0
+            duration = result.duration_seconds
+            if duration is not None:
+                self._duration_sum += duration
+                self._duration_count += 1
+            if self._last_backup is None or result.start_time > self._last_backup.start_time:
+                self._last_backup = result
+        
+        self._summarized_count = len(history)
     
-    def list_backup_files(self, controller_id: Optional[str] = None) -> List[Dict[str, Any]]:
-        """List available backup files."""
-        backup_dir = Path(self.backup_config.backup_dir)
+    def get_backup_summary(self) -> BackupSummary:
+        """Get summary of backup operations."""
+        with self._history_lock:
+            self._update_summary_counters()
+            
+            if not self._summarized_count:
+                return BackupSummary(
+                    total_backups=0,
+                    successful_backups=0,
+                    failed_backups=0,
+                    total_size_bytes=0,
+                    average_duration_seconds=0.0,
+                    last_backup_time=None
+                )
+            
+            avg_duration = self._duration_sum / self._duration_count if self._duration_count else 0.0
+            
+            return BackupSummary(
+                total_backups=self._summarized_count,
+                successful_backups=self._success_count,
+                failed_backups=self._summarized_count - self._success_count,
+                total_size_bytes=self._size_total,
+                average_duration_seconds=avg_duration,
+                last_backup_time=self._last_backup.start_time if self._last_backup else None
+            )
+    
+    def list_backup_files(self, controller_id: Optional[str] = None) -> List[BackupFileInfo]:
+        """List available backup files, newest first."""
         backup_files = []
         
-        for backup_file in backup_dir.glob("*.tar.gz"):
-            try:
-                stat = backup_file.stat()
-                file_info = {
-                    'filename': backup_file.name,
-                    'path': str(backup_file),
-                    'size_bytes': stat.st_size,
-                    'created_time': datetime.fromtimestamp(stat.st_ctime),
-                    'modified_time': datetime.fromtimestamp(stat.st_mtime)
-                }
+        if not os.path.isdir(self.backup_config.backup_dir):
+            return backup_files
+        
+        # Filter by controller if specified
+        controller = self.controllers.get(controller_id) if controller_id else None
+        prefix = f"backup_{controller_id}_" if controller_id and not controller else ""
+        
+        with os.scandir(self.backup_config.backup_dir) as entries:
+            for entry in entries:
+                name = entry.name
+                if controller:
+                    if not controller.owns_backup_file(name):
+                        continue
+                elif not name.endswith(BACKUP_FILE_EXTENSIONS) or not name.startswith(prefix):
+                    continue
                 
-                # Filter by controller if specified
-                if controller_id:
-                    if controller_id in backup_file.name:
-                        backup_files.append(file_info)
-                else:
-                    backup_files.append(file_info)
-                    
-            except OSError as e:
-                self.logger.warning(f"Could not stat backup file {backup_file}: {e}")
-        
-        return sorted(backup_files, key=lambda x: x['created_time'], reverse=True)
+                try:
+                    stat = entry.stat()
+                except OSError as e:
+                    self.logger.warning("Could not stat backup file %s: %s", entry.path, e)
+                    continue
+                
+                backup_files.append(BackupFileInfo(
+                    filename=name,
+                    path=entry.path,
+                    size_bytes=stat.st_size,
+                    created_timestamp=stat.st_ctime,
+                    modified_timestamp=stat.st_mtime
+                ))
+        
+        backup_files.sort(key=lambda f: f.created_timestamp, reverse=True)
+        return backup_files
     
-    def cleanup_all_backups(self) -> Dict[str, List[str]]:
-        """Clean up old backups for all controllers."""
+    def cleanup_all_backups(self) -> Tuple[Dict[str, List[str]], int]:
+        """Clean up old backups for all controllers concurrently; returns deleted files per controller and bytes freed."""
         cleanup_results = {}
+        freed_bytes = 0
         
-        for controller_id, controller in self.controllers.items():
-            try:
-                deleted_files = controller.cleanup_old_backups()
-                cleanup_results[controller_id] = deleted_files
-                self.logger.info(f"Cleaned up {len(deleted_files)} old backups for {controller_id}")
-            except Exception as e:
-                self.logger.error(f"Failed to cleanup backups for {controller_id}: {e}")
-                cleanup_results[controller_id] = []
+        if not self.controllers:
+            return cleanup_results, freed_bytes
         
-        return cleanup_results
-
+        max_workers = min(len(self.controllers), MAX_PARALLEL_CLEANUPS)
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(controller.cleanup_old_backups): controller_id
+                for controller_id, controller in self.controllers.items()
+            }
+            
+            for future in as_completed(futures):
+                controller_id = futures[future]
+                try:
+                    deleted_files, controller_freed = future.result()
+                    cleanup_results[controller_id] = deleted_files
+                    freed_bytes += controller_freed
+                    self.logger.info("Cleaned up %d old backups for %s", len(deleted_files), controller_id)
+                except Exception as e:
+                    self.logger.error("Failed to cleanup backups for %s: %s", controller_id, e)
+                    cleanup_results[controller_id] = []
+        
+        if self.chunk_store:
+            # Drop chunks that only the manifests removed above referenced
+            with os.scandir(self.backup_config.backup_dir) as entries:
+                manifests = [entry.path for entry in entries if entry.name.endswith(MANIFEST_SUFFIX)]
+            self.chunk_store.collect_garbage(manifests)
+        
+        return {controller_id: cleanup_results[controller_id] for controller_id in self.controllers}, freed_bytes
@@ -1,21 +1,96 @@
 """
 Base controller for database backup operations.
 """
+import asyncio
+import functools
+import json
 import os
+import shutil
 import subprocess
 import logging
+import tempfile
+import time
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, BinaryIO, Callable, Dict, Optional, List, Tuple
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 from models.database_config import DatabaseConfig, BackupConfig
-from models.backup_result import BackupResult, BackupStatus
+from models.backup_result import BackupResult, BackupStatus, BACKUP_FILE_EXTENSIONS
+
+
+# Kernel buffer requested for pipes between pipeline stages; 1 MiB is Linux's default cap for unprivileged users
+PIPE_BUFFER_SIZE = 1024 * 1024
+
+# zstd long-distance matching window (128 MiB): repeated tables and rows far apart in a dump still match.
+# 2**27 is also the largest window zstd decompresses without being told, so restores need no extra flag.
+ZSTD_LONG_WINDOW_LOG = 27
+
+# Highest level gzip, pigz and pg_dump accept; zstd goes up to 19
+MAX_GZIP_LEVEL = 9
+
+# Only the end of a tool's stderr is kept for error reporting, however much it writes
+STDERR_TAIL_BYTES = 64 * 1024
+
+
+def read_stderr_tail(stderr_file: BinaryIO) -> str:
+    """Decode the last STDERR_TAIL_BYTES of a spooled stderr file."""
+    size = stderr_file.seek(0, os.SEEK_END)
+    stderr_file.seek(max(size - STDERR_TAIL_BYTES, 0))
+    return stderr_file.read().decode(errors='replace').strip()
+
+
+def _enlarge_pipe(pipe: BinaryIO):
+    """Grow a pipe's kernel buffer where supported, so stages exchange data in fewer, larger transfers."""
+    if fcntl is None or not hasattr(fcntl, "F_SETPIPE_SZ"):
+        return
+    try:
+        fcntl.fcntl(pipe.fileno(), fcntl.F_SETPIPE_SZ, PIPE_BUFFER_SIZE)
+    except OSError:
+        # Above /proc/sys/fs/pipe-max-size; keep the default buffer
+        pass
+
+
+# Tools are started with an absolute executable and close_fds=False, which lets CPython launch them
+# with posix_spawn (vfork-based on glibc, a syscall on macOS) instead of fork+exec. Python opens its
+# own descriptors non-inheritable (PEP 446), so the children still inherit only their stdio.
+@functools.lru_cache(maxsize=None)
+def resolve_executable(name: str) -> Optional[str]:
+    """Absolute path of a tool on PATH, looked up once per process; None if it is not installed."""
+    return shutil.which(name)
+
+
+# Receives a backup stream and its filename, uploads it and returns whether it succeeded
+StreamUploader = Callable[[BinaryIO, str], bool]
+
+
+class _CountingReader:
+    """Binary stream wrapper that counts the bytes read through it, copying them to tee if given."""
+    
+    def __init__(self, stream: BinaryIO, tee: Optional[BinaryIO] = None):
+        self._stream = stream
+        self._tee = tee
+        self.bytes_read = 0
+    
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        self.bytes_read += len(data)
+        if self._tee is not None:
+            self._tee.write(data)
+        return data
 
 
 class BaseBackupController(ABC):
     """Base class for database backup controllers."""
     
+    # Extension of the archives written by create_backup
+    backup_extension = ".tar.gz"
+    
     def __init__(self, db_config: DatabaseConfig, backup_config: BackupConfig):
         """Initialize the backup controller."""
         self.db_config = db_config
@@ -26,68 +101,327 @@ class BaseBackupController(ABC):
         Path(self.backup_config.backup_dir).mkdir(parents=True, exist_ok=True)
     
     @abstractmethod
-    def create_backup(self) -> BackupResult:
-        """Create a database backup."""
+    def create_backup(self, upload: Optional[StreamUploader] = None) -> BackupResult:
+        """Create a database backup, streaming it to upload instead of the backup directory if given."""
         pass
     
+    def create_incremental_backup(self, upload: Optional[StreamUploader] = None) -> BackupResult:
+        """Back up only the changes since the last backup recorded in the manifest."""
+        raise ValueError(f"Incremental backups are not supported for {self.db_config.db_type} databases")
+    
+    async def create_backup_async(self, upload: Optional[StreamUploader] = None) -> BackupResult:
+        """Create a backup without blocking the event loop; the dump tools run in a worker thread."""
+        return await asyncio.to_thread(self.create_backup, upload)
+    
+    async def restore_backup_async(self, backup_file_path: str) -> bool:
+        """Restore a backup without blocking the event loop; the restore tools run in a worker thread."""
+        return await asyncio.to_thread(self.restore_backup, backup_file_path)
+    
+    @property
+    def supports_streaming(self) -> bool:
+        """Whether create_backup can stream the backup to an uploader."""
+        return True
+    
     @abstractmethod
     def restore_backup(self, backup_file_path: str) -> bool:
         """Restore database from backup file."""
         pass
     
-    def cleanup_old_backups(self) -> List[str]:
-        """Clean up old backup files based on retention policy."""
-        backup_dir = Path(self.backup_config.backup_dir)
-        cutoff_date = datetime.now().timestamp() - (self.backup_config.retention_days * 24 * 3600)
+    def cleanup_old_backups(self) -> Tuple[List[str], int]:
+        """Clean up this database's old backup files; returns the deleted paths and bytes freed."""
+        retention_seconds = self.backup_config.retention_days * 86400
+        cutoff_date = time.time() - retention_seconds
         
         deleted_files = []
+        freed_bytes = 0
         
-        for backup_file in backup_dir.glob("*.tar.gz"):
-            if backup_file.stat().st_mtime < cutoff_date:
+        # scandir yields the directory entries with their stat info in one pass
+        with os.scandir(self.backup_config.backup_dir) as entries:
+            for entry in entries:
+                if not self.owns_backup_file(entry.name):
+                    continue
                 try:
-                    backup_file.unlink()
-                    deleted_files.append(str(backup_file))
-                    self.logger.info(f"Deleted old backup: {backup_file}")
+                    stat_result = entry.stat(follow_symlinks=False)
+                    if stat_result.st_mtime < cutoff_date:
+                        os.unlink(entry.path)
+                        deleted_files.append(entry.path)
+                        freed_bytes += stat_result.st_size
+                        self.logger.info("Deleted old backup: %s", entry.path)
+                except FileNotFoundError:
+                    # Already removed by another controller sharing the directory
+                    continue
                 except OSError as e:
-                    self.logger.error(f"Failed to delete old backup {backup_file}: {e}")
+                    self.logger.error("Failed to delete old backup %s: %s", entry.path, e)
         
-        return deleted_files
+        return deleted_files, freed_bytes
+    
+    def backup_filename_prefix(self) -> str:
+        """Prefix shared by every backup file this controller writes."""
+        return f"backup_{self.db_config.database}_"
+    
+    def owns_backup_file(self, filename: str) -> bool:
+        """Whether filename is a backup of this database: the prefix followed directly by a timestamp."""
+        prefix = self.backup_filename_prefix()
+        if not filename.startswith(prefix) or not filename.endswith(BACKUP_FILE_EXTENSIONS):
+            return False
+        
+        # The prefix alone also matches databases that extend the name (app, app_logs);
+        # the timestamp ends at one of the dots starting the extension
+        rest = filename[len(prefix):]
+        for index, char in enumerate(rest):
+            if char != ".":
+                continue
+            try:
+                datetime.strptime(rest[:index], self.backup_config.timestamp_format)
+                return True
+            except ValueError:
+                continue
+        return False
+    
+    def _generate_backup_filename(self, timestamp: Optional[datetime] = None,
+                                  extension: Optional[str] = None) -> str:
+        """Generate backup filename with timestamp, defaulting to now."""
+        timestamp = (timestamp or datetime.now()).strftime(self.backup_config.timestamp_format)
+        return f"{self.backup_filename_prefix()}{timestamp}{extension or self.backup_extension}"
+    
+    def _manifest_path(self) -> str:
+        """Path of the JSON manifest recording this database's latest backup."""
+        return self._get_backup_file_path(f"{self.backup_filename_prefix()}manifest.json")
+    
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        """Load the backup manifest, or None if no backup has been recorded yet."""
+        try:
+            with open(self._manifest_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
     
-    def _generate_backup_filename(self) -> str:
-        """Generate backup filename with timestamp."""
-        timestamp = datetime.now().strftime(self.backup_config.timestamp_format)
-        return f"backup_{self.db_config.database}_{timestamp}.tar.gz"
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        """Atomically replace the backup manifest."""
+        manifest_path = self._manifest_path()
+        temp_path = f"{manifest_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, manifest_path)
     
     def _get_backup_file_path(self, filename: str) -> str:
         """Get full path for backup file."""
         return str(Path(self.backup_config.backup_dir) / filename)
     
-    def _execute_command(self, command: List[str], timeout: int = 300) -> tuple:
-        """Execute shell command and return (success, output, error)."""
+    def _execute_command(self, command: List[str], timeout: int = 300,
+                         stdout_path: Optional[str] = None) -> tuple:
+        """Execute shell command and return (success, output, error).
+        
+        When stdout_path is given, the command's stdout is written straight to
+        that file instead of being buffered in memory, and output is empty.
+        """
         try:
-            self.logger.debug(f"Executing command: {' '.join(command)}")
-            result = subprocess.run(
-                command,
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                check=False
-            )
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Executing command: %s", ' '.join(command))
+            
+            if stdout_path:
+                with open(stdout_path, 'wb') as stdout_file:
+                    result = subprocess.run(
+                        command,
+                        executable=resolve_executable(command[0]),
+                        close_fds=False,
+                        stdout=stdout_file,
+                        stderr=subprocess.PIPE,
+                        timeout=timeout,
+                        check=False
+                    )
+                stdout = ""
+                stderr = result.stderr.decode(errors='replace')
+            else:
+                result = subprocess.run(
+                    command,
+                    executable=resolve_executable(command[0]),
+                    close_fds=False,
+                    capture_output=True,
+                    text=True,
+                    timeout=timeout,
+                    check=False
+                )
+                stdout, stderr = result.stdout, result.stderr
             
             if result.returncode == 0:
-                self.logger.debug(f"Command successful: {result.stdout}")
-                return True, result.stdout, result.stderr
+                self.logger.debug("Command successful: %s", stdout)
+                return True, stdout, stderr
             else:
-                self.logger.error(f"Command failed with return code {result.returncode}: {result.stderr}")
-                return False, result.stdout, result.stderr
+                self.logger.error("Command failed with return code %s: %s", result.returncode, stderr)
+                return False, stdout, stderr
                 
         except subprocess.TimeoutExpired as e:
-            self.logger.error(f"Command timed out after {timeout} seconds: {e}")
+            self.logger.error("Command timed out after %s seconds: %s", timeout, e)
             return False, "", str(e)
         except Exception as e:
-            self.logger.error(f"Command execution failed: {e}")
+            self.logger.error("Command execution failed: %s", e)
             return False, "", str(e)
     
+    def _parallel_jobs(self) -> int:
+        """Number of parallel workers to give dump/restore tools."""
+        return self.backup_config.parallel_jobs or os.cpu_count() or 1
+    
+    def _gzip_command(self, decompress: bool = False, threads: Optional[int] = None) -> List[str]:
+        """Build a gzip stdin-to-stdout filter, using pigz on threads cores (default all) when installed."""
+        if resolve_executable("pigz"):
+            cmd = ["pigz", "-p", str(threads or os.cpu_count() or 1)]
+        else:
+            cmd = ["gzip"]
+        cmd.append("-dc" if decompress else "-c")
+        return cmd
+    
+    def _uses_zstd(self) -> bool:
+        """Whether new archives are compressed with zstd rather than pigz/gzip."""
+        if self.backup_config.compressor == "auto":
+            return resolve_executable("zstd") is not None
+        return self.backup_config.compressor == "zstd"
+    
+    def _compress_command(self, threads: Optional[int] = None) -> List[str]:
+        """Build a stdin-to-stdout compressor: multi-threaded zstd, or pigz/gzip if configured or zstd is missing."""
+        threads = threads or self.backup_config.compression_threads
+        level = self.backup_config.compression_level
+        if self._uses_zstd():
+            cmd = ["zstd", f"-T{threads or 0}", "-q", "-c", f"--long={ZSTD_LONG_WINDOW_LOG}"]
+        else:
+            cmd = self._gzip_command(threads=threads)
+            # Levels above 9 only exist for zstd; the gzip fallback uses its best
+            level = level and min(level, MAX_GZIP_LEVEL)
+        
+        if level:
+            cmd.append(f"-{level}")
+        if self.backup_config.dedup and cmd[0] != "gzip":
+            # Reset compression at content-defined points so unchanged input compresses to unchanged, dedupable output
+            cmd.append("--rsyncable")
+        return cmd
+    
+    def _compressed_suffix(self) -> str:
+        """File suffix matching the output of _compress_command."""
+        return ".zst" if self._uses_zstd() else ".gz"
+    
+    def _decompress_command(self, file_path: str) -> List[str]:
+        """Build a command that writes the decompressed contents of file_path to stdout."""
+        if file_path.endswith(".zst"):
+            return ["zstd", "-dcq", file_path]
+        return self._gzip_command(decompress=True) + [file_path]
+    
+    def _execute_pipeline(self, commands: List[List[str]], stdout_path: Optional[str] = None,
+                          timeout: int = 300, env: Optional[dict] = None,
+                          stdout_consumer: Optional[Callable[[BinaryIO], None]] = None) -> tuple:
+        """Execute commands chained stdout-to-stdin and return (success, output, error).
+        
+        The last command's stdout is written to stdout_path, handed to stdout_consumer
+        as a readable stream, or discarded, so data streams between the stages without
+        being staged on disk or in memory. Each stage's stderr goes to a temporary file
+        so a chatty stage cannot stall the pipe.
+        """
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Executing pipeline: %s", ' | '.join(' '.join(cmd) for cmd in commands))
+        
+        processes = []
+        stderr_files = []
+        try:
+            with open(stdout_path or os.devnull, 'wb') as stdout_file:
+                upstream = None
+                for index, command in enumerate(commands):
+                    is_last = index == len(commands) - 1
+                    stderr_file = tempfile.TemporaryFile()
+                    stderr_files.append(stderr_file)
+                    process = subprocess.Popen(
+                        command,
+                        executable=resolve_executable(command[0]),
+                        close_fds=False,
+                        stdin=upstream,
+                        stdout=stdout_file if is_last and not stdout_consumer else subprocess.PIPE,
+                        stderr=stderr_file,
+                        env=env,
+                        bufsize=PIPE_BUFFER_SIZE
+                    )
+                    if process.stdout is not None:
+                        _enlarge_pipe(process.stdout)
+                    if upstream is not None:
+                        # Only the child holds the read end now, so it sees EOF/SIGPIPE correctly
+                        upstream.close()
+                    upstream = process.stdout
+                    processes.append(process)
+                
+                if stdout_consumer:
+                    try:
+                        stdout_consumer(upstream)
+                    finally:
+                        upstream.close()
+                
+                deadline = time.monotonic() + timeout
+                for process in processes:
+                    process.wait(timeout=max(deadline - time.monotonic(), 0))
+            
+            errors = []
+            for command, process, stderr_file in zip(commands, processes, stderr_files):
+                stderr = read_stderr_tail(stderr_file)
+                if process.returncode != 0:
+                    errors.append(f"{command[0]} exited with code {process.returncode}: {stderr}")
+            
+            if errors:
+                error = "\n".join(errors)
+                self.logger.error("Pipeline failed: %s", error)
+                return False, "", error
+            
+            self.logger.debug("Pipeline successful")
+            return True, "", ""
+            
+        except subprocess.TimeoutExpired as e:
+            self.logger.error("Pipeline timed out after %s seconds: %s", timeout, e)
+            return False, "", str(e)
+        except Exception as e:
+            self.logger.error("Pipeline execution failed: %s", e)
+            return False, "", str(e)
+        finally:
+            for process in processes:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+            for stderr_file in stderr_files:
+                stderr_file.close()
+    
+    def _upload_pipeline(self, commands: List[List[str]], upload: StreamUploader, filename: str,
+                         env: Optional[dict] = None, tee_path: Optional[str] = None) -> tuple:
+        """Stream the pipeline's output to upload and return (success, bytes uploaded, error).
+        
+        With tee_path, every uploaded byte is also written there as it passes, so the
+        local copy costs no second read of the data.
+        """
+        bytes_uploaded = 0
+        
+        def consume(stream: BinaryIO):
+            nonlocal bytes_uploaded
+            with open(tee_path or os.devnull, 'wb') as tee:
+                reader = _CountingReader(stream, tee if tee_path else None)
+                if not upload(reader, filename):
+                    raise IOError(f"Upload of {filename} failed")
+            bytes_uploaded = reader.bytes_read
+        
+        success, stdout, stderr = self._execute_pipeline(commands, env=env, stdout_consumer=consume)
+        if not success and tee_path and os.path.exists(tee_path):
+            os.unlink(tee_path)
+        return success, bytes_uploaded, stderr
+    
+    def _remove_partial_backup(self, backup_file_path: Optional[str]):
+        """Delete what a failed backup left behind, so retention and listings never take it for a backup."""
+        if not backup_file_path:
+            return
+        try:
+            os.unlink(backup_file_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.warning("Failed to remove partial backup %s: %s", backup_file_path, e)
+    
+    def _local_copy_path(self, backup_filename: str) -> Optional[str]:
+        """Where a streamed upload keeps its local copy, or None if it keeps none."""
+        if not self.backup_config.keep_local_copy:
+            return None
+        return self._get_backup_file_path(backup_filename)
+    
     def _get_file_size(self, file_path: str) -> int:
         """Get file size in bytes."""
         try:
@@ -1,30 +1,122 @@
 """
 MongoDB backup controller implementation.
 """
+import json
 import os
+import re
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from pathlib import Path
-from typing import List
+from typing import Callable, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
-from .base_controller import BaseBackupController
+from .base_controller import BaseBackupController, StreamUploader
 from models.database_config import MongoDBConfig
 from models.backup_result import BackupResult, BackupStatus
 
+# Optional driver, only needed to list collections for per-collection backups
+try:
+    from pymongo import MongoClient
+except ImportError:
+    MongoClient = None
+
 
 class MongoDBBackupController(BaseBackupController):
     """MongoDB specific backup controller."""
     
+    # mongodump --archive streams, zstd- or gzip-compressed
+    ARCHIVE_EXTENSIONS = (".archive.zst", ".archive.gz")
+    # Oplog slices written by create_incremental_backup, zstd- or gzip-compressed BSON
+    OPLOG_EXTENSIONS = (".oplog.bson.zst", ".oplog.bson.gz")
+    # Uncompressed tar bundling one compressed archive per collection
+    COLLECTIONS_EXTENSION = ".collections.tar"
+    # mongorestore insertion workers per collection being restored
+    INSERTION_WORKERS_PER_COLLECTION = 4
+    # Incrementals reach back this far before the previous backup to absorb clock skew
+    # between this host and the server; oplog entries are idempotent, so replaying one twice is harmless
+    OPLOG_OVERLAP_SECONDS = 60
+    
     def __init__(self, db_config: MongoDBConfig, backup_config):
         """Initialize MongoDB backup controller."""
         super().__init__(db_config, backup_config)
         self.db_config: MongoDBConfig = db_config
     
-    def create_backup(self) -> BackupResult:
+    @property
+    def backup_extension(self) -> str:
+        """Extension of the compressed archive stream written by create_backup."""
+        if self.backup_config.per_collection:
+            return self.COLLECTIONS_EXTENSION
+        return f".archive{self._archive_suffix()}"
+    
+    @property
+    def _dump_compressed(self) -> bool:
+        """Whether mongodump gzips the archive itself (gzip in additional_params)."""
+        return "--gzip" in self.db_config.extra_flags
+    
+    def _archive_suffix(self) -> str:
+        """Compression suffix of the archives, whichever tool compresses them."""
+        return ".gz" if self._dump_compressed else self._compressed_suffix()
+    
+    def _archive_pipeline(self, collection: Optional[str] = None, threads: Optional[int] = None) -> List[List[str]]:
+        """mongodump piped through the compressor, unless mongodump already compresses the archive."""
+        if self._dump_compressed:
+            return [self._build_mongodump_command(collection)]
+        return [self._build_mongodump_command(collection), self._compress_command(threads)]
+    
+    def _restore_archive_pipeline(self, archive_path: str) -> List[List[str]]:
+        """Commands restoring an archive: decompressed into mongorestore, or read by it directly if it gunzips."""
+        if self._dump_compressed:
+            return [self._build_mongorestore_command(archive_file=archive_path)]
+        return [self._decompress_command(archive_path), self._build_mongorestore_command()]
+    
+    @property
+    def supports_streaming(self) -> bool:
+        """Per-collection backups are several archives bundled on local disk."""
+        return not self.backup_config.per_collection
+    
+    def create_backup(self, upload: Optional[StreamUploader] = None) -> BackupResult:
         """Create MongoDB backup using mongodump."""
-        backup_id = f"mongo_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         start_time = datetime.now()
+        if self.backup_config.per_collection:
+            if upload:
+                raise ValueError("Streaming uploads are not supported for per-collection MongoDB backups")
+            return self._run_dump(
+                f"mongo_{start_time.strftime('%Y%m%d_%H%M%S')}",
+                start_time,
+                self._generate_backup_filename(start_time),
+                [],
+                None,
+                write_backup=self._create_per_collection_backup
+            )
+        
+        return self._run_dump(
+            f"mongo_{start_time.strftime('%Y%m%d_%H%M%S')}",
+            start_time,
+            self._generate_backup_filename(start_time),
+            self._archive_pipeline(),
+            upload
+        )
+    
+    def create_incremental_backup(self, upload: Optional[StreamUploader] = None) -> BackupResult:
+        """Dump this database's oplog entries written since the last backup recorded in the manifest."""
+        manifest = self._read_manifest()
+        if not manifest:
+            raise ValueError(f"No previous backup recorded for {self.db_config.database}; run a full backup first")
         
+        start_time = datetime.now()
+        since = int(manifest["last_ts"]) - self.OPLOG_OVERLAP_SECONDS
+        return self._run_dump(
+            f"mongo_incr_{start_time.strftime('%Y%m%d_%H%M%S')}",
+            start_time,
+            self._generate_backup_filename(start_time, f".oplog.bson{self._compressed_suffix()}"),
+            [self._build_oplog_dump_command(since), self._compress_command()],
+            upload
+        )
+    
+    def _run_dump(self, backup_id: str, start_time: datetime, backup_filename: str,
+                  commands: List[List[str]], upload: Optional[StreamUploader],
+                  write_backup: Optional[Callable[[str], tuple]] = None) -> BackupResult:
+        """Run a dump pipeline (or write_backup) into the backup directory or upload and record it in the manifest."""
         backup_result = BackupResult(
             backup_id=backup_id,
             database_type="mongodb",
@@ -32,75 +124,118 @@ class MongoDBBackupController(BaseBackupController):
             status=BackupStatus.IN_PROGRESS,
             start_time=start_time
         )
+        backup_file_path = None
         
         try:
-            # Create temporary directory for dump
-            with tempfile.TemporaryDirectory() as temp_dir:
-                dump_dir = Path(temp_dir) / "dump"
-                dump_dir.mkdir()
-                
-                # Build mongodump command
-                mongodump_cmd = self._build_mongodump_command(str(dump_dir))
-                
-                # Execute mongodump
-                success, stdout, stderr = self._execute_command(mongodump_cmd)
-                
-                if not success:
-                    backup_result.status = BackupStatus.FAILED
-                    backup_result.error_message = stderr
-                    backup_result.end_time = datetime.now()
-                    return backup_result
-                
-                # Create compressed archive
-                backup_filename = self._generate_backup_filename()
+            if upload:
+                # Stream the compressed archive straight to the remote destination, writing it locally
+                # in the same pass only if a local copy is kept
+                backup_file_path = self._local_copy_path(backup_filename)
+                success, backup_size, stderr = self._upload_pipeline(
+                    commands, upload, backup_filename, tee_path=backup_file_path
+                )
+            else:
                 backup_file_path = self._get_backup_file_path(backup_filename)
                 
-                tar_cmd = ["tar", "-czf", backup_file_path, "-C", str(dump_dir), "."]
-                success, stdout, stderr = self._execute_command(tar_cmd)
-                
-                if not success:
-                    backup_result.status = BackupStatus.FAILED
-                    backup_result.error_message = f"Failed to create archive: {stderr}"
-                    backup_result.end_time = datetime.now()
-                    return backup_result
-                
-                # Update backup result
-                backup_result.status = BackupStatus.SUCCESS
-                backup_result.backup_file_path = backup_file_path
-                backup_result.backup_size_bytes = self._get_file_size(backup_file_path)
-                backup_result.end_time = datetime.now()
-                
-                self.logger.info(f"MongoDB backup completed successfully: {backup_file_path}")
-                
+                if write_backup:
+                    success, stdout, stderr = write_backup(backup_file_path)
+                else:
+                    # Stream the archive straight from mongodump through the compressor into the backup file
+                    success, stdout, stderr = self._execute_pipeline(commands, stdout_path=backup_file_path)
+            
+            if not success:
+                backup_result.status = BackupStatus.FAILED
+                backup_result.error_message = stderr
+                return backup_result
+            
+            # Update backup result
+            backup_result.status = BackupStatus.SUCCESS
+            backup_result.backup_file_path = backup_file_path
+            backup_result.backup_size_bytes = backup_size if upload else self._get_file_size(backup_file_path)
+            backup_result.ftp_uploaded = upload is not None
+            
+            self.logger.info(f"MongoDB backup completed successfully: {backup_file_path or backup_filename}")
+            
+            try:
+                # The next incremental picks up the oplog from this backup's start
+                self._write_manifest({
+                    "backup_id": backup_id,
+                    "backup_file": backup_filename,
+                    "last_ts": int(start_time.timestamp())
+                })
+            except OSError as e:
+                self.logger.warning(f"Failed to update backup manifest: {e}")
+            
         except Exception as e:
             backup_result.status = BackupStatus.FAILED
             backup_result.error_message = str(e)
-            backup_result.end_time = datetime.now()
             self.logger.error(f"MongoDB backup failed: {e}")
+        finally:
+            # A failed or interrupted dump leaves a truncated archive
+            if backup_result.status != BackupStatus.SUCCESS:
+                self._remove_partial_backup(backup_file_path)
+            
+            # Single exit point for the end timestamp, whichever way the backup finished
+            backup_result.finalize()
         
         return backup_result
     
     def restore_backup(self, backup_file_path: str) -> bool:
         """Restore MongoDB from backup file."""
         try:
-            # Extract backup
+            if backup_file_path.endswith(self.OPLOG_EXTENSIONS):
+                # Incremental slice: replay it on top of the previously restored backups
+                success, stdout, stderr = self._replay_oplog(backup_file_path)
+                
+                if success:
+                    self.logger.info("MongoDB oplog replay completed successfully")
+                    return True
+                else:
+                    self.logger.error(f"MongoDB oplog replay failed: {stderr}")
+                    return False
+            
+            if backup_file_path.endswith(self.COLLECTIONS_EXTENSION):
+                success, stdout, stderr = self._restore_per_collection_backup(backup_file_path)
+                
+                if success:
+                    self.logger.info("MongoDB restore completed successfully")
+                    return True
+                else:
+                    self.logger.error(f"MongoDB restore failed: {stderr}")
+                    return False
+            
+            if backup_file_path.endswith(self.ARCHIVE_EXTENSIONS):
+                # Stream the compressed archive straight into mongorestore
+                success, stdout, stderr = self._execute_pipeline(self._restore_archive_pipeline(backup_file_path))
+                
+                if success:
+                    self.logger.info("MongoDB restore completed successfully")
+                    return True
+                else:
+                    self.logger.error(f"MongoDB restore failed: {stderr}")
+                    return False
+            
+            # Legacy .tar.gz backups hold a mongodump directory tree; pigz decompresses it when installed
             with tempfile.TemporaryDirectory() as temp_dir:
-                extract_cmd = ["tar", "-xzf", backup_file_path, "-C", temp_dir]
-                success, stdout, stderr = self._execute_command(extract_cmd)
+                success, stdout, stderr = self._execute_pipeline([
+                    self._gzip_command(decompress=True) + [backup_file_path],
+                    ["tar", "-xf", "-", "-C", temp_dir]
+                ])
                 
                 if not success:
                     self.logger.error(f"Failed to extract backup: {stderr}")
                     return False
                 
-                # Find the dump directory
-                dump_dir = Path(temp_dir)
-                for item in dump_dir.iterdir():
-                    if item.is_dir():
-                        dump_dir = item
-                        break
+                # Find the dump directory; scandir entries answer is_dir without another stat
+                dump_dir = temp_dir
+                with os.scandir(temp_dir) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            dump_dir = entry.path
+                            break
                 
                 # Build mongorestore command
-                mongorestore_cmd = self._build_mongorestore_command(str(dump_dir))
+                mongorestore_cmd = self._build_mongorestore_command(dump_dir)
                 
                 # Execute mongorestore
                 success, stdout, stderr = self._execute_command(mongorestore_cmd)
@@ -116,63 +251,182 @@ class MongoDBBackupController(BaseBackupController):
             self.logger.error(f"MongoDB restore failed: {e}")
             return False
     
-    def _build_mongodump_command(self, output_dir: str) -> List[str]:
-        """Build mongodump command with appropriate parameters."""
-        cmd = ["mongodump", "--out", output_dir]
+    def _create_per_collection_backup(self, backup_file_path: str) -> tuple:
+        """Dump each collection with its own mongodump in parallel and bundle the archives into a tar."""
+        collections = self._list_collections()
+        workers = max(1, min(len(collections), self._parallel_collections()))
+        # Split the cores between the concurrent compressors instead of each one claiming them all
+        threads = max(1, (os.cpu_count() or 1) // workers)
         
-        if self.db_config.uri:
-            cmd.extend(["--uri", self.db_config.uri])
-        else:
-            # Build connection string from individual parameters
-            if self.db_config.host:
-                cmd.extend(["--host", f"{self.db_config.host}:{self.db_config.port}"])
+        # Stage next to the backup file so the bundle is assembled on the same filesystem
+        with tempfile.TemporaryDirectory(dir=self.backup_config.backup_dir) as temp_dir:
+            def dump(collection: str) -> tuple:
+                archive_path = os.path.join(temp_dir, f"{collection}.archive{self._archive_suffix()}")
+                return self._execute_pipeline(self._archive_pipeline(collection, threads), stdout_path=archive_path)
             
-            if self.db_config.database:
-                cmd.extend(["--db", self.db_config.database])
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(dump, collections))
             
-            if self.db_config.username:
-                cmd.extend(["--username", self.db_config.username])
+            errors = [stderr for success, stdout, stderr in results if not success]
+            if errors:
+                return False, "", "\n".join(errors)
             
-            if self.db_config.password:
-                cmd.extend(["--password", self.db_config.password])
-        
-        # Add additional parameters
-        if self.db_config.additional_params:
-            for key, value in self.db_config.additional_params.items():
-                if isinstance(value, bool) and value:
-                    cmd.append(f"--{key}")
-                elif not isinstance(value, bool):
-                    cmd.extend([f"--{key}", str(value)])
-        
-        return cmd
+            # Members are already compressed, so the tar is not compressed again
+            return self._execute_command(["tar", "-cf", backup_file_path, "-C", temp_dir, "."])
+    
+    def _restore_per_collection_backup(self, backup_file_path: str) -> tuple:
+        """Restore every collection archive in a per-collection bundle in parallel."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            success, stdout, stderr = self._execute_command(["tar", "-xf", backup_file_path, "-C", temp_dir])
+            if not success:
+                return success, stdout, stderr
+            
+            with os.scandir(temp_dir) as entries:
+                archives = [entry.path for entry in entries if entry.name.endswith(self.ARCHIVE_EXTENSIONS)]
+            
+            def restore(archive_path: str) -> tuple:
+                return self._execute_pipeline(self._restore_archive_pipeline(archive_path))
+            
+            with ThreadPoolExecutor(max_workers=max(1, min(len(archives), self._parallel_collections()))) as executor:
+                results = list(executor.map(restore, archives))
+            
+            errors = [stderr for success, stdout, stderr in results if not success]
+            return not errors, "", "\n".join(errors)
     
-    def _build_mongorestore_command(self, input_dir: str) -> List[str]:
-        """Build mongorestore command with appropriate parameters."""
-        cmd = ["mongorestore", input_dir]
+    def _list_collections(self) -> List[str]:
+        """Names of the database's collections and views, excluding system namespaces."""
+        if MongoClient is None:
+            raise ValueError("Per-collection MongoDB backups require the pymongo package")
         
         if self.db_config.uri:
-            cmd.extend(["--uri", self.db_config.uri])
+            client = MongoClient(self.db_config.uri)
         else:
-            # Build connection string from individual parameters
-            if self.db_config.host:
-                cmd.extend(["--host", f"{self.db_config.host}:{self.db_config.port}"])
-            
-            if self.db_config.database:
-                cmd.extend(["--db", self.db_config.database])
-            
-            if self.db_config.username:
-                cmd.extend(["--username", self.db_config.username])
+            client = MongoClient(
+                self.db_config.host,
+                self.db_config.port,
+                username=self.db_config.username,
+                password=self.db_config.password,
+                authSource=self.db_config.database
+            )
+        try:
+            names = client[self.db_config.database].list_collection_names()
+        finally:
+            client.close()
+        return sorted(name for name in names if not name.startswith("system."))
+    
+    def _replay_oplog(self, backup_file_path: str) -> tuple:
+        """Decompress an oplog slice and replay it with mongorestore."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            oplog_file = os.path.join(temp_dir, "oplog.bson")
+            success, stdout, stderr = self._execute_pipeline(
+                [self._decompress_command(backup_file_path)], stdout_path=oplog_file
+            )
+            if not success:
+                return success, stdout, stderr
             
-            if self.db_config.password:
-                cmd.extend(["--password", self.db_config.password])
+            # mongorestore insists on a dump directory even when it only replays an oplog file
+            dump_dir = os.path.join(temp_dir, "dump")
+            os.mkdir(dump_dir)
+            return self._execute_command(self._build_oplog_replay_command(oplog_file, dump_dir))
+    
+    def _parallel_collections(self) -> int:
+        """Number of collections mongodump/mongorestore process concurrently."""
+        return self.backup_config.parallel_collections or self._parallel_jobs()
+    
+    def _build_mongodump_command(self, collection: Optional[str] = None) -> List[str]:
+        """Build mongodump command that writes a single archive stream, of one collection if given, to stdout."""
+        cmd = ["mongodump", "--archive"]
+        cmd.extend(self._connection_args())
         
-        # Add additional parameters
-        if self.db_config.additional_params:
-            for key, value in self.db_config.additional_params.items():
-                if isinstance(value, bool) and value:
-                    cmd.append(f"--{key}")
-                elif not isinstance(value, bool):
-                    cmd.extend([f"--{key}", str(value)])
+        if collection:
+            cmd.extend(["--collection", collection])
+        else:
+            # Dump several collections at once; additional_params below may still override it
+            cmd.extend(["--numParallelCollections", str(self._parallel_collections())])
+        cmd.extend(self.db_config.extra_flags)
         
         return cmd
-
+    
+    def _build_mongorestore_command(self, input_dir: Optional[str] = None,
+                                    archive_file: Optional[str] = None) -> List[str]:
+        """Build mongorestore command reading a dump directory, an archive file, or an archive on stdin."""
+        if input_dir:
+            cmd = ["mongorestore", input_dir]
+        elif archive_file:
+            cmd = ["mongorestore", f"--archive={archive_file}"]
+        else:
+            cmd = ["mongorestore", "--archive"]
+        cmd.extend(self._connection_args())
+        
+        # Restore several collections at once, each with several insertion workers
+        cmd.extend([
+            "--numParallelCollections", str(self._parallel_collections()),
+            "--numInsertionWorkersPerCollection", str(self.INSERTION_WORKERS_PER_COLLECTION)
+        ])
+        cmd.extend(self.db_config.extra_flags)
+        
+        return cmd
+    
+    def _build_oplog_dump_command(self, since: int) -> List[str]:
+        """Build mongodump command that writes this database's oplog entries since a Unix time to stdout."""
+        namespace = {"$regex": f"^{re.escape(self.db_config.database)}\\."}
+        query = {
+            "ts": {"$gte": {"$timestamp": {"t": since, "i": 0}}},
+            # Multi-document transactions are logged as applyOps entries in admin.$cmd
+            "$or": [{"ns": namespace}, {"ns": "admin.$cmd", "o.applyOps.ns": namespace}]
+        }
+        cmd = [
+            "mongodump", "--db", "local", "--collection", "oplog.rs",
+            "--query", json.dumps(query), "--out", "-"
+        ]
+        cmd.extend(self._connection_args(include_database=False))
+        cmd.extend(self._oplog_extra_flags())
+        
+        return cmd
+    
+    def _build_oplog_replay_command(self, oplog_file: str, dump_dir: str) -> List[str]:
+        """Build mongorestore command replaying an oplog file."""
+        cmd = ["mongorestore", "--oplogReplay", "--oplogFile", oplog_file, dump_dir]
+        cmd.extend(self._connection_args(include_database=False))
+        cmd.extend(self._oplog_extra_flags())
+        
+        return cmd
+    
+    def _oplog_extra_flags(self) -> List[str]:
+        """additional_params for oplog dumps and replays, which are compressed by the pipeline, never by gzip."""
+        return [flag for flag in self.db_config.extra_flags if flag != "--gzip"]
+    
+    def _connection_args(self, include_database: bool = True) -> List[str]:
+        """Connection arguments, optionally without selecting the configured database."""
+        config = self.db_config
+        if config.uri:
+            return ["--uri", config.uri if include_database else self._server_uri()]
+        
+        # Build connection string from individual parameters
+        database = config.database
+        args = []
+        if config.host:
+            args.extend(["--host", f"{config.host}:{config.port}"])
+        
+        if database and include_database:
+            args.extend(["--db", database])
+        
+        if config.username:
+            args.extend(["--username", config.username])
+            if database and not include_database:
+                # Keep authenticating against the configured database, as --db would
+                args.extend(["--authenticationDatabase", database])
+        
+        if config.password:
+            args.extend(["--password", config.password])
+        
+        return args
+    
+    def _server_uri(self) -> str:
+        """The configured URI without its database, which stays the authentication source."""
+        parts = urlsplit(self.db_config.uri)
+        database = parts.path.lstrip("/")
+        query = parse_qsl(parts.query, keep_blank_values=True)
+        if database and not any(key.lower() == "authsource" for key, value in query):
+            query.append(("authSource", database))
+        return urlunsplit(parts._replace(path="/", query=urlencode(query)))
@@ -1,36 +1,91 @@
 """
 PostgreSQL backup controller implementation.
 """
+import logging
 import os
+import subprocess
+import tarfile
 import tempfile
 import stat
 from datetime import datetime
-from pathlib import Path
+from functools import cached_property
 from typing import List, Optional
 
-from .base_controller import BaseBackupController
+from .base_controller import (
+    BaseBackupController, StreamUploader, MAX_GZIP_LEVEL, read_stderr_tail, resolve_executable
+)
 from models.database_config import PostgreSQLConfig
 from models.backup_result import BackupResult, BackupStatus
 
+# Optional driver, only needed for the COPY-based 'copy' dump format
+try:
+    import psycopg
+    from psycopg import sql
+except ImportError:
+    psycopg = None
+
 
 class PostgreSQLBackupController(BaseBackupController):
     """PostgreSQL specific backup controller."""
     
+    # pg_dump custom-format archive, compressed by pg_dump
+    CUSTOM_EXTENSION = ".dump"
+    # pg_dump directory-format dump bundled in an uncompressed tar; its table files are already compressed
+    DIRECTORY_EXTENSION = ".dir.tar"
+    # Plain SQL script streamed from pg_dump's stdout through zstd or gzip
+    PLAIN_EXTENSIONS = (".sql.zst", ".sql.gz")
+    # Tar of binary COPY streams, one member per table, through zstd or gzip
+    COPY_EXTENSIONS = (".copy.tar.zst", ".copy.tar.gz")
+    # Tables up to this size are buffered in memory while their tar member is written
+    COPY_SPOOL_SIZE = 64 * 1024 * 1024
+    # Read size when streaming a tar member into COPY FROM STDIN
+    COPY_BLOCK_SIZE = 1024 * 1024
+    # Memory-backed directory for .pgpass files where available; None means the system temp dir
+    PGPASS_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    # Flags for host, port and username, in that order
+    SERVER_FLAGS = ("--host", "--port", "--username")
+    
     def __init__(self, db_config: PostgreSQLConfig, backup_config):
         """Initialize PostgreSQL backup controller."""
         super().__init__(db_config, backup_config)
         self.db_config: PostgreSQLConfig = db_config
         self._pgpass_file: Optional[str] = None
+        # Set when a batched ensure_databases_exist already covered this database; the next restore skips its check
+        self.database_ensured = False
+    
+    @property
+    def backup_extension(self) -> str:
+        """Extension of the archives written with the configured dump format."""
+        if self.backup_config.pg_format == "directory":
+            return self.DIRECTORY_EXTENSION
+        if self.backup_config.pg_format == "plain":
+            return f".sql{self._pg_dump_compression() or self._compressed_suffix()}"
+        if self.backup_config.pg_format == "copy":
+            return f".copy.tar{self._compressed_suffix()}"
+        return self.CUSTOM_EXTENSION
+    
+    def _pg_dump_compression(self) -> Optional[str]:
+        """Suffix of the compression pg_dump applies to plain output itself (compress in additional_params)."""
+        method = str((self.db_config.additional_params or {}).get("compress", "0")).split(":")[0].lower()
+        if method in ("0", "none"):
+            return None
+        if method.isdigit() or method == "gzip":
+            return ".gz"
+        if method == "zstd":
+            return ".zst"
+        raise ValueError(f"Unsupported pg_dump compression for plain dumps: {method}")
     
     def _create_pgpass_file(self) -> Optional[str]:
-        """Create a temporary .pgpass file for authentication."""
+        """Create a temporary .pgpass file for authentication, if enabled; PGPASSWORD is used otherwise."""
+        if not self.backup_config.use_pgpass_file:
+            return None
         if not self.db_config.password:
             self.logger.warning("No password configured, skipping .pgpass file creation")
             return None
         
         try:
-            # Create temporary file for .pgpass
-            fd, pgpass_path = tempfile.mkstemp(prefix='pgpass_', suffix='.tmp')
+            # Create temporary file for .pgpass, on tmpfs where available
+            fd, pgpass_path = tempfile.mkstemp(prefix='pgpass_', suffix='.tmp', dir=self.PGPASS_DIR)
             
             # Format: hostname:port:database:username:password
             # Use '*' for wildcards where appropriate
@@ -49,12 +104,12 @@ class PostgreSQLBackupController(BaseBackupController):
             # Set proper permissions (600 - owner read/write only)
             os.chmod(pgpass_path, stat.S_IRUSR | stat.S_IWUSR)
             
-            self.logger.info(f"Created .pgpass file: {pgpass_path} for {username}@{host}:{port}/{database}")
+            self.logger.info("Created .pgpass file: %s for %s@%s:%s/%s", pgpass_path, username, host, port, database)
             self._pgpass_file = pgpass_path
             return pgpass_path
             
         except Exception as e:
-            self.logger.error(f"Failed to create .pgpass file: {e}")
+            self.logger.error("Failed to create .pgpass file: %s", e)
             return None
     
     def _cleanup_pgpass_file(self):
@@ -62,69 +117,108 @@ class PostgreSQLBackupController(BaseBackupController):
         if self._pgpass_file and os.path.exists(self._pgpass_file):
             try:
                 os.unlink(self._pgpass_file)
-                self.logger.debug(f"Removed .pgpass file: {self._pgpass_file}")
+                self.logger.debug("Removed .pgpass file: %s", self._pgpass_file)
                 self._pgpass_file = None
             except Exception as e:
-                self.logger.warning(f"Failed to remove .pgpass file {self._pgpass_file}: {e}")
+                self.logger.warning("Failed to remove .pgpass file %s: %s", self._pgpass_file, e)
     
-    def _execute_command_with_pgpass(self, command: List[str], pgpass_path: Optional[str], timeout: int = 300) -> tuple:
-        """Execute PostgreSQL command with .pgpass file environment."""
-        import subprocess
+    @cached_property
+    def _pg_env_overrides(self) -> dict:
+        """PG* connection variables for the configured server, built once per controller."""
+        values = {
+            'PGHOST': self.db_config.host,
+            'PGPORT': self.db_config.port,
+            'PGUSER': self.db_config.username,
+            'PGDATABASE': self.db_config.database,
+            # CRITICAL: Also set PGPASSWORD as a fallback (more reliable than .pgpass)
+            'PGPASSWORD': self.db_config.password
+        }
+        return {name: str(value) for name, value in values.items() if value}
+    
+    def _build_pg_env(self, pgpass_path: Optional[str]) -> dict:
+        """Build the environment for PostgreSQL client tools, with PGPASSFILE and PG* connection variables."""
+        if pgpass_path and os.path.exists(pgpass_path):
+            self.logger.debug("Using .pgpass file: %s", pgpass_path)
+            return {**os.environ, **self._pg_env_overrides, 'PGPASSFILE': pgpass_path}
+        
+        if not self.db_config.password:
+            self.logger.warning("No password or .pgpass file available, command may prompt for password")
+        return {**os.environ, **self._pg_env_overrides}
+    
+    def _execute_command_with_pgpass(self, command: List[str], pgpass_path: Optional[str], timeout: int = 300,
+                                     input: Optional[str] = None, discard_stdout: bool = False) -> tuple:
+        """Execute PostgreSQL command with .pgpass file environment, feeding input to its stdin if given.
         
+        With discard_stdout, stdout goes to /dev/null and stderr to a temporary file of which
+        only the tail is kept, so a verbose tool cannot grow the process's memory.
+        """
         try:
             # Prepare environment with PGPASSFILE and other PG environment variables
-            env = os.environ.copy()
-            if pgpass_path and os.path.exists(pgpass_path):
-                env['PGPASSFILE'] = pgpass_path
-                self.logger.info(f"Using .pgpass file: {pgpass_path}")
-            else:
-                self.logger.warning("No .pgpass file available, command may prompt for password")
-            
-            # Set additional PostgreSQL environment variables for authentication
-            if self.db_config.host:
-                env['PGHOST'] = self.db_config.host
-            if self.db_config.port:
-                env['PGPORT'] = str(self.db_config.port)
-            if self.db_config.username:
-                env['PGUSER'] = self.db_config.username
-            if self.db_config.database:
-                env['PGDATABASE'] = self.db_config.database
+            env = self._build_pg_env(pgpass_path)
             
-            # CRITICAL: Also set PGPASSWORD as a fallback (more reliable than .pgpass)
-            if self.db_config.password:
-                env['PGPASSWORD'] = self.db_config.password
-                self.logger.info("Set PGPASSWORD environment variable for authentication")
-            
-            self.logger.debug(f"Executing command with .pgpass: {' '.join(command)}")
-            self.logger.debug(f"PGPASSFILE env var: {env.get('PGPASSFILE', 'NOT SET')}")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Executing command with .pgpass: %s", ' '.join(command))
+                self.logger.debug("PGPASSFILE env var: %s", env.get('PGPASSFILE', 'NOT SET'))
             
-            result = subprocess.run(
-                command,
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                check=False,
-                env=env
-            )
+            if discard_stdout:
+                with tempfile.TemporaryFile() as stderr_file:
+                    result = subprocess.run(
+                        command,
+                        executable=resolve_executable(command[0]),
+                        close_fds=False,
+                        input=input,
+                        stdout=subprocess.DEVNULL,
+                        stderr=stderr_file,
+                        text=True,
+                        timeout=timeout,
+                        check=False,
+                        env=env
+                    )
+                    stdout, stderr = "", read_stderr_tail(stderr_file)
+            else:
+                result = subprocess.run(
+                    command,
+                    executable=resolve_executable(command[0]),
+                    close_fds=False,
+                    input=input,
+                    capture_output=True,
+                    text=True,
+                    timeout=timeout,
+                    check=False,
+                    env=env
+                )
+                stdout, stderr = result.stdout, result.stderr
             
             if result.returncode == 0:
-                self.logger.debug(f"Command successful: {result.stdout}")
-                return True, result.stdout, result.stderr
+                self.logger.debug("Command successful: %s", stdout)
+                return True, stdout, stderr
             else:
-                self.logger.error(f"Command failed with return code {result.returncode}: {result.stderr}")
-                return False, result.stdout, result.stderr
+                self.logger.error("Command failed with return code %s: %s", result.returncode, stderr)
+                return False, stdout, stderr
                 
         except subprocess.TimeoutExpired as e:
-            self.logger.error(f"Command timed out after {timeout} seconds: {e}")
+            self.logger.error("Command timed out after %s seconds: %s", timeout, e)
             return False, "", str(e)
         except Exception as e:
-            self.logger.error(f"Command execution failed: {e}")
+            self.logger.error("Command execution failed: %s", e)
             return False, "", str(e)
     
-    def create_backup(self) -> BackupResult:
+    @property
+    def supports_streaming(self) -> bool:
+        """Only pg_dump custom and plain dumps are a single stream; directory and copy dumps are written locally."""
+        return self.backup_config.pg_format in ("custom", "plain")
+    
+    def create_incremental_backup(self, upload: Optional[StreamUploader] = None) -> BackupResult:
+        """pg_dump only takes logical full dumps; WAL-based incrementals need server-side archiving."""
+        raise ValueError(
+            "Incremental backups are not supported for PostgreSQL: pg_dump takes full logical dumps, "
+            "and WAL-based incrementals need archive_command/pg_basebackup configured on the server"
+        )
+    
+    def create_backup(self, upload: Optional[StreamUploader] = None) -> BackupResult:
         """Create PostgreSQL backup using pg_dump."""
-        backup_id = f"pgsql_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         start_time = datetime.now()
+        backup_id = f"pgsql_{start_time.strftime('%Y%m%d_%H%M%S')}"
         
         backup_result = BackupResult(
             backup_id=backup_id,
@@ -136,58 +230,65 @@ class PostgreSQLBackupController(BaseBackupController):
         
         # Create .pgpass file for authentication
         pgpass_path = self._create_pgpass_file()
+        backup_file_path = None
         
         try:
-            # Create temporary file for dump
-            with tempfile.NamedTemporaryFile(mode='w+b', suffix='.sql', delete=False) as temp_file:
-                temp_file_path = temp_file.name
-                
-                # Build pg_dump command
-                pg_dump_cmd = self._build_pg_dump_command(temp_file_path)
-                
-                # Execute pg_dump with .pgpass file
-                success, stdout, stderr = self._execute_command_with_pgpass(pg_dump_cmd, pgpass_path)
-                
-                if not success:
-                    backup_result.status = BackupStatus.FAILED
-                    backup_result.error_message = stderr
-                    backup_result.end_time = datetime.now()
-                    return backup_result
+            backup_filename = self._generate_backup_filename(start_time)
+            
+            if upload:
+                if not self.supports_streaming:
+                    raise ValueError("Streaming uploads require the 'custom' or 'plain' PostgreSQL dump format")
                 
-                # Create compressed archive
-                backup_filename = self._generate_backup_filename()
+                # pg_dump writes the archive to stdout, straight to the uploader (and the local copy, if kept)
+                backup_file_path = self._local_copy_path(backup_filename)
+                success, backup_size, stderr = self._upload_pipeline(
+                    self._pg_dump_pipeline(), upload, backup_filename,
+                    env=self._build_pg_env(pgpass_path), tee_path=backup_file_path
+                )
+            else:
                 backup_file_path = self._get_backup_file_path(backup_filename)
                 
-                tar_cmd = ["tar", "-czf", backup_file_path, "-C", str(Path(temp_file_path).parent), 
-                          Path(temp_file_path).name]
-                success, stdout, stderr = self._execute_command(tar_cmd)
-                
-                if not success:
-                    backup_result.status = BackupStatus.FAILED
-                    backup_result.error_message = f"Failed to create archive: {stderr}"
-                    backup_result.end_time = datetime.now()
-                    return backup_result
-                
-                # Clean up temporary file
-                try:
-                    os.unlink(temp_file_path)
-                except OSError:
-                    pass
-                
-                # Update backup result
-                backup_result.status = BackupStatus.SUCCESS
-                backup_result.backup_file_path = backup_file_path
-                backup_result.backup_size_bytes = self._get_file_size(backup_file_path)
-                backup_result.end_time = datetime.now()
-                
-                self.logger.info(f"PostgreSQL backup completed successfully: {backup_file_path}")
-                
+                if self.backup_config.pg_format == "directory":
+                    success, stdout, stderr = self._create_directory_backup(backup_file_path, pgpass_path)
+                elif self.backup_config.pg_format == "plain":
+                    # Stream the SQL script from pg_dump's stdout through the compressor, with no intermediate file
+                    success, stdout, stderr = self._execute_pipeline(
+                        self._pg_dump_pipeline(), stdout_path=backup_file_path, env=self._build_pg_env(pgpass_path)
+                    )
+                elif self.backup_config.pg_format == "copy":
+                    success, stdout, stderr = self._create_copy_backup(backup_file_path)
+                else:
+                    # Custom-format dumps are compressed by pg_dump itself, so it writes the backup file directly
+                    pg_dump_cmd = self._build_pg_dump_command(backup_file_path)
+                    
+                    # Execute pg_dump with .pgpass file
+                    success, stdout, stderr = self._execute_command_with_pgpass(pg_dump_cmd, pgpass_path, discard_stdout=True)
+            
+            if not success:
+                backup_result.status = BackupStatus.FAILED
+                backup_result.error_message = stderr
+                return backup_result
+            
+            # Update backup result
+            backup_result.status = BackupStatus.SUCCESS
+            backup_result.backup_file_path = backup_file_path
+            backup_result.backup_size_bytes = backup_size if upload else self._get_file_size(backup_file_path)
+            backup_result.ftp_uploaded = upload is not None
+            
+            self.logger.info("PostgreSQL backup completed successfully: %s", backup_file_path or backup_filename)
+            
         except Exception as e:
             backup_result.status = BackupStatus.FAILED
             backup_result.error_message = str(e)
-            backup_result.end_time = datetime.now()
-            self.logger.error(f"PostgreSQL backup failed: {e}")
+            self.logger.error("PostgreSQL backup failed: %s", e)
         finally:
+            # A failed or interrupted dump (e.g. COPY losing its connection) leaves a truncated archive
+            if backup_result.status != BackupStatus.SUCCESS:
+                self._remove_partial_backup(backup_file_path)
+            
+            # Single exit point for the end timestamp, whichever way the backup finished
+            backup_result.finalize()
+            
             # Always cleanup .pgpass file
             self._cleanup_pgpass_file()
         
@@ -199,167 +300,278 @@ class PostgreSQLBackupController(BaseBackupController):
         pgpass_path = self._create_pgpass_file()
         
         try:
-            # Extract backup
-            with tempfile.TemporaryDirectory() as temp_dir:
-                extract_cmd = ["tar", "-xzf", backup_file_path, "-C", temp_dir]
-                success, stdout, stderr = self._execute_command(extract_cmd)
-                
-                if not success:
-                    self.logger.error(f"Failed to extract backup: {stderr}")
-                    return False
-                
-                # Find the SQL file
-                sql_file = None
-                for item in Path(temp_dir).iterdir():
-                    if item.suffix == '.sql':
-                        sql_file = item
-                        break
-                
-                if not sql_file:
-                    self.logger.error("No SQL file found in backup")
-                    return False
-                
-                # Check if target database exists, create if it doesn't
-                if not self._ensure_database_exists(pgpass_path):
-                    self.logger.error(f"Failed to ensure database {self.db_config.database} exists")
-                    return False
-                
-                # Build psql command
-                psql_cmd = self._build_psql_command(str(sql_file))
-                
-                # Execute psql with .pgpass file
-                success, stdout, stderr = self._execute_command_with_pgpass(psql_cmd, pgpass_path)
+            if backup_file_path.endswith(self.CUSTOM_EXTENSION):
+                # pg_restore reads the custom-format archive directly
+                return self._restore_with_pg_restore(backup_file_path, pgpass_path)
+            
+            if backup_file_path.endswith(self.COPY_EXTENSIONS):
+                success, stdout, stderr = self._restore_copy_backup(backup_file_path)
                 
                 if success:
                     self.logger.info("PostgreSQL restore completed successfully")
                     return True
                 else:
-                    self.logger.error(f"PostgreSQL restore failed: {stderr}")
+                    self.logger.error("PostgreSQL restore failed: %s", stderr)
                     return False
+            
+            if backup_file_path.endswith(self.PLAIN_EXTENSIONS):
+                # Decompress the SQL script straight into psql
+                return self._restore_sql_stream([self._decompress_command(backup_file_path)], pgpass_path)
+            
+            if backup_file_path.endswith(self.DIRECTORY_EXTENSION):
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    success, stdout, stderr = self._execute_command(["tar", "-xf", backup_file_path, "-C", temp_dir])
+                    
+                    if not success:
+                        self.logger.error("Failed to extract backup: %s", stderr)
+                        return False
+                    
+                    return self._restore_with_pg_restore(os.path.join(temp_dir, "dump"), pgpass_path)
+            
+            # Legacy .tar.gz backups hold a single plain SQL file; stream it out of the tarball into psql
+            return self._restore_sql_stream(
+                [self._gzip_command(decompress=True) + [backup_file_path], ["tar", "-xOf", "-"]], pgpass_path
+            )
                     
         except Exception as e:
-            self.logger.error(f"PostgreSQL restore failed: {e}")
+            self.logger.error("PostgreSQL restore failed: %s", e)
             return False
         finally:
             # Always cleanup .pgpass file
             self._cleanup_pgpass_file()
     
-    def _build_pg_dump_command(self, output_file: str) -> List[str]:
-        """Build pg_dump command with appropriate parameters."""
-        cmd = ["pg_dump"]
+    def _restore_sql_stream(self, commands: List[List[str]], pgpass_path: Optional[str]) -> bool:
+        """Pipe the SQL script written by commands into psql against the (created if needed) target database."""
+        if not self._ensure_database_exists(pgpass_path):
+            self.logger.error("Failed to ensure database %s exists", self.db_config.database)
+            return False
         
-        # Add connection parameters
-        if self.db_config.host:
-            cmd.extend(["--host", self.db_config.host])
+        success, stdout, stderr = self._execute_pipeline(
+            commands + [self._build_psql_command()], env=self._build_pg_env(pgpass_path)
+        )
         
-        if self.db_config.port:
-            cmd.extend(["--port", str(self.db_config.port)])
+        if success:
+            self.logger.info("PostgreSQL restore completed successfully")
+            return True
+        else:
+            self.logger.error("PostgreSQL restore failed: %s", stderr)
+            return False
+    
+    def _connect(self):
+        """Open a psycopg connection to the configured database."""
+        if psycopg is None:
+            raise ValueError("The 'copy' PostgreSQL dump format requires the psycopg package")
+        return psycopg.connect(
+            host=self.db_config.host,
+            port=self.db_config.port,
+            user=self.db_config.username,
+            password=self.db_config.password,
+            dbname=self.db_config.database
+        )
+    
+    def _create_copy_backup(self, backup_file_path: str) -> tuple:
+        """Stream every table's data with binary COPY TO STDOUT into a compressed tar, in one snapshot."""
+        with self._connect() as conn:
+            # One read-only repeatable-read transaction, so all tables come from the same snapshot
+            conn.isolation_level = psycopg.IsolationLevel.REPEATABLE_READ
+            conn.read_only = True
+            
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT table_schema, table_name FROM information_schema.tables "
+                    "WHERE table_type = 'BASE TABLE' AND table_schema NOT IN ('pg_catalog', 'information_schema') "
+                    "ORDER BY table_schema, table_name"
+                )
+                tables = cur.fetchall()
+                
+                with open(backup_file_path, "wb") as output:
+                    compress_cmd = self._compress_command()
+                    compressor = subprocess.Popen(
+                        compress_cmd, executable=resolve_executable(compress_cmd[0]), close_fds=False,
+                        stdin=subprocess.PIPE, stdout=output
+                    )
+                    try:
+                        with tarfile.open(fileobj=compressor.stdin, mode="w|", format=tarfile.PAX_FORMAT) as archive:
+                            for index, (schema, table) in enumerate(tables):
+                                self._add_copy_member(cur, archive, index, schema, table)
+                    finally:
+                        compressor.stdin.close()
+                        returncode = compressor.wait()
         
-        if self.db_config.username:
-            cmd.extend(["--username", self.db_config.username])
+        if returncode != 0:
+            return False, "", f"{compress_cmd[0]} exited with code {returncode}"
+        return True, "", ""
+    
+    def _add_copy_member(self, cur, archive: tarfile.TarFile, index: int, schema: str, table: str):
+        """Append one table's binary COPY data to the tar; the member's PAX headers name the table."""
+        query = sql.SQL("COPY {} TO STDOUT (FORMAT BINARY)").format(sql.Identifier(schema, table))
+        # Tar headers carry the size up front, so the table is spooled before it is added
+        with tempfile.SpooledTemporaryFile(max_size=self.COPY_SPOOL_SIZE) as buffer:
+            with cur.copy(query) as copy:
+                for data in copy:
+                    buffer.write(data)
+            
+            member = tarfile.TarInfo(f"{index:06d}.copy")
+            member.size = buffer.tell()
+            member.pax_headers = {"schema": schema, "table": table}
+            buffer.seek(0)
+            archive.addfile(member, buffer)
+    
+    def _restore_copy_backup(self, backup_file_path: str) -> tuple:
+        """Load every table in a copy backup with binary COPY FROM STDIN, in one transaction."""
+        decompress_cmd = self._decompress_command(backup_file_path)
+        decompressor = subprocess.Popen(
+            decompress_cmd, executable=resolve_executable(decompress_cmd[0]), close_fds=False,
+            stdout=subprocess.PIPE
+        )
+        try:
+            with self._connect() as conn, conn.cursor() as cur, \
+                    tarfile.open(fileobj=decompressor.stdout, mode="r|") as archive:
+                for member in archive:
+                    table = sql.Identifier(member.pax_headers["schema"], member.pax_headers["table"])
+                    source = archive.extractfile(member)
+                    with cur.copy(sql.SQL("COPY {} FROM STDIN (FORMAT BINARY)").format(table)) as copy:
+                        while data := source.read(self.COPY_BLOCK_SIZE):
+                            copy.write(data)
+        finally:
+            decompressor.stdout.close()
+            returncode = decompressor.wait()
         
-        if self.db_config.database:
-            cmd.extend(["--dbname", self.db_config.database])
+        if returncode != 0:
+            return False, "", f"{decompress_cmd[0]} exited with code {returncode}"
+        return True, "", ""
+    
+    def _pg_dump_pipeline(self) -> List[List[str]]:
+        """Commands streaming a dump to stdout; plain SQL is compressed here, custom archives by pg_dump."""
+        if self.backup_config.pg_format == "plain" and not self._pg_dump_compression():
+            return [self._build_pg_dump_command(), self._compress_command()]
+        return [self._build_pg_dump_command()]
+    
+    def _create_directory_backup(self, backup_file_path: str, pgpass_path: Optional[str]) -> tuple:
+        """Dump with parallel directory-format pg_dump and bundle the result into backup_file_path."""
+        # Stage next to the backup file so the dump lands on the backup filesystem, not a small /tmp
+        with tempfile.TemporaryDirectory(prefix="pgbk_", dir=self.backup_config.backup_dir) as temp_dir:
+            pg_dump_cmd = self._build_pg_dump_command(os.path.join(temp_dir, "dump"))
+            success, stdout, stderr = self._execute_command_with_pgpass(pg_dump_cmd, pgpass_path, discard_stdout=True)
+            
+            if not success:
+                return success, stdout, stderr
+            
+            # The table files are compressed by pg_dump, so the tar is not compressed again
+            success, stdout, stderr = self._execute_command(["tar", "-cf", backup_file_path, "-C", temp_dir, "dump"])
+            if not success:
+                stderr = f"Failed to create archive: {stderr}"
+            return success, stdout, stderr
+    
+    def _restore_with_pg_restore(self, dump_path: str, pgpass_path: Optional[str]) -> bool:
+        """Restore a custom-format archive or directory-format dump with pg_restore."""
+        if not self._ensure_database_exists(pgpass_path):
+            self.logger.error("Failed to ensure database %s exists", self.db_config.database)
+            return False
         
-        # Add output file
-        cmd.extend(["--file", output_file])
+        pg_restore_cmd = self._build_pg_restore_command(dump_path)
+        success, stdout, stderr = self._execute_command_with_pgpass(pg_restore_cmd, pgpass_path, discard_stdout=True)
+        
+        if success:
+            self.logger.info("PostgreSQL restore completed successfully")
+            return True
+        else:
+            self.logger.error("PostgreSQL restore failed: %s", stderr)
+            return False
+    
+    @cached_property
+    def _server_args(self) -> List[str]:
+        """Host, port and username flags for the configured server, built once per controller."""
+        values = (self.db_config.host, self.db_config.port, self.db_config.username)
+        return [token for flag, value in zip(self.SERVER_FLAGS, values) if value for token in (flag, str(value))]
+    
+    def _connection_args(self, database: Optional[str] = None) -> List[str]:
+        """Connection flags for the configured server and database, or another database if given."""
+        database = database or self.db_config.database
+        return [*self._server_args, "--dbname", database] if database else list(self._server_args)
+    
+    def _build_pg_dump_command(self, output_file: Optional[str] = None) -> List[str]:
+        """Build pg_dump command with appropriate parameters; without output_file it dumps to stdout."""
+        cmd = ["pg_dump", *self._connection_args()]
+        
+        # Add output file and format; only directory format can dump tables in parallel
+        if output_file:
+            cmd += ("--file", output_file)
+        cmd += ("--format", self.backup_config.pg_format)
+        if self.backup_config.pg_format == "directory":
+            cmd += ("--jobs", str(self._parallel_jobs()))
+        if self.backup_config.compression_level and self.backup_config.pg_format != "plain":
+            # Custom and directory dumps are compressed by pg_dump itself; plain ones by the pipeline
+            cmd += ("--compress", str(min(self.backup_config.compression_level, MAX_GZIP_LEVEL)))
         
         # Add format and options
-        cmd.extend(["--no-privileges", "--no-owner"])
+        cmd += ("--no-privileges", "--no-owner")
         
         # Add additional parameters
-        if self.db_config.additional_params:
-            for key, value in self.db_config.additional_params.items():
-                if isinstance(value, bool) and value:
-                    cmd.append(f"--{key}")
-                elif not isinstance(value, bool):
-                    cmd.extend([f"--{key}", str(value)])
+        cmd += self.db_config.extra_flags
         
         return cmd
     
-    def _build_psql_command(self, input_file: str) -> List[str]:
-        """Build psql command for restore."""
-        cmd = ["psql"]
-        
-        # Add connection parameters
-        if self.db_config.host:
-            cmd.extend(["--host", self.db_config.host])
-        
-        if self.db_config.port:
-            cmd.extend(["--port", str(self.db_config.port)])
-        
-        if self.db_config.username:
-            cmd.extend(["--username", self.db_config.username])
-        
-        if self.db_config.database:
-            cmd.extend(["--dbname", self.db_config.database])
+    def _build_psql_command(self, input_file: Optional[str] = None) -> List[str]:
+        """Build psql command for restore, reading the SQL script from stdin if no file is given."""
+        cmd = ["psql", *self._connection_args()]
         
         # Add input file
-        cmd.extend(["--file", input_file])
+        if input_file:
+            cmd += ("--file", input_file)
         
         # Add options (removed --verbose as it's not supported in all psql versions)
-        cmd.extend(["--quiet"])
+        cmd.append("--quiet")
         
         return cmd
     
+    def _build_pg_restore_command(self, input_file: str) -> List[str]:
+        """Build pg_restore command for custom or directory-format dumps."""
+        return [
+            "pg_restore", *self._connection_args(),
+            # Both dump formats can be restored by several parallel workers
+            "--jobs", str(self._parallel_jobs()),
+            # Match the dump options: ownership and privileges are not restored
+            "--no-privileges", "--no-owner", input_file
+        ]
+    
     def _ensure_database_exists(self, pgpass_path: Optional[str]) -> bool:
         """Ensure the target database exists, create if it doesn't."""
+        if self.database_ensured:
+            self.database_ensured = False
+            return True
+        return self.ensure_databases_exist([self.db_config.database], pgpass_path)
+    
+    def ensure_databases_exist(self, databases: List[str], pgpass_path: Optional[str] = None) -> bool:
+        """Create whichever of databases are missing on this controller's server, in one psql session."""
+        literals = ", ".join("'" + database.replace("'", "''") + "'" for database in databases)
         try:
-            # First, check if database exists by connecting to postgres database
-            original_db = self.db_config.database
-            self.db_config.database = 'postgres'  # Connect to default postgres db
-            
-            # Build command to check if database exists
-            check_cmd = ["psql"]
-            
-            if self.db_config.host:
-                check_cmd.extend(["--host", self.db_config.host])
-            if self.db_config.port:
-                check_cmd.extend(["--port", str(self.db_config.port)])
-            if self.db_config.username:
-                check_cmd.extend(["--username", self.db_config.username])
-            
-            check_cmd.extend(["--dbname", "postgres"])
-            check_cmd.extend(["--command", f"SELECT 1 FROM pg_database WHERE datname='{original_db}';"])
-            
-            # Check if database exists
-            success, stdout, stderr = self._execute_command_with_pgpass(check_cmd, pgpass_path, timeout=10)
-            
-            if success and "1" in stdout:
-                self.logger.info(f"Database {original_db} already exists")
-                self.db_config.database = original_db  # Restore original database name
-                return True
-            
-            # Database doesn't exist, create it
-            self.logger.info(f"Creating database: {original_db}")
-            create_cmd = ["psql"]
-            
-            if self.db_config.host:
-                create_cmd.extend(["--host", self.db_config.host])
-            if self.db_config.port:
-                create_cmd.extend(["--port", str(self.db_config.port)])
-            if self.db_config.username:
-                create_cmd.extend(["--username", self.db_config.username])
-            
-            create_cmd.extend(["--dbname", "postgres"])
-            create_cmd.extend(["--command", f"CREATE DATABASE \"{original_db}\";"])
-            
-            success, stdout, stderr = self._execute_command_with_pgpass(create_cmd, pgpass_path, timeout=30)
+            # \gexec runs each CREATE the SELECT returns, i.e. one per missing database.
+            # CREATE DATABASE cannot run inside a DO block, and -c cannot mix SQL with meta-commands, so the
+            # script goes to psql's stdin.
+            script = (
+                "SELECT format('CREATE DATABASE %I', name) "
+                f"FROM unnest(ARRAY[{literals}]::text[]) AS name "
+                "WHERE NOT EXISTS (SELECT FROM pg_database WHERE datname = name)\\gexec\n"
+            )
+            ensure_cmd = [
+                "psql", *self._connection_args(database="postgres"),
+                "--no-psqlrc", "--set", "ON_ERROR_STOP=1", "--quiet"
+            ]
             
-            # Restore original database name
-            self.db_config.database = original_db
+            success, stdout, stderr = self._execute_command_with_pgpass(
+                ensure_cmd, pgpass_path, timeout=30, input=script, discard_stdout=True
+            )
             
             if success:
-                self.logger.info(f"Database {original_db} created successfully")
+                self.logger.info("Databases present: %s", ', '.join(databases))
                 return True
             else:
-                self.logger.error(f"Failed to create database {original_db}: {stderr}")
+                self.logger.error("Failed to create databases %s: %s", ', '.join(databases), stderr)
                 return False
                 
         except Exception as e:
-            self.logger.error(f"Error ensuring database exists: {e}")
-            # Make sure to restore original database name even on error
-            self.db_config.database = original_db if 'original_db' in locals() else self.db_config.database
+            self.logger.error("Error ensuring databases exist: %s", e)
             return False
     
     def test_connection(self) -> bool:
@@ -369,36 +581,20 @@ class PostgreSQLBackupController(BaseBackupController):
         
         try:
             # Build a simple connection test command using psql
-            cmd = ["psql"]
-            
-            # Add connection parameters
-            if self.db_config.host:
-                cmd.extend(["--host", self.db_config.host])
-            
-            if self.db_config.port:
-                cmd.extend(["--port", str(self.db_config.port)])
-            
-            if self.db_config.username:
-                cmd.extend(["--username", self.db_config.username])
-            
-            if self.db_config.database:
-                cmd.extend(["--dbname", self.db_config.database])
-            
-            # Add simple query to test connection
-            cmd.extend(["--command", "SELECT 1;"])
+            cmd = ["psql", *self._connection_args(), "--command", "SELECT 1;"]
             
             # Execute the test command with .pgpass file
             success, stdout, stderr = self._execute_command_with_pgpass(cmd, pgpass_path, timeout=10)
             
             if success:
-                self.logger.info(f"PostgreSQL connection test successful for database: {self.db_config.database}")
+                self.logger.info("PostgreSQL connection test successful for database: %s", self.db_config.database)
                 return True
             else:
-                self.logger.error(f"PostgreSQL connection test failed: {stderr}")
+                self.logger.error("PostgreSQL connection test failed: %s", stderr)
                 return False
                 
         except Exception as e:
-            self.logger.error(f"PostgreSQL connection test failed with exception: {e}")
+            self.logger.error("PostgreSQL connection test failed with exception: %s", e)
             return False
         finally:
             # Always cleanup .pgpass file
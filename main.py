@@ -17,31 +17,192 @@ Features:
 import os
 import sys
 import logging
+import logging.handlers
 import argparse
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import cache, lru_cache
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 # Add the parent directory to the path so we can import our modules
 sys.path.insert(0, str(Path(__file__).parent))
 
 from models.database_config import (
     MongoDBConfig, PostgreSQLConfig, BackupConfig, 
-    FTPConfig, TelegramConfig
+    FTPConfig, S3Config, TelegramConfig
 )
 from controllers.backup_manager import BackupManager
 from config_loader import ConfigLoader
-# Import services with fallback for missing dependencies
-try:
+from views.backup_view import BackupView, BackupReportView
+
+
+# Services are imported on first use, so commands that need none skip loading ftplib, requests and boto3.
+# The imports are literal so standalone builds (Nuitka) still bundle the service modules.
+def _import_ftp_service():
+    """Import the FTP service class."""
     from services.ftp_service import FTPService
-except ImportError:
-    FTPService = None
+    return FTPService
+
+
+def _import_s3_service():
+    """Import the S3 service class."""
+    from services.s3_service import S3Service
+    return S3Service
 
-try:
+
+def _import_telegram_service():
+    """Import the Telegram service class."""
     from services.telegram_service import TelegramService
-except ImportError:
-    TelegramService = None
-from views.backup_view import BackupView, BackupReportView
+    return TelegramService
+
+
+_SERVICE_IMPORTS = {
+    'FTPService': _import_ftp_service,
+    'S3Service': _import_s3_service,
+    'TelegramService': _import_telegram_service,
+}
+
+
+def _service_class(name: str):
+    """Import a service class once, falling back to None when its dependencies are missing."""
+    if name not in globals():
+        try:
+            globals()[name] = _SERVICE_IMPORTS[name]()
+        except ImportError:
+            globals()[name] = None
+    return globals()[name]
+
+
+def __getattr__(name: str):
+    """Expose the lazily imported service classes as module attributes."""
+    if name in _SERVICE_IMPORTS:
+        return _service_class(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Upper bound on database connection tests run at once by --test
+MAX_PARALLEL_PROBES = 16
+
+
+def _probe_connection(controller) -> Tuple[bool, Optional[str]]:
+    """Test one database connection, returning whether it worked and any error raised."""
+    try:
+        return controller.test_connection(), None
+    except Exception as e:
+        return False, str(e)
+
+
+def _create_service(name: str, config, **kwargs):
+    """Build the named service for config, importing it only when config is set."""
+    if not config:
+        return None
+    service_class = _service_class(name)
+    if not service_class:
+        return None
+    try:
+        return service_class(config, **kwargs)
+    except Exception as e:
+        # A service that cannot be built (e.g. S3 without boto3) is left out, like one that cannot be imported
+        logging.getLogger(__name__).warning("Could not create %s: %s", name, e)
+        return None
+
+
+# Spellings accepted as true for boolean environment variables
+_BOOL_TRUE = frozenset({'true', '1', 'yes', 'on'})
+
+
+def _parse_bool(value: str) -> bool:
+    """Parse a boolean environment variable."""
+    return value.strip().casefold() in _BOOL_TRUE
+
+
+# Environment variable -> (config field, parser, default) for each configuration object
+BACKUP_ENV = {
+    'BACKUP_DIR': ('backup_dir', str, './backups'),
+    'RETENTION_DAYS': ('retention_days', int, 7),
+    'COMPRESSION': ('compression', _parse_bool, True),
+    'COMPRESSION_LEVEL': ('compression_level', int, None),
+    'COMPRESSION_THREADS': ('compression_threads', int, None),
+    'COMPRESSOR': ('compressor', str, 'auto'),
+    'PG_FORMAT': ('pg_format', str, 'custom'),
+    'PARALLEL_JOBS': ('parallel_jobs', int, None),
+    'PARALLEL_COLLECTIONS': ('parallel_collections', int, None),
+    'MAX_PARALLEL_BACKUPS': ('max_parallel_backups', int, None),
+    'STREAM_UPLOADS': ('stream_uploads', _parse_bool, False),
+    'KEEP_LOCAL_COPY': ('keep_local_copy', _parse_bool, False),
+    'DEDUP': ('dedup', _parse_bool, False),
+    'PER_COLLECTION': ('per_collection', _parse_bool, False),
+    'USE_PGPASS_FILE': ('use_pgpass_file', _parse_bool, False),
+}
+
+FTP_ENV = {
+    'FTP_HOST': ('host', str, None),
+    'FTP_PORT': ('port', int, 21),
+    'FTP_USERNAME': ('username', str, ''),
+    'FTP_PASSWORD': ('password', str, ''),
+    'FTP_REMOTE_DIR': ('remote_dir', str, '/backup'),
+    'FTP_SSL': ('ssl_enabled', _parse_bool, False),
+    'FTP_MAX_CONNECTIONS': ('max_connections', int, 1),
+}
+
+S3_ENV = {
+    'S3_BUCKET': ('bucket', str, None),
+    'S3_PREFIX': ('prefix', str, ''),
+    'S3_REGION': ('region', str, None),
+    'S3_ENDPOINT_URL': ('endpoint_url', str, None),
+    'S3_ACCESS_KEY_ID': ('access_key_id', str, None),
+    'S3_SECRET_ACCESS_KEY': ('secret_access_key', str, None),
+    'S3_MAX_CONCURRENCY': ('max_concurrency', int, None),
+}
+
+# YAML `backup:` keys whose BackupConfig field has a different name
+BACKUP_YAML_KEYS = {'directory': 'backup_dir'}
+
+# YAML `backup:` keys that configure the application rather than BackupConfig
+APP_YAML_KEYS = ('log_level', 'verbose')
+
+TELEGRAM_ENV = {
+    'TELEGRAM_BOT_TOKEN': ('bot_token', str, None),
+    'TELEGRAM_CHAT_ID': ('chat_id', str, ''),
+    'TELEGRAM_ENABLED': ('enabled', _parse_bool, True),
+}
+
+
+# Log file location and rotation bounds
+LOG_DIR = Path('logs')
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+
+@lru_cache(maxsize=1)
+def configure_logging():
+    """Configure process-wide logging once, however many apps are created."""
+    log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
+    log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    
+    LOG_DIR.mkdir(exist_ok=True)
+    logging.basicConfig(
+        level=getattr(logging, log_level),
+        format=log_format,
+        handlers=[
+            logging.StreamHandler(),
+            logging.handlers.RotatingFileHandler(
+                LOG_DIR / 'backup.log', maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT
+            )
+        ]
+    )
+
+
+def _load_env(spec: dict) -> dict:
+    """Read the variables in spec into config keyword arguments; unset or empty ones take their default."""
+    settings = {}
+    for name, (field, parse, default) in spec.items():
+        value = os.environ.get(name)
+        settings[field] = parse(value) if value else default
+    return settings
 
 
 class DatabaseBackupApp:
@@ -50,7 +211,9 @@ class DatabaseBackupApp:
     def __init__(self, config_file: Optional[str] = None):
         """Initialize the application."""
         self.config_file = config_file
-        self.setup_logging()
+        # One loader for databases and services; it reparses the file only when it changes
+        self.config_loader = ConfigLoader(config_file)
+        configure_logging()
         self.logger = logging.getLogger(self.__class__.__name__)
         
         # Load configuration
@@ -58,18 +221,20 @@ class DatabaseBackupApp:
         
         # Initialize components
         self.backup_manager = BackupManager(self.backup_config)
-        self.ftp_service = FTPService(self.ftp_config) if (self.ftp_config and FTPService) else None
-        self.telegram_service = TelegramService(self.telegram_config) if (self.telegram_config and TelegramService) else None
+        self.ftp_service = _create_service('FTPService', self.ftp_config)
+        self.s3_service = _create_service('S3Service', self.s3_config)
+        # Notifications are sent from a background thread so they stay off the backup path
+        self.telegram_service = _create_service('TelegramService', self.telegram_config, background=True)
         self.view = BackupView(verbose=self.verbose)
         self.report_view = BackupReportView()
+        self._check_destinations()
         
         self.logger.info("Database backup application initialized")
     
     def load_databases_from_config(self):
         """Load databases from configuration file or environment variables."""
         try:
-            config_loader = ConfigLoader(self.config_file)
-            database_configs = config_loader.create_database_configs()
+            database_configs = self.config_loader.create_database_configs()
             
             for config, controller_id in database_configs:
                 self.backup_manager.add_database(config, controller_id)
@@ -85,131 +250,198 @@ class DatabaseBackupApp:
             raise
     
     def load_services_from_config(self):
-        """Load FTP and Telegram services from configuration file."""
+        """Load FTP, S3 and Telegram services and backup settings from configuration file."""
+        # Each section is guarded on its own, so one broken service cannot skip the others
+        for section, load_section in (
+            ("FTP", self._load_ftp_from_config),
+            ("S3", self._load_s3_from_config),
+            ("Telegram", self._load_telegram_from_config),
+        ):
+            try:
+                load_section()
+            except Exception as e:
+                # Don't raise - services are optional
+                self.logger.warning("Failed to load %s configuration from YAML: %s", section, e)
+        
         try:
-            config_loader = ConfigLoader(self.config_file)
-            
-            # Load FTP configuration
-            ftp_config_data = config_loader.load_ftp_config()
-            if ftp_config_data:
-                from models.database_config import FTPConfig
-                ftp_config = FTPConfig(
-                    host=ftp_config_data.get('host', ''),
-                    port=ftp_config_data.get('port', 21),
-                    username=ftp_config_data.get('username', ''),
-                    password=ftp_config_data.get('password', ''),
-                    remote_dir=ftp_config_data.get('remote_dir', '/'),
-                    ssl_enabled=ftp_config_data.get('ssl', False)
-                )
-                self.ftp_config = ftp_config
-                self.ftp_service = FTPService(ftp_config) if FTPService else None
-                self.logger.info("Loaded FTP configuration from YAML")
+            self._load_backup_from_config()
+        except Exception as e:
+            self.logger.error("Failed to load backup configuration from YAML: %s", e)
+        
+        self._check_destinations()
+    
+    def _load_ftp_from_config(self):
+        """Load the FTP service from the YAML ftp section."""
+        ftp_config_data = self.config_loader.load_ftp_config()
+        if ftp_config_data:
+            ftp_config = FTPConfig(
+                host=ftp_config_data.get('host', ''),
+                port=ftp_config_data.get('port', 21),
+                username=ftp_config_data.get('username', ''),
+                password=ftp_config_data.get('password', ''),
+                remote_dir=ftp_config_data.get('remote_dir', '/'),
+                ssl_enabled=ftp_config_data.get('ssl', False),
+                max_connections=ftp_config_data.get('max_connections', 1)
+            )
+            self.ftp_config = ftp_config
+            self.ftp_service = _create_service('FTPService', ftp_config)
+            self.logger.info("Loaded FTP configuration from YAML")
+    
+    def _load_s3_from_config(self):
+        """Load the S3 service from the YAML s3 section."""
+        s3_config_data = self.config_loader.load_s3_config()
+        if s3_config_data:
+            s3_config = S3Config(
+                bucket=s3_config_data.get('bucket', ''),
+                prefix=s3_config_data.get('prefix', ''),
+                region=s3_config_data.get('region'),
+                endpoint_url=s3_config_data.get('endpoint_url'),
+                access_key_id=s3_config_data.get('access_key_id'),
+                secret_access_key=s3_config_data.get('secret_access_key'),
+                max_concurrency=s3_config_data.get('max_concurrency')
+            )
+            self.s3_config = s3_config
+            self.s3_service = _create_service('S3Service', s3_config)
+            self.logger.info("Loaded S3 configuration from YAML")
+    
+    def _load_telegram_from_config(self):
+        """Load the Telegram service from the YAML telegram section."""
+        telegram_config_data = self.config_loader.load_telegram_config()
+        if telegram_config_data and telegram_config_data.get('enabled', False):
+            telegram_config = TelegramConfig(
+                bot_token=telegram_config_data.get('bot_token', ''),
+                chat_id=telegram_config_data.get('chat_id', ''),
+                enabled=telegram_config_data.get('enabled', False)
+            )
+            self.telegram_config = telegram_config
+            if self.telegram_service:
+                self.telegram_service.close()
+            self.telegram_service = _create_service('TelegramService', telegram_config, background=True)
+            self.logger.info("Loaded Telegram configuration from YAML")
+    
+    def _load_backup_from_config(self):
+        """Apply the YAML backup section; its keys override the environment, unset ones keep it."""
+        backup_config_data = self.config_loader.load_backup_config()
+        if backup_config_data:
+            self._apply_app_settings(backup_config_data)
             
-            # Load Telegram configuration
-            telegram_config_data = config_loader.load_telegram_config()
-            if telegram_config_data and telegram_config_data.get('enabled', False):
-                from models.database_config import TelegramConfig
-                telegram_config = TelegramConfig(
-                    bot_token=telegram_config_data.get('bot_token', ''),
-                    chat_id=telegram_config_data.get('chat_id', ''),
-                    enabled=telegram_config_data.get('enabled', False)
-                )
-                self.telegram_config = telegram_config
-                self.telegram_service = TelegramService(telegram_config) if TelegramService else None
-                self.logger.info("Loaded Telegram configuration from YAML")
+            field_names = {field.name for field in dataclasses.fields(BackupConfig)}
+            overrides = {}
+            for key, value in backup_config_data.items():
+                field_name = BACKUP_YAML_KEYS.get(key, key)
+                if field_name in field_names:
+                    overrides[field_name] = value
+                elif key not in APP_YAML_KEYS:
+                    self.logger.warning("Ignoring unknown backup setting in YAML: %s", key)
             
-            # Load backup configuration
-            backup_config_data = config_loader.load_backup_config()
-            if backup_config_data:
-                from models.database_config import BackupConfig
-                backup_config = BackupConfig(
-                    backup_dir=backup_config_data.get('directory', './backups'),
-                    retention_days=backup_config_data.get('retention_days', 7),
-                    compression=backup_config_data.get('compression', True)
-                )
-                self.backup_config = backup_config
-                self.logger.info("Loaded backup configuration from YAML")
-                
-        except Exception as e:
-            self.logger.error(f"Failed to load services from configuration: {e}")
-            # Don't raise - services are optional
-    
-    def setup_logging(self):
-        """Setup logging configuration."""
-        log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
-        log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        
-        logging.basicConfig(
-            level=getattr(logging, log_level),
-            format=log_format,
-            handlers=[
-                logging.StreamHandler(),
-                logging.FileHandler('logs/backup.log')
-            ]
-        )
+            self.override_backup_config(**overrides)
+            self.logger.info("Loaded backup configuration from YAML")
+    
+    def _apply_app_settings(self, settings: dict):
+        """Apply the YAML log_level and verbose settings; verbose adds to --verbose/VERBOSE, never turns it off."""
+        log_level = settings.get('log_level')
+        if log_level:
+            logging.getLogger().setLevel(str(log_level).upper())
+        if settings.get('verbose'):
+            self.verbose = True
+            self.view.verbose = True
+    
+    def override_backup_config(self, **overrides):
+        """Replace backup settings and rebuild the backup manager so its controllers use them."""
+        self.backup_config = dataclasses.replace(self.backup_config, **overrides)
+        self._rebuild_backup_manager()
+    
+    def _check_destinations(self):
+        """Warn about configured destinations that backups will not reach."""
+        if (self.s3_service and self.ftp_service and self.backup_config.stream_uploads
+                and not self.backup_config.keep_local_copy):
+            self.logger.warning("S3 is configured but stream_uploads sends backups only to FTP; "
+                                "enable keep_local_copy to also upload them to S3")
+    
+    def _rebuild_backup_manager(self):
+        """Rebuild the backup manager for the current backup config, keeping the databases already added."""
+        previous = self.backup_manager
+        self.backup_manager = BackupManager(self.backup_config)
+        for controller_id, controller in previous.controllers.items():
+            self.backup_manager.add_database(controller.db_config, controller_id)
     
     def load_config(self, config_file: Optional[str] = None):
         """Load configuration from environment variables and config file."""
-        # Backup configuration
-        self.backup_config = BackupConfig(
-            backup_dir=os.getenv('BACKUP_DIR', './backups'),
-            retention_days=int(os.getenv('RETENTION_DAYS', '7')),
-            compression=os.getenv('COMPRESSION', 'true').lower() == 'true'
-        )
-        
-        # FTP configuration
-        ftp_host = os.getenv('FTP_HOST')
-        if ftp_host:
-            self.ftp_config = FTPConfig(
-                host=ftp_host,
-                port=int(os.getenv('FTP_PORT', '21')),
-                username=os.getenv('FTP_USERNAME', ''),
-                password=os.getenv('FTP_PASSWORD', ''),
-                remote_dir=os.getenv('FTP_REMOTE_DIR', '/backup'),
-                ssl_enabled=os.getenv('FTP_SSL', 'false').lower() == 'true'
-            )
-        else:
-            self.ftp_config = None
-        
-        # Telegram configuration
-        telegram_token = os.getenv('TELEGRAM_BOT_TOKEN')
-        if telegram_token:
-            self.telegram_config = TelegramConfig(
-                bot_token=telegram_token,
-                chat_id=os.getenv('TELEGRAM_CHAT_ID', ''),
-                enabled=os.getenv('TELEGRAM_ENABLED', 'true').lower() == 'true'
-            )
-        else:
-            self.telegram_config = None
+        self.backup_config = BackupConfig(**_load_env(BACKUP_ENV))
+        
+        # FTP, S3 and Telegram are only configured when their key variable is set
+        ftp_settings = _load_env(FTP_ENV)
+        self.ftp_config = FTPConfig(**ftp_settings) if ftp_settings['host'] else None
+        
+        s3_settings = _load_env(S3_ENV)
+        self.s3_config = S3Config(**s3_settings) if s3_settings['bucket'] else None
+        
+        telegram_settings = _load_env(TELEGRAM_ENV)
+        self.telegram_config = TelegramConfig(**telegram_settings) if telegram_settings['bot_token'] else None
         
         # Application settings
-        self.verbose = os.getenv('VERBOSE', 'false').lower() == 'true'
+        self.verbose = _parse_bool(os.getenv('VERBOSE', 'false'))
     
     
-    def backup_database(self, controller_id: str) -> bool:
-        """Backup a specific database."""
+    def backup_database(self, controller_id: str, incremental: bool = False) -> bool:
+        """Backup a specific database, only its changes since the last backup if incremental."""
         try:
-            self.view.display_backup_started(
-                self.backup_manager.controllers[controller_id].db_config.database,
-                self.backup_manager.controllers[controller_id].db_config.db_type.value
-            )
+            self._announce_backup(controller_id)
             
-            # Notify Telegram
-            if self.telegram_service:
-                self.telegram_service.notify_backup_started(
-                    self.backup_manager.controllers[controller_id].db_config.database,
-                    self.backup_manager.controllers[controller_id].db_config.db_type.value
-                )
+            controller = self.backup_manager.controllers[controller_id]
+            if self.backup_config.stream_uploads and self.ftp_service and controller.supports_streaming:
+                # Stream the backup straight to the FTP server without staging it in the backup directory
+                with self._ftp_session():
+                    result = self.backup_manager.backup_database(
+                        controller_id, upload=self.stream_to_ftp, incremental=incremental
+                    )
+                
+                self.view.display_backup_result(result)
+                
+                # The stream only reached FTP; S3 gets the local copy, when one was kept
+                if self.s3_service and result.is_successful and result.backup_file_path:
+                    self.upload_files_to_s3([result.backup_file_path])
+                
+                # A local copy written alongside the stream is kept as deduplicated chunks like any other
+                self.backup_manager.deduplicate_backup(result)
+                
+                # Notify Telegram
+                if self.telegram_service:
+                    self.telegram_service.notify_backup_completed(result)
+                
+                return result.is_successful
             
             # Perform backup
-            result = self.backup_manager.backup_database(controller_id)
+            result = self.backup_manager.backup_database(controller_id, incremental=incremental)
+            return self._finish_backup(controller_id, result)
             
+        except Exception as e:
+            self.view.display_error(str(e), f"Backing up {controller_id}")
+            if self.telegram_service:
+                self.telegram_service.notify_error(str(e), f"Backing up {controller_id}")
+            return False
+    
+    def _announce_backup(self, controller_id: str):
+        """Display and notify the start of a backup."""
+        db_config = self.backup_manager.controllers[controller_id].db_config
+        self.view.display_backup_started(db_config.database, db_config.db_type)
+        
+        # Notify Telegram
+        if self.telegram_service:
+            self.telegram_service.notify_backup_started(db_config.database, db_config.db_type)
+    
+    def _finish_backup(self, controller_id: str, result, shipped: bool = False) -> bool:
+        """Display, upload (unless already shipped), deduplicate and notify a completed local backup."""
+        try:
             # Display result
             self.view.display_backup_result(result)
             
-            # Upload to FTP if configured
-            if result.is_successful and result.backup_file_path and self.ftp_service:
-                self.upload_to_ftp(result.backup_file_path)
+            # Upload to FTP and S3 if configured
+            if not shipped and result.is_successful and result.backup_file_path:
+                self._ship_backups([result.backup_file_path])
+            
+            # Keep the local copy as deduplicated chunks once the full archive has been shipped
+            self.backup_manager.deduplicate_backup(result)
             
             # Notify Telegram
             if self.telegram_service:
@@ -224,12 +456,27 @@ class DatabaseBackupApp:
             return False
     
     def backup_all_databases(self) -> List[bool]:
-        """Backup all managed databases."""
-        results = []
+        """Backup all managed databases, running the dumps concurrently."""
+        controller_ids = list(self.backup_manager.controllers)
         
-        for controller_id in self.backup_manager.controllers:
-            success = self.backup_database(controller_id)
-            results.append(success)
+        if self.backup_config.stream_uploads and self.ftp_service:
+            # Streamed uploads share one FTP connection, so they run one at a time
+            with self._ftp_session():
+                results = [self.backup_database(controller_id) for controller_id in controller_ids]
+        else:
+            for controller_id in controller_ids:
+                self._announce_backup(controller_id)
+            
+            # Dumps run in parallel; the finished archives are then shipped together
+            backup_results = self.backup_manager.backup_all_databases()
+            self._ship_backups([
+                result.backup_file_path for result in backup_results
+                if result.is_successful and result.backup_file_path
+            ])
+            results = [
+                self._finish_backup(controller_id, result, shipped=True)
+                for controller_id, result in zip(controller_ids, backup_results)
+            ]
         
         # Display summary
         summary = self.backup_manager.get_backup_summary()
@@ -247,13 +494,14 @@ class DatabaseBackupApp:
             self.view.display_warning("FTP not configured")
             return False
         
+        filename = os.path.basename(file_path)
         try:
-            with self.ftp_service:
+            with self._ftp_session():
                 success = self.ftp_service.upload_file(file_path)
-                self.view.display_ftp_upload(Path(file_path).name, success)
+                self.view.display_ftp_upload(filename, success)
                 
                 if self.telegram_service:
-                    self.telegram_service.notify_ftp_upload(Path(file_path).name, success)
+                    self.telegram_service.notify_ftp_upload(filename, success)
                 
                 return success
                 
@@ -261,17 +509,76 @@ class DatabaseBackupApp:
             self.view.display_error(str(e), "FTP upload")
             return False
     
+    def upload_files_to_ftp(self, file_paths: List[str]) -> Dict[str, bool]:
+        """Upload several files to the FTP server, over parallel sessions when configured."""
+        try:
+            with self._ftp_session():
+                outcomes = self.ftp_service.upload_files(file_paths)
+        except Exception as e:
+            self.view.display_error(str(e), "FTP upload")
+            return {file_path: False for file_path in file_paths}
+        
+        for file_path, success in outcomes.items():
+            self.view.display_ftp_upload(os.path.basename(file_path), success)
+        
+        # One message per uploaded backup, posted together rather than one after another
+        if self.telegram_service:
+            self.telegram_service.notify_ftp_uploads({
+                os.path.basename(file_path): success for file_path, success in outcomes.items()
+            })
+        return outcomes
+    
+    def _ship_backups(self, file_paths: List[str]):
+        """Upload finished backups to every configured destination, S3 alongside FTP."""
+        if not file_paths:
+            return
+        
+        # Both destinations read the same just-written files from the page cache, so overlap them
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            s3_uploads = executor.submit(self.upload_files_to_s3, file_paths) if self.s3_service else None
+            if self.ftp_service:
+                self.upload_files_to_ftp(file_paths)
+            if s3_uploads:
+                s3_uploads.result()
+    
+    def upload_files_to_s3(self, file_paths: List[str]) -> Dict[str, bool]:
+        """Upload several files to S3 in parallel."""
+        outcomes = self.s3_service.upload_files(file_paths)
+        for file_path, success in outcomes.items():
+            filename = os.path.basename(file_path)
+            if success:
+                self.view.display_info(f"S3 UPLOADED: {filename}")
+            else:
+                self.view.display_error(f"S3 upload failed: {filename}")
+        return outcomes
+    
+    def _ftp_session(self):
+        """Context for an FTP session: reuses the one a batch holds open, else opens and closes its own."""
+        if self.ftp_service.is_connected:
+            self.ftp_service.keepalive()
+            return nullcontext(self.ftp_service)
+        return self.ftp_service
+    
+    def stream_to_ftp(self, stream, filename: str) -> bool:
+        """Upload a backup stream to the connected FTP server."""
+        success = self.ftp_service.upload_stream(stream, filename)
+        self.view.display_ftp_upload(filename, success)
+        
+        if self.telegram_service:
+            self.telegram_service.notify_ftp_upload(filename, success)
+        
+        return success
+    
     def cleanup_old_backups(self):
         """Clean up old backup files."""
         try:
-            cleanup_results = self.backup_manager.cleanup_all_backups()
+            cleanup_results, freed_bytes = self.backup_manager.cleanup_all_backups()
             self.view.display_cleanup_results(cleanup_results)
             
-            # Calculate total deleted files and size
             total_deleted = sum(len(files) for files in cleanup_results.values())
             
             if self.telegram_service and total_deleted > 0:
-                self.telegram_service.notify_cleanup(total_deleted, 0)  # Size calculation would need file stats
+                self.telegram_service.notify_cleanup(total_deleted, freed_bytes / (1024 * 1024))
             
         except Exception as e:
             self.view.display_error(str(e), "Cleanup")
@@ -328,7 +635,7 @@ class DatabaseBackupApp:
             
             # Perform restore
             self.view.display_info(f"Starting restore from: {backup_file_path}")
-            success = controller.restore_backup(backup_file_path)
+            success = self.backup_manager.restore_database(controller_id, backup_file_path)
             
             if success:
                 self.view.display_info("✅ Restore completed successfully!")
@@ -363,7 +670,7 @@ class DatabaseBackupApp:
         for controller_id, controller in self.backup_manager.controllers.items():
             db_config = controller.db_config
             self.view.display_info(f"  • {controller_id}")
-            self.view.display_info(f"    Type: {db_config.db_type.value}")
+            self.view.display_info(f"    Type: {db_config.db_type}")
             self.view.display_info(f"    Host: {db_config.host}")
             self.view.display_info(f"    Database: {db_config.database}")
             self.view.display_info("")
@@ -374,15 +681,20 @@ class DatabaseBackupApp:
         
         # Test database connections
         if hasattr(self, 'backup_manager') and self.backup_manager.controllers:
-            for controller_id, controller in self.backup_manager.controllers.items():
-                try:
-                    self.view.display_info(f"Testing {controller.db_config.db_type.value} connection: {controller.db_config.database}")
-                    if controller.test_connection():
-                        self.view.display_info(f"Database {controller_id} ({controller.db_config.database}): OK")
-                    else:
-                        self.view.display_error(f"Database {controller_id} ({controller.db_config.database}): FAILED")
-                except Exception as e:
-                    self.view.display_error(f"Database {controller_id} connection test failed: {e}")
+            controllers = self.backup_manager.controllers
+            self.view.display_info(f"Testing {len(controllers)} database connections")
+            
+            # Probes are independent network round trips, so run them at once and report in order
+            with ThreadPoolExecutor(max_workers=min(len(controllers), MAX_PARALLEL_PROBES)) as executor:
+                probes = list(executor.map(_probe_connection, controllers.values()))
+            
+            for (controller_id, controller), (connected, error) in zip(controllers.items(), probes):
+                if error:
+                    self.view.display_error(f"Database {controller_id} connection test failed: {error}")
+                elif connected:
+                    self.view.display_info(f"Database {controller_id} ({controller.db_config.database}): OK")
+                else:
+                    self.view.display_error(f"Database {controller_id} ({controller.db_config.database}): FAILED")
         else:
             self.view.display_warning("No databases configured")
         
@@ -396,6 +708,13 @@ class DatabaseBackupApp:
         else:
             self.view.display_warning("FTP not configured")
         
+        # Test S3
+        if self.s3_service:
+            if self.s3_service.test_connection():
+                self.view.display_info("S3 connection: OK")
+            else:
+                self.view.display_error("S3 connection failed")
+        
         # Test Telegram
         if self.telegram_service:
             if self.telegram_service.test_connection():
@@ -404,16 +723,30 @@ class DatabaseBackupApp:
                 self.view.display_error("Telegram connection failed")
         else:
             self.view.display_warning("Telegram not configured")
+    
+    def close(self):
+        """Send any queued notifications before exiting."""
+        if self.telegram_service:
+            self.telegram_service.close()
 
 
-def main():
-    """Main entry point."""
+# Arguments that select a command; without any of them main() only prints help
+ACTION_ARGS = ('backup_all', 'backup', 'restore', 'list_files', 'cleanup', 'report', 'test', 'list_controllers')
+
+
+@cache
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser once."""
     parser = argparse.ArgumentParser(description='Database Backup System')
     parser.add_argument('--config', default='config.yaml',
                        help='Configuration file path (default: config.yaml)')
     parser.add_argument('--verbose', '-v', action='store_true', help='Verbose output')
     parser.add_argument('--backup-all', action='store_true', help='Backup all databases')
+    parser.add_argument('--max-parallel', type=int,
+                       help='With --backup-all, how many databases to back up at once (1 runs them sequentially)')
     parser.add_argument('--backup', help='Backup specific database controller ID')
+    parser.add_argument('--incremental', action='store_true',
+                       help='With --backup, only back up changes since the last backup (MongoDB oplog)')
     parser.add_argument('--list-files', help='List backup files for controller ID')
     parser.add_argument('--cleanup', action='store_true', help='Clean up old backups')
     parser.add_argument('--report', help='Generate report (optional output file)')
@@ -422,19 +755,35 @@ def main():
     parser.add_argument('--restore', help='Restore from backup file path')
     parser.add_argument('--target-controller', help='Target controller ID for restore (required with --restore)')
     parser.add_argument('--target-database', help='Target database name (optional, overrides controller config)')
-    
+    return parser
+
+
+def main():
+    """Main entry point."""
+    parser = build_parser()
     args = parser.parse_args()
     
+    # Nothing to run: show help without loading configuration or setting up the app
+    if all(getattr(args, name) in (None, False) for name in ACTION_ARGS):
+        parser.print_help()
+        return
+    
     # Set verbose mode
     if args.verbose:
         os.environ['VERBOSE'] = 'true'
     
+    app = None
     try:
         app = DatabaseBackupApp(args.config)
         
-        # Always load databases and services from configuration
-        app.load_databases_from_config()
+        # Always load services and databases from configuration; services first, so the YAML
+        # backup settings are in place before controllers are created
         app.load_services_from_config()
+        app.load_databases_from_config()
+        
+        # Command-line settings win over both the environment and YAML
+        if args.max_parallel:
+            app.override_backup_config(max_parallel_backups=args.max_parallel)
         
         if args.backup_all:
             results = app.backup_all_databases()
@@ -445,7 +794,7 @@ def main():
                 print("✅ All backups completed successfully!")
         
         elif args.backup:
-            success = app.backup_database(args.backup)
+            success = app.backup_database(args.backup, incremental=args.incremental)
             if not success:
                 print("❌ Backup failed!")
                 sys.exit(0)
@@ -479,9 +828,6 @@ def main():
         elif args.list_controllers:
             app.list_controllers()
         
-        else:
-            parser.print_help()
-        
         
     
     except KeyboardInterrupt:
@@ -490,6 +836,9 @@ def main():
     except Exception as e:
         print(f"Application error: {e}")
         sys.exit(1)
+    finally:
+        if app:
+            app.close()
 
 
 if __name__ == '__main__':
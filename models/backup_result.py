@@ -1,21 +1,30 @@
 """
 Backup result models for tracking backup operations.
 """
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional, List
-from enum import Enum
+from enum import StrEnum
 
 
-class BackupStatus(Enum):
-    """Backup operation status."""
+# File extensions of the archives written by the backup controllers
+BACKUP_FILE_EXTENSIONS = (
+    ".tar.gz",
+    ".archive.zst", ".archive.gz", ".oplog.bson.zst", ".oplog.bson.gz", ".collections.tar",
+    ".dump", ".dir.tar", ".sql.zst", ".sql.gz", ".copy.tar.zst", ".copy.tar.gz",
+    ".chunks.json"
+)
+
+
+class BackupStatus(StrEnum):
+    """Backup operation status; members are their string values."""
     SUCCESS = "success"
     FAILED = "failed"
     IN_PROGRESS = "in_progress"
     CANCELLED = "cancelled"
 
 
-@dataclass
+@dataclass(slots=True)
 class BackupResult:
     """Result of a backup operation."""
     backup_id: str
@@ -29,10 +38,21 @@ class BackupResult:
     error_message: Optional[str] = None
     ftp_uploaded: bool = False
     telegram_notified: bool = False
+    # Filled in by finalize() once the backup has ended, so reports don't recompute them
+    _duration_seconds: Optional[float] = field(default=None, init=False, repr=False, compare=False)
+    _is_successful: Optional[bool] = field(default=None, init=False, repr=False, compare=False)
+    
+    def finalize(self, end_time: Optional[datetime] = None):
+        """Record the end time (default now) and cache the duration and outcome."""
+        self.end_time = end_time or datetime.now()
+        self._duration_seconds = (self.end_time - self.start_time).total_seconds()
+        self._is_successful = self.status == BackupStatus.SUCCESS
     
     @property
     def duration_seconds(self) -> Optional[float]:
-        """Calculate backup duration in seconds."""
+        """Backup duration in seconds."""
+        if self._duration_seconds is not None:
+            return self._duration_seconds
         if self.end_time and self.start_time:
             return (self.end_time - self.start_time).total_seconds()
         return None
@@ -40,6 +60,8 @@ class BackupResult:
     @property
     def is_successful(self) -> bool:
         """Check if backup was successful."""
+        if self._is_successful is not None:
+            return self._is_successful
         return self.status == BackupStatus.SUCCESS
     
     def to_dict(self) -> dict:
@@ -48,7 +70,7 @@ class BackupResult:
             'backup_id': self.backup_id,
             'database_type': self.database_type,
             'database_name': self.database_name,
-            'status': self.status.value,
+            'status': self.status,
             'start_time': self.start_time.isoformat(),
             'end_time': self.end_time.isoformat() if self.end_time else None,
             'backup_file_path': self.backup_file_path,
@@ -60,7 +82,7 @@ class BackupResult:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class BackupSummary:
     """Summary of backup operations."""
     total_backups: int
@@ -89,3 +111,32 @@ class BackupSummary:
             'success_rate': self.success_rate
         }
 
+
+@dataclass(slots=True)
+class BackupFileInfo:
+    """Backup file found on disk; timestamps are kept as raw epoch seconds."""
+    filename: str
+    path: str
+    size_bytes: int
+    created_timestamp: float
+    modified_timestamp: float
+    
+    @property
+    def created_time(self) -> datetime:
+        """Creation time as a datetime."""
+        return datetime.fromtimestamp(self.created_timestamp)
+    
+    @property
+    def modified_time(self) -> datetime:
+        """Modification time as a datetime."""
+        return datetime.fromtimestamp(self.modified_timestamp)
+    
+    def to_dict(self) -> dict:
+        """Convert to dictionary for serialization."""
+        return {
+            'filename': self.filename,
+            'path': self.path,
+            'size_bytes': self.size_bytes,
+            'created_time': self.created_time.isoformat(),
+            'modified_time': self.modified_time.isoformat()
+        }
@@ -2,16 +2,18 @@
 Database configuration models for backup system.
 """
 from dataclasses import dataclass
-from typing import Optional, Dict, Any
-from enum import Enum
+from functools import cached_property
+from typing import Optional, Dict, Any, Tuple
+from enum import StrEnum
 
 
-class DatabaseType(Enum):
-    """Supported database types."""
+class DatabaseType(StrEnum):
+    """Supported database types; members are their string values."""
     MONGODB = "mongodb"
     POSTGRESQL = "postgresql"
 
 
+# Left without slots: extra_flags caches into the instance __dict__, and there is one per database
 @dataclass
 class DatabaseConfig:
     """Base database configuration."""
@@ -32,6 +34,18 @@ class DatabaseConfig:
             raise ValueError("Database name is required")
         if self.port <= 0 or self.port > 65535:
             raise ValueError("Port must be between 1 and 65535")
+    
+    @cached_property
+    def extra_flags(self) -> Tuple[str, ...]:
+        """Command-line flags for additional_params, flattened once; true booleans become bare flags."""
+        flags = []
+        for key, value in (self.additional_params or {}).items():
+            if isinstance(value, bool):
+                if value:
+                    flags.append(f"--{key}")
+            else:
+                flags.extend((f"--{key}", str(value)))
+        return tuple(flags)
 
 
 @dataclass
@@ -72,13 +86,27 @@ class PostgreSQLConfig(DatabaseConfig):
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class BackupConfig:
     """Backup configuration settings."""
     backup_dir: str
     retention_days: int = 7
     compression: bool = True
+    compression_level: Optional[int] = None
+    compression_threads: Optional[int] = None
+    compressor: str = "auto"
     timestamp_format: str = "%Y-%m-%d-%H-%M-%S"
+    # custom (.dump) and directory (.dir.tar) are compressed by pg_dump and never recompressed;
+    # plain (.sql.*) and copy (.copy.tar.*) go through the external compressor
+    pg_format: str = "custom"
+    parallel_jobs: Optional[int] = None
+    parallel_collections: Optional[int] = None
+    max_parallel_backups: Optional[int] = None
+    stream_uploads: bool = False
+    keep_local_copy: bool = False
+    dedup: bool = False
+    per_collection: bool = False
+    use_pgpass_file: bool = False
     
     def __post_init__(self):
         """Validate backup configuration."""
@@ -86,9 +114,25 @@ class BackupConfig:
             raise ValueError("Retention days must be at least 1")
         if not self.backup_dir:
             raise ValueError("Backup directory is required")
+        if self.pg_format not in ("custom", "directory", "plain", "copy"):
+            raise ValueError("PostgreSQL dump format must be 'custom', 'directory', 'plain' or 'copy'")
+        if self.compressor not in ("auto", "zstd", "gzip"):
+            raise ValueError("Compressor must be 'auto', 'zstd' or 'gzip'")
+        if self.compression_level is not None and not 1 <= self.compression_level <= 19:
+            raise ValueError("Compression level must be between 1 and 19")
+        if self.compressor == "gzip" and self.compression_level is not None and self.compression_level > 9:
+            raise ValueError("Compression level must be between 1 and 9 for gzip")
+        if self.compression_threads is not None and self.compression_threads < 1:
+            raise ValueError("Compression threads must be at least 1")
+        if self.parallel_jobs is not None and self.parallel_jobs < 1:
+            raise ValueError("Parallel jobs must be at least 1")
+        if self.parallel_collections is not None and self.parallel_collections < 1:
+            raise ValueError("Parallel collections must be at least 1")
+        if self.max_parallel_backups is not None and self.max_parallel_backups < 1:
+            raise ValueError("Max parallel backups must be at least 1")
 
 
-@dataclass
+@dataclass(slots=True)
 class FTPConfig:
     """FTP server configuration."""
     host: str
@@ -97,6 +141,7 @@ class FTPConfig:
     remote_dir: str
     port: int = 21
     ssl_enabled: bool = False
+    max_connections: int = 1
     
     def __post_init__(self):
         """Validate FTP configuration."""
@@ -108,9 +153,30 @@ class FTPConfig:
             raise ValueError("FTP password is required")
         if not self.remote_dir:
             raise ValueError("FTP remote directory is required")
+        if self.max_connections < 1:
+            raise ValueError("FTP max connections must be at least 1")
 
 
-@dataclass
+@dataclass(slots=True)
+class S3Config:
+    """S3 (or S3-compatible) upload configuration."""
+    bucket: str
+    prefix: str = ""
+    region: Optional[str] = None
+    endpoint_url: Optional[str] = None
+    access_key_id: Optional[str] = None
+    secret_access_key: Optional[str] = None
+    max_concurrency: Optional[int] = None
+    
+    def __post_init__(self):
+        """Validate S3 configuration."""
+        if not self.bucket:
+            raise ValueError("S3 bucket is required")
+        if self.max_concurrency is not None and self.max_concurrency < 1:
+            raise ValueError("S3 max concurrency must be at least 1")
+
+
+@dataclass(slots=True)
 class TelegramConfig:
     """Telegram notification configuration."""
     bot_token: str
@@ -0,0 +1,166 @@
+"""
+Content-addressed chunk store for deduplicating successive backup archives.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator
+
+# Optional accelerators: content-defined chunking and SIMD hashing
+try:
+    from fastcdc import fastcdc
+except ImportError:
+    fastcdc = None
+
+try:
+    from blake3 import blake3
+except ImportError:
+    blake3 = None
+
+
+# Suffix of the manifests that replace deduplicated archives in the backup directory
+MANIFEST_SUFFIX = ".chunks.json"
+
+# Chunk size bounds; with fastcdc, boundaries follow the content so an insertion only reshapes nearby chunks
+MIN_CHUNK_SIZE = 1024 * 1024
+AVG_CHUNK_SIZE = 4 * 1024 * 1024
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+
+# Chunk digest algorithm; recorded in each manifest so chunks can be verified whatever is installed later
+HASH_ALGORITHM = "blake3" if blake3 is not None else "blake2b"
+
+# Unreferenced chunks younger than this are kept, as a backup still being stored may be about to reference them
+GC_GRACE_SECONDS = 24 * 3600
+
+
+class ChunkStore:
+    """Stores files as content-addressed chunks so content repeated across backups is kept once."""
+
+    def __init__(self, root_dir: str):
+        """Initialize chunk store."""
+        self.root_dir = root_dir
+        self.logger = logging.getLogger(self.__class__.__name__)
+        Path(root_dir).mkdir(parents=True, exist_ok=True)
+
+    def store(self, file_path: str) -> str:
+        """Store file_path as chunks and return the path of its manifest, written next to it."""
+        chunks = []
+        total_bytes = 0
+        new_bytes = 0
+
+        for data in self._chunks(file_path):
+            digest = self._hash(data)
+            chunk_path = self._chunk_path(digest)
+            if os.path.exists(chunk_path):
+                # Refresh the mtime so a concurrent garbage collection treats it as in use
+                os.utime(chunk_path)
+            else:
+                self._write_atomic(chunk_path, data)
+                new_bytes += len(data)
+            chunks.append(digest)
+            total_bytes += len(data)
+
+        manifest_path = file_path + MANIFEST_SUFFIX
+        manifest = {
+            "filename": os.path.basename(file_path),
+            "size": total_bytes,
+            "hash": HASH_ALGORITHM,
+            "chunks": chunks
+        }
+        self._write_atomic(manifest_path, json.dumps(manifest).encode())
+
+        self.logger.info("Stored %s as %d chunks, %d of %d bytes new",
+                         file_path, len(chunks), new_bytes, total_bytes)
+        return manifest_path
+
+    def reassemble(self, manifest_path: str, output_path: str):
+        """Rebuild the archive described by a manifest into output_path."""
+        manifest = self._read_manifest(manifest_path)
+        algorithm = manifest.get("hash", "blake2b")
+        with open(output_path, "wb") as output:
+            for digest in manifest["chunks"]:
+                try:
+                    with open(self._chunk_path(digest), "rb") as f:
+                        data = f.read()
+                except FileNotFoundError:
+                    raise ValueError(f"Chunk {digest} referenced by {manifest_path} is missing")
+                if self._hash(data, algorithm) != digest:
+                    raise ValueError(f"Chunk {digest} referenced by {manifest_path} is corrupt")
+                output.write(data)
+
+    @contextmanager
+    def reassembled(self, manifest_path: str) -> Iterator[str]:
+        """Reassemble a manifest into a temporary file named like the original archive."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_path = os.path.join(temp_dir, self._read_manifest(manifest_path)["filename"])
+            self.reassemble(manifest_path, output_path)
+            yield output_path
+
+    def collect_garbage(self, manifest_paths: Iterable[str]) -> int:
+        """Delete chunks no manifest references and return how many were deleted."""
+        referenced = set()
+        for manifest_path in manifest_paths:
+            referenced.update(self._read_manifest(manifest_path)["chunks"])
+
+        cutoff = time.time() - GC_GRACE_SECONDS
+        deleted = 0
+        for chunk_path in Path(self.root_dir).glob("*/*"):
+            if chunk_path.name in referenced or chunk_path.name.endswith(".tmp"):
+                continue
+            try:
+                if chunk_path.stat().st_mtime < cutoff:
+                    chunk_path.unlink()
+                    deleted += 1
+            except FileNotFoundError:
+                continue
+
+        self.logger.info("Deleted %d unreferenced chunks", deleted)
+        return deleted
+
+    def _chunks(self, file_path: str) -> Iterator[bytes]:
+        """Split a file into content-defined chunks, or fixed-size ones without fastcdc."""
+        if fastcdc is not None:
+            for chunk in fastcdc.fastcdc(file_path, min_size=MIN_CHUNK_SIZE, avg_size=AVG_CHUNK_SIZE,
+                                         max_size=MAX_CHUNK_SIZE, fat=True):
+                yield chunk.data
+            return
+
+        with open(file_path, "rb") as f:
+            while True:
+                data = f.read(AVG_CHUNK_SIZE)
+                if not data:
+                    return
+                yield data
+
+    @staticmethod
+    def _hash(data: bytes, algorithm: str = HASH_ALGORITHM) -> str:
+        """Hex digest of a chunk: BLAKE3 when installed, else BLAKE2b of the same length."""
+        if algorithm == "blake2b":
+            return hashlib.blake2b(data, digest_size=32).hexdigest()
+        if blake3 is None:
+            raise ValueError("BLAKE3 chunks need the blake3 package installed")
+        return blake3(data).hexdigest()
+
+    def _chunk_path(self, digest: str) -> str:
+        """Path of a chunk, fanned out over subdirectories by digest prefix."""
+        return os.path.join(self.root_dir, digest[:2], digest)
+
+    @staticmethod
+    def _read_manifest(manifest_path: str) -> dict:
+        """Load a chunk manifest."""
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        """Write a file via a temporary sibling so readers never see it half-written."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
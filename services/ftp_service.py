@@ -1,13 +1,34 @@
 """
 FTP service for uploading backup files.
 """
+import calendar
+import fnmatch
 import logging
 import os
-from typing import List, Optional
-from ftplib import FTP, FTP_TLS
+import queue
+import socket
+import ssl
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, List, Optional
+from ftplib import FTP, FTP_TLS, error_perm
 from pathlib import Path
 
 from models.database_config import FTPConfig
+from models.backup_result import BACKUP_FILE_EXTENSIONS
+
+
+# Block size for streamed uploads; large blocks keep syscall and Python overhead per byte low
+STREAM_BLOCK_SIZE = 32 * 1024 * 1024
+
+# Block size for file uploads; ftplib's 8 KiB default costs one send per 8 KiB
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+
+# Largest read per recv on downloads, for the same reason
+DOWNLOAD_BLOCK_SIZE = 1024 * 1024
+
+# Lets OpenSSL hand TLS record encryption to the kernel where supported (Python 3.12+)
+OP_ENABLE_KTLS = getattr(ssl, "OP_ENABLE_KTLS", 0)
 
 
 class FTPService:
@@ -24,10 +45,14 @@ class FTPService:
         try:
             if self.ftp_config.ssl_enabled:
                 self._connection = FTP_TLS()
+                if OP_ENABLE_KTLS:
+                    self._connection.context.options |= OP_ENABLE_KTLS
             else:
                 self._connection = FTP()
             
             self._connection.connect(self.ftp_config.host, self.ftp_config.port)
+            # Commands are small request/response exchanges; don't let Nagle delay them
+            self._connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             self._connection.login(self.ftp_config.username, self.ftp_config.password)
             
             if self.ftp_config.ssl_enabled:
@@ -41,8 +66,31 @@ class FTPService:
             
         except Exception as e:
             self.logger.error(f"Failed to connect to FTP server: {e}")
+            # Drop the half-open session so callers don't mistake it for a usable one
+            if self._connection:
+                self._connection.close()
+                self._connection = None
             return False
     
+    @property
+    def is_connected(self) -> bool:
+        """Whether a session is currently open."""
+        return self._connection is not None
+    
+    def keepalive(self) -> bool:
+        """Send NOOP so an idle session is not timed out, reconnecting if it already was."""
+        if not self._connection:
+            return self.connect()
+        
+        try:
+            self._connection.voidcmd("NOOP")
+            return True
+        except Exception as e:
+            self.logger.warning(f"FTP session lost, reconnecting: {e}")
+            self._connection.close()
+            self._connection = None
+            return self.connect()
+    
     def disconnect(self):
         """Disconnect from FTP server."""
         if self._connection:
@@ -61,23 +109,85 @@ class FTPService:
             return False
         
         try:
-            if not os.path.exists(local_file_path):
-                self.logger.error(f"Local file does not exist: {local_file_path}")
-                return False
-            
             if remote_filename is None:
-                remote_filename = Path(local_file_path).name
+                remote_filename = os.path.basename(local_file_path)
             
             with open(local_file_path, 'rb') as file:
-                self._connection.storbinary(f'STOR {remote_filename}', file)
+                self._store_file(file, remote_filename)
             
             self.logger.info(f"Uploaded file: {local_file_path} -> {remote_filename}")
             return True
             
+        except FileNotFoundError:
+            self.logger.error(f"Local file does not exist: {local_file_path}")
+            return False
         except Exception as e:
             self.logger.error(f"Failed to upload file {local_file_path}: {e}")
             return False
     
+    def upload_files(self, local_file_paths: List[str]) -> Dict[str, bool]:
+        """Upload files over this session plus up to max_connections - 1 extra ones; returns success per path."""
+        if not self._connection:
+            self.logger.error("Not connected to FTP server")
+            return {path: False for path in local_file_paths}
+        
+        extra_sessions = []
+        for _ in range(min(self.ftp_config.max_connections, len(local_file_paths)) - 1):
+            session = FTPService(self.ftp_config)
+            if session.connect():
+                extra_sessions.append(session)
+        
+        if not extra_sessions:
+            return {path: self.upload_file(path) for path in local_file_paths}
+        
+        # Each worker borrows an idle session, so no session carries two transfers at once
+        idle_sessions = queue.Queue()
+        for session in (self, *extra_sessions):
+            idle_sessions.put(session)
+        
+        def upload(path: str) -> bool:
+            session = idle_sessions.get()
+            try:
+                return session.upload_file(path)
+            finally:
+                idle_sessions.put(session)
+        
+        try:
+            with ThreadPoolExecutor(max_workers=len(extra_sessions) + 1) as executor:
+                return dict(zip(local_file_paths, executor.map(upload, local_file_paths)))
+        finally:
+            for session in extra_sessions:
+                session.disconnect()
+    
+    def _store_file(self, file: BinaryIO, remote_filename: str):
+        """STOR a local file, letting the kernel copy it straight to the data socket when not encrypted."""
+        if self.ftp_config.ssl_enabled:
+            # The data channel is TLS-wrapped, so the bytes have to pass through Python
+            self._connection.storbinary(f'STOR {remote_filename}', file, blocksize=UPLOAD_BLOCK_SIZE)
+            return
+        
+        self._connection.voidcmd('TYPE I')
+        with self._connection.transfercmd(f'STOR {remote_filename}') as data_socket:
+            # socket.sendfile uses os.sendfile, copying from the page cache without Python buffers
+            data_socket.sendfile(file)
+        self._connection.voidresp()
+    
+    def upload_stream(self, stream: BinaryIO, remote_filename: str) -> bool:
+        """Upload a binary stream to FTP server as it is produced, without a local file."""
+        if not self._connection:
+            self.logger.error("Not connected to FTP server")
+            return False
+        
+        try:
+            self._connection.storbinary(f'STOR {remote_filename}', stream, blocksize=STREAM_BLOCK_SIZE)
+            
+            self.logger.info(f"Uploaded stream: {remote_filename}")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Failed to upload stream {remote_filename}: {e}")
+            return False
+    
     def download_file(self, remote_filename: str, local_file_path: str) -> bool:
         """Download a file from FTP server."""
         if not self._connection:
@@ -89,7 +199,7 @@ class FTPService:
             Path(local_file_path).parent.mkdir(parents=True, exist_ok=True)
             
             with open(local_file_path, 'wb') as file:
-                self._connection.retrbinary(f'RETR {remote_filename}', file.write)
+                self._connection.retrbinary(f'RETR {remote_filename}', file.write, blocksize=DOWNLOAD_BLOCK_SIZE)
             
             self.logger.info(f"Downloaded file: {remote_filename} -> {local_file_path}")
             return True
@@ -105,19 +215,16 @@ class FTPService:
             return []
         
         try:
-            files = []
-            self._connection.retrlines('LIST', files.append)
-            
-            # Parse file names from LIST output
-            file_names = []
-            for line in files:
-                parts = line.split()
-                if len(parts) >= 9:
-                    filename = ' '.join(parts[8:])  # Handle filenames with spaces
-                    if pattern == "*" or filename.endswith(pattern.replace("*", "")):
-                        file_names.append(filename)
+            # NLST sends bare names, so nothing has to be parsed out of LIST's columns
+            try:
+                names = self._connection.nlst()
+            except error_perm as e:
+                # Some servers answer an empty directory with 550 instead of an empty listing
+                if str(e).startswith("550"):
+                    return []
+                raise
             
-            return file_names
+            return fnmatch.filter((name.rsplit("/", 1)[-1] for name in names), pattern)
             
         except Exception as e:
             self.logger.error(f"Failed to list files: {e}")
@@ -145,20 +252,20 @@ class FTPService:
             return []
         
         try:
-            files = self.list_files("*.tar.gz")
             deleted_files = []
+            cutoff_time = time.time() - (retention_days * 24 * 3600)
             
-            # Get current timestamp for comparison
-            import time
-            current_time = time.time()
-            cutoff_time = current_time - (retention_days * 24 * 3600)
-            
-            for filename in files:
+            for filename, mtime in self._modification_times().items():
+                if not filename.endswith(BACKUP_FILE_EXTENSIONS):
+                    continue
+                
                 try:
-                    # Get file modification time
-                    mtime = self._connection.voidcmd(f"MDTM {filename}")[4:].strip()
-                    # Parse FTP timestamp format (YYYYMMDDHHMMSS)
-                    file_time = time.mktime(time.strptime(mtime, "%Y%m%d%H%M%S"))
+                    if mtime is None:
+                        mtime = self._connection.voidcmd(f"MDTM {filename}")[4:].strip()
+                    # MLSD and MDTM both report UTC as YYYYMMDDHHMMSS, sometimes with fractional seconds;
+                    # the layout is fixed, so slicing is enough and avoids strptime's locale-aware parsing
+                    fields = (mtime[0:4], mtime[4:6], mtime[6:8], mtime[8:10], mtime[10:12], mtime[12:14])
+                    file_time = calendar.timegm(tuple(map(int, fields)) + (0, 0, 0))
                     
                     if file_time < cutoff_time:
                         if self.delete_file(filename):
@@ -167,7 +274,7 @@ class FTPService:
                         else:
                             self.logger.warning(f"Failed to delete old backup: {filename}")
                     else:
-                        self.logger.debug(f"Keeping backup: {filename}")
+                        self.logger.debug("Keeping backup: %s", filename)
                         
                 except Exception as e:
                     self.logger.warning(f"Could not process file {filename}: {e}")
@@ -178,6 +285,16 @@ class FTPService:
             self.logger.error(f"Failed to cleanup old files: {e}")
             return []
     
+    def _modification_times(self) -> Dict[str, Optional[str]]:
+        """Modification times of the remote files from one MLSD listing; None where MDTM must be asked per file."""
+        try:
+            return {name: facts.get("modify")
+                    for name, facts in self._connection.mlsd(facts=["modify", "type"])
+                    if facts.get("type") == "file"}
+        except error_perm:
+            self.logger.debug("Server does not support MLSD, falling back to MDTM")
+            return dict.fromkeys(self.list_files())
+    
     def __enter__(self):
         """Context manager entry."""
         self.connect()
@@ -0,0 +1,195 @@
+"""
+S3 service for uploading backup files.
+"""
+import fnmatch
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from models.database_config import S3Config
+from models.backup_result import BACKUP_FILE_EXTENSIONS
+
+# Optional dependency: only needed when an S3 destination is configured
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config as BotoConfig
+except ImportError:
+    boto3 = None
+    TransferConfig = None
+    BotoConfig = None
+
+
+# Files above this size are transferred in parts; backup archives are large, so parts are large too
+MULTIPART_THRESHOLD = 64 * 1024 * 1024
+
+# Size of each part; parts are transferred concurrently
+MULTIPART_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Read size used while streaming each part
+IO_CHUNK_SIZE = 1024 * 1024
+
+# Concurrent part transfers when max_concurrency is not configured; the work is network-bound, not CPU-bound
+DEFAULT_MAX_CONCURRENCY = 16
+
+# Backups uploaded at once by upload_files; each of them transfers its parts concurrently too
+MAX_PARALLEL_UPLOADS = 4
+
+# Characters that start the wildcard part of a list_files pattern
+GLOB_CHARACTERS = re.compile(r"[*?\[]")
+
+# HTTP connections the client keeps; botocore's default of 10 would queue parts of parallel uploads
+MAX_POOL_CONNECTIONS = 50
+
+# Most keys a single DeleteObjects request accepts
+DELETE_BATCH_SIZE = 1000
+
+# Keys returned per ListObjectsV2 page; the service maximum
+LIST_PAGE_SIZE = 1000
+
+
+class S3Service:
+    """Service for S3 uploads."""
+    
+    def __init__(self, s3_config: S3Config):
+        """Initialize S3 service."""
+        if boto3 is None:
+            raise ValueError("S3 uploads need the boto3 package installed")
+        
+        self.s3_config = s3_config
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.client = boto3.client(
+            "s3",
+            region_name=s3_config.region,
+            endpoint_url=s3_config.endpoint_url,
+            aws_access_key_id=s3_config.access_key_id,
+            aws_secret_access_key=s3_config.secret_access_key,
+            config=BotoConfig(max_pool_connections=MAX_POOL_CONNECTIONS)
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=MULTIPART_CHUNK_SIZE,
+            max_concurrency=s3_config.max_concurrency or DEFAULT_MAX_CONCURRENCY,
+            io_chunksize=IO_CHUNK_SIZE,
+            use_threads=True
+        )
+    
+    def object_key(self, filename: str) -> str:
+        """Key a file is stored under, below the configured prefix."""
+        prefix = self.s3_config.prefix.strip("/")
+        return f"{prefix}/{filename}" if prefix else filename
+    
+    def upload_file(self, local_file_path: str, key: Optional[str] = None) -> bool:
+        """Upload a file to the bucket, in parallel parts when it is large."""
+        try:
+            if key is None:
+                key = self.object_key(os.path.basename(local_file_path))
+            
+            # Open once and stream from the handle; the size comes from the open descriptor
+            with open(local_file_path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                self.client.upload_fileobj(f, self.s3_config.bucket, key, Config=self.transfer_config)
+            
+            self.logger.info(f"Uploaded file: {local_file_path} -> s3://{self.s3_config.bucket}/{key} ({size} bytes)")
+            return True
+            
+        except FileNotFoundError:
+            self.logger.error(f"Local file does not exist: {local_file_path}")
+            return False
+        except Exception as e:
+            self.logger.error(f"Failed to upload file {local_file_path} to S3: {e}")
+            return False
+    
+    def upload_files(self, local_file_paths: List[str]) -> Dict[str, bool]:
+        """Upload several files at once over the shared client; returns success per path."""
+        if len(local_file_paths) <= 1:
+            return {path: self.upload_file(path) for path in local_file_paths}
+        
+        # boto3 clients are thread-safe, so the workers share one client and its connection pool
+        with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_UPLOADS, len(local_file_paths))) as executor:
+            return dict(zip(local_file_paths, executor.map(self.upload_file, local_file_paths)))
+    
+    def download_file(self, key: str, local_file_path: str) -> bool:
+        """Download an object from the bucket, in parallel ranged parts when it is large."""
+        try:
+            Path(local_file_path).parent.mkdir(parents=True, exist_ok=True)
+            self.client.download_file(self.s3_config.bucket, key, local_file_path, Config=self.transfer_config)
+            
+            self.logger.info(f"Downloaded file: s3://{self.s3_config.bucket}/{key} -> {local_file_path}")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Failed to download {key} from S3: {e}")
+            return False
+    
+    def iter_files(self, pattern: str = "*") -> Iterator[Dict[str, Any]]:
+        """Yield objects under the prefix page by page, so listings past 1000 keys are not truncated."""
+        prefix = self.object_key("") if self.s3_config.prefix.strip("/") else ""
+        # The literal start of the pattern narrows the listing server-side; the rest is matched like FTP names
+        literal = GLOB_CHARACTERS.split(pattern, 1)[0]
+        pages = self.client.get_paginator("list_objects_v2").paginate(
+            Bucket=self.s3_config.bucket,
+            Prefix=prefix + literal,
+            PaginationConfig={"PageSize": LIST_PAGE_SIZE}
+        )
+        for page in pages:
+            for obj in page.get("Contents", []):
+                if fnmatch.fnmatch(obj["Key"].rsplit("/", 1)[-1], pattern):
+                    yield {"key": obj["Key"], "size": obj["Size"], "last_modified": obj["LastModified"]}
+    
+    def list_files(self, pattern: str = "*") -> List[Dict[str, Any]]:
+        """List objects under the prefix."""
+        try:
+            return list(self.iter_files(pattern))
+        except Exception as e:
+            self.logger.error(f"Failed to list S3 files: {e}")
+            return []
+    
+    def cleanup_old_files(self, retention_days: int = 7) -> List[str]:
+        """Delete backups under the prefix older than the retention period; returns the deleted keys."""
+        try:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+            
+            # Delete as the listing streams in, one request per thousand keys instead of one per key
+            deleted = []
+            batch = []
+            for obj in self.iter_files():
+                if obj["key"].endswith(BACKUP_FILE_EXTENSIONS) and obj["last_modified"] < cutoff:
+                    batch.append(obj["key"])
+                    if len(batch) == DELETE_BATCH_SIZE:
+                        deleted.extend(self._delete_batch(batch))
+                        batch = []
+            if batch:
+                deleted.extend(self._delete_batch(batch))
+            
+            self.logger.info(f"Deleted {len(deleted)} old backups from S3")
+            return deleted
+            
+        except Exception as e:
+            self.logger.error(f"Failed to cleanup old S3 backups: {e}")
+            return []
+    
+    def _delete_batch(self, keys: List[str]) -> List[str]:
+        """Delete keys with one DeleteObjects request and return those that were deleted."""
+        response = self.client.delete_objects(
+            Bucket=self.s3_config.bucket,
+            Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True}
+        )
+        failed = set()
+        for error in response.get("Errors", []):
+            self.logger.warning(f"Failed to delete old backup {error['Key']}: {error.get('Message')}")
+            failed.add(error["Key"])
+        return [key for key in keys if key not in failed]
+    
+    def test_connection(self) -> bool:
+        """Check that the bucket is reachable with the configured credentials."""
+        try:
+            self.client.head_bucket(Bucket=self.s3_config.bucket)
+            return True
+        except Exception as e:
+            self.logger.error(f"S3 connection test failed: {e}")
+            return False
@@ -2,29 +2,173 @@
 Telegram notification service for backup operations.
 """
 import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
-from typing import Optional, Dict, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 from models.database_config import TelegramConfig
 from models.backup_result import BackupResult, BackupSummary
 
 
+# Telegram rejects sendMessage texts longer than this
+MAX_MESSAGE_LENGTH = 4096
+
+# Separator between notifications batched into one message
+BATCH_SEPARATOR = "\n\n"
+
+# Timestamp format used in notifications
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Backup completions collected into one digest message when sending in the background
+DIGEST_LIMIT = 20
+DIGEST_SEPARATOR = "\n\n---\n\n"
+
+# Kept-alive connections to the Bot API; the background worker and foreground callers can share them
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+
+# Concurrent posts made by send_many; below the pool size so every post gets a kept-alive connection
+SEND_MANY_WORKERS = 8
+
+# Connection failures are retried; sendMessage is not idempotent, so read failures are not
+MAX_RETRIES = Retry(total=3, backoff_factor=0.3)
+
+
 class TelegramService:
     """Service for sending Telegram notifications."""
     
-    def __init__(self, telegram_config: TelegramConfig):
-        """Initialize Telegram service."""
+    def __init__(self, telegram_config: TelegramConfig, background: bool = False):
+        """Initialize Telegram service; with background, messages are queued and sent by a worker thread."""
         self.telegram_config = telegram_config
         self.logger = logging.getLogger(self.__class__.__name__)
         self.base_url = f"https://api.telegram.org/bot{self.telegram_config.bot_token}"
+        # One session keeps the TLS connection to the API alive between messages
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                                                   max_retries=MAX_RETRIES))
+        self.background = background
+        self._queue: Optional[queue.Queue] = None
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        self._digest: List[str] = []
+        self._digest_lock = threading.Lock()
     
     def send_message(self, message: str, parse_mode: str = "HTML") -> bool:
-        """Send a message to Telegram."""
+        """Send a message to Telegram, or queue it when sending in the background."""
         if not self.telegram_config.enabled:
             self.logger.debug("Telegram notifications disabled")
             return True
         
+        if self.background:
+            self._ensure_worker()
+            self._queue.put((message, parse_mode))
+            return True
+        
+        return self._post_message(message, parse_mode)
+    
+    def send_many(self, messages: List[str], parse_mode: str = "HTML") -> List[bool]:
+        """Post several messages concurrently, even in the background; results follow the input order, delivery order is not preserved."""
+        if not self.telegram_config.enabled:
+            self.logger.debug("Telegram notifications disabled")
+            return [True] * len(messages)
+        
+        # Messages already queued go out first, so the batch does not overtake them
+        if self.background:
+            self.flush()
+        
+        if len(messages) <= 1:
+            return [self._post_message(message, parse_mode) for message in messages]
+        
+        with ThreadPoolExecutor(max_workers=min(SEND_MANY_WORKERS, len(messages))) as executor:
+            return list(executor.map(lambda message: self._post_message(message, parse_mode), messages))
+    
+    def flush(self):
+        """Send the pending digest and wait until every queued message has been sent."""
+        self._flush_digest()
+        if self._queue is not None:
+            self._queue.join()
+    
+    def close(self):
+        """Send queued messages and release the HTTP session."""
+        self.flush()
+        self.session.close()
+    
+    def __enter__(self):
+        """Context manager entry."""
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.close()
+    
+    def _add_to_digest(self, message: str) -> bool:
+        """Collect a message into the digest, sending it once full or too long for one message."""
+        if not self.telegram_config.enabled:
+            return True
+        
+        with self._digest_lock:
+            if self._digest and len(DIGEST_SEPARATOR.join(self._digest + [message])) > MAX_MESSAGE_LENGTH:
+                self.send_message(DIGEST_SEPARATOR.join(self._digest))
+                self._digest = []
+            self._digest.append(message)
+            if len(self._digest) >= DIGEST_LIMIT:
+                self.send_message(DIGEST_SEPARATOR.join(self._digest))
+                self._digest = []
+        return True
+    
+    def _flush_digest(self):
+        """Send whatever the digest holds."""
+        with self._digest_lock:
+            if self._digest:
+                self.send_message(DIGEST_SEPARATOR.join(self._digest))
+                self._digest = []
+    
+    def _ensure_worker(self):
+        """Start the background sender on first use."""
+        with self._worker_lock:
+            if self._worker is None:
+                self._queue = queue.Queue()
+                self._worker = threading.Thread(target=self._drain_queue, name="telegram-notifier", daemon=True)
+                self._worker.start()
+    
+    def _drain_queue(self):
+        """Send queued messages, batching those already waiting into as few requests as possible."""
+        while True:
+            pending = [self._queue.get()]
+            while True:
+                try:
+                    pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            try:
+                for message, parse_mode in self._batch(pending):
+                    self._post_message(message, parse_mode)
+            finally:
+                for _ in pending:
+                    self._queue.task_done()
+    
+    @staticmethod
+    def _batch(pending: List[tuple]) -> List[tuple]:
+        """Join consecutive messages with the same parse mode up to Telegram's length limit."""
+        batches = []
+        for message, parse_mode in pending:
+            if batches:
+                last_message, last_mode = batches[-1]
+                combined = last_message + BATCH_SEPARATOR + message
+                if last_mode == parse_mode and len(combined) <= MAX_MESSAGE_LENGTH:
+                    batches[-1] = (combined, parse_mode)
+                    continue
+            batches.append((message, parse_mode))
+        return batches
+    
+    def _post_message(self, message: str, parse_mode: str) -> bool:
+        """Post one message to the sendMessage endpoint."""
         try:
             url = f"{self.base_url}/sendMessage"
             data = {
@@ -33,7 +177,7 @@ class TelegramService:
                 "parse_mode": parse_mode
             }
             
-            response = requests.post(url, data=data, timeout=30)
+            response = self.session.post(url, data=data, timeout=30)
             response.raise_for_status()
             
             self.logger.info("Telegram message sent successfully")
@@ -52,46 +196,37 @@ class TelegramService:
             f"🔄 <b>Backup Started</b>\n"
             f"Database: {database_name}\n"
             f"Type: {database_type}\n"
-            f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+            f"Time: {datetime.now():{TIME_FORMAT}}"
         )
         return self.send_message(message)
     
     def notify_backup_completed(self, backup_result: BackupResult) -> bool:
         """Notify that backup has completed."""
         if backup_result.is_successful:
-            emoji = "✅"
-            status = "Success"
-            size_info = ""
+            heading = "✅ <b>Backup Completed - Success</b>"
+            details = ""
             if backup_result.backup_size_bytes:
-                size_mb = backup_result.backup_size_bytes / (1024 * 1024)
-                size_info = f"\nSize: {size_mb:.2f} MB"
-            
-            duration_info = ""
-            if backup_result.duration_seconds:
-                duration_info = f"\nDuration: {backup_result.duration_seconds:.1f}s"
-            
-            message = (
-                f"{emoji} <b>Backup Completed - {status}</b>\n"
-                f"Database: {backup_result.database_name}\n"
-                f"Type: {backup_result.database_type}\n"
-                f"Backup ID: {backup_result.backup_id}{size_info}{duration_info}\n"
-                f"Time: {backup_result.end_time.strftime('%Y-%m-%d %H:%M:%S')}"
-            )
+                details += f"\nSize: {backup_result.backup_size_bytes / (1024 * 1024):.2f} MB"
+            duration = backup_result.duration_seconds
+            if duration:
+                details += f"\nDuration: {duration:.1f}s"
         else:
-            emoji = "❌"
-            status = "Failed"
-            error_info = ""
+            heading = "❌ <b>Backup Completed - Failed</b>"
+            details = ""
             if backup_result.error_message:
-                error_info = f"\nError: {backup_result.error_message[:200]}..."
-            
-            message = (
-                f"{emoji} <b>Backup Completed - {status}</b>\n"
-                f"Database: {backup_result.database_name}\n"
-                f"Type: {backup_result.database_type}\n"
-                f"Backup ID: {backup_result.backup_id}{error_info}\n"
-                f"Time: {backup_result.end_time.strftime('%Y-%m-%d %H:%M:%S')}"
-            )
+                details = f"\nError: {backup_result.error_message[:200]}..."
+        
+        message = (
+            f"{heading}\n"
+            f"Database: {backup_result.database_name}\n"
+            f"Type: {backup_result.database_type}\n"
+            f"Backup ID: {backup_result.backup_id}{details}\n"
+            f"Time: {backup_result.end_time:{TIME_FORMAT}}"
+        )
         
+        # Completions arrive one per database; in the background they go out together as a digest
+        if self.background:
+            return self._add_to_digest(message)
         return self.send_message(message)
     
     def notify_backup_summary(self, summary: BackupSummary) -> bool:
@@ -118,22 +253,30 @@ class TelegramService:
         )
         
         if summary.last_backup_time:
-            message += f"\nLast Backup: {summary.last_backup_time.strftime('%Y-%m-%d %H:%M:%S')}"
+            message += f"\nLast Backup: {summary.last_backup_time:{TIME_FORMAT}}"
         
+        # The summary closes a run, so the completions it summarizes go out ahead of it
+        self._flush_digest()
         return self.send_message(message)
     
     def notify_ftp_upload(self, filename: str, success: bool) -> bool:
         """Notify FTP upload status."""
+        return self.send_message(self._ftp_upload_message(filename, success))
+    
+    def notify_ftp_uploads(self, outcomes: Dict[str, bool]) -> List[bool]:
+        """Notify the status of several FTP uploads, one message per file, posted together."""
+        return self.send_many([self._ftp_upload_message(filename, success) for filename, success in outcomes.items()])
+    
+    @staticmethod
+    def _ftp_upload_message(filename: str, success: bool) -> str:
+        """Build the FTP upload status message."""
         if success:
             emoji = "📤"
             status = "Uploaded"
-            message = f"{emoji} <b>FTP Upload - {status}</b>\nFile: {filename}"
         else:
             emoji = "❌"
             status = "Failed"
-            message = f"{emoji} <b>FTP Upload - {status}</b>\nFile: {filename}"
-        
-        return self.send_message(message)
+        return f"{emoji} <b>FTP Upload - {status}</b>\nFile: {filename}"
     
     def notify_cleanup(self, deleted_files: int, total_size_mb: float) -> bool:
         """Notify cleanup operation."""
@@ -161,7 +304,7 @@ class TelegramService:
         """Test Telegram connection."""
         try:
             url = f"{self.base_url}/getMe"
-            response = requests.get(url, timeout=10)
+            response = self.session.get(url, timeout=10)
             response.raise_for_status()
             
             bot_info = response.json()
@@ -0,0 +1,164 @@
+"""
+Unit tests for configuration loader.
+"""
+import pytest
+import os
+from unittest.mock import patch
+
+import yaml
+
+from config_loader import ConfigLoader
+from models.database_config import MongoDBConfig, PostgreSQLConfig
+
+
+SAMPLE_CONFIG = {
+    'pgsql': [
+        {'id': 'pgsql-01', 'host': 'localhost', 'port': 5432, 'database': 'pgdb',
+         'username': 'user', 'password': 'pass'},
+        {'host': 'localhost', 'database': 'otherdb'}
+    ],
+    'mongodb': [
+        {'host': 'localhost', 'port': 27017, 'database': 'mongodb_db',
+         'uri': 'mongodb://localhost:27017/mongodb_db'}
+    ],
+    'ftp': {'host': 'ftp.example.com', 'username': 'user', 'password': 'pass', 'remote_dir': '/backup'},
+    'telegram': {'bot_token': 'token', 'chat_id': 'chat', 'enabled': True},
+    'backup': {'directory': './backups', 'retention_days': 3}
+}
+
+# Dumped once; every fixture file is written from this text
+SAMPLE_YAML = yaml.dump(SAMPLE_CONFIG)
+
+
+@pytest.fixture(scope="module")
+def shared_config_file(tmp_path_factory):
+    """Sample configuration shared by tests that only read it."""
+    path = tmp_path_factory.mktemp("config") / "config.yaml"
+    path.write_text(SAMPLE_YAML)
+    return str(path)
+
+
+@pytest.fixture
+def temp_config_file(tmp_path):
+    """Fresh copy of the sample configuration, for tests that modify it or count parses."""
+    path = tmp_path / "config.yaml"
+    path.write_text(SAMPLE_YAML)
+    return str(path)
+
+
+class TestConfigLoader:
+    """Test configuration loader."""
+
+    def test_load_databases_requires_file(self):
+        """Test loading without a configuration file."""
+        with pytest.raises(ValueError, match="Configuration file path is required"):
+            ConfigLoader().load_databases()
+
+    def test_load_databases_missing_file(self):
+        """Test loading a configuration file that does not exist."""
+        with pytest.raises(ValueError, match="Configuration file not found"):
+            ConfigLoader("/nonexistent/config.yaml").load_databases()
+
+    def test_load_databases(self, shared_config_file):
+        """Test loading database entries from YAML."""
+        databases = ConfigLoader(shared_config_file).load_databases()
+
+        assert [db['id'] for db in databases] == ['pgsql-01', 'pgsql_1', 'mongodb_0']
+        assert [db['type'] for db in databases] == ['postgresql', 'postgresql', 'mongodb']
+
+    def test_load_sections(self, shared_config_file):
+        """Test loading the optional FTP, Telegram and backup sections."""
+        loader = ConfigLoader(shared_config_file)
+
+        assert loader.load_ftp_config()['host'] == 'ftp.example.com'
+        assert loader.load_telegram_config()['chat_id'] == 'chat'
+        assert loader.load_backup_config()['retention_days'] == 3
+
+    def test_load_without_yaml(self, shared_config_file):
+        """Test loading when PyYAML is not installed."""
+        loader = ConfigLoader(shared_config_file)
+
+        with patch('config_loader.YAML_AVAILABLE', False):
+            assert loader.load_ftp_config() is None
+            assert loader.load_backup_config() is None
+            with pytest.raises(ValueError, match="YAML module not available"):
+                loader.load_databases()
+
+    def test_file_parsed_once(self, temp_config_file):
+        """Test that the YAML file is parsed only once per loader."""
+        loader = ConfigLoader(temp_config_file)
+
+        with patch('config_loader.yaml.load', wraps=yaml.load) as mock_load:
+            loader.load_databases()
+            loader.load_ftp_config()
+            loader.load_telegram_config()
+            loader.load_backup_config()
+
+            assert mock_load.call_count == 1
+
+    def test_file_parsed_once_across_loaders(self, temp_config_file):
+        """Test that loaders for the same unchanged file share one parse."""
+        with patch('config_loader.yaml.load', wraps=yaml.load) as mock_load:
+            ConfigLoader(temp_config_file).load_databases()
+            ConfigLoader(temp_config_file).load_databases()
+
+            assert mock_load.call_count == 1
+
+    def test_file_parsed_once_across_path_spellings(self, temp_config_file):
+        """Test that relative and symlinked paths to one file share a parse."""
+        link = temp_config_file + '.link'
+        os.symlink(temp_config_file, link)
+        try:
+            with patch('config_loader.yaml.load', wraps=yaml.load) as mock_load:
+                ConfigLoader(temp_config_file).load_databases()
+                ConfigLoader(os.path.relpath(temp_config_file)).load_databases()
+                ConfigLoader(link).load_databases()
+
+                assert mock_load.call_count == 1
+        finally:
+            os.unlink(link)
+
+    def test_load_databases_does_not_mutate_parsed_config(self, shared_config_file):
+        """Test that loading databases leaves the cached parse untouched."""
+        loader = ConfigLoader(shared_config_file)
+        loader.load_databases()
+
+        assert 'type' not in loader._load_raw()['pgsql'][0]
+        assert 'id' not in loader._load_raw()['pgsql'][1]
+
+    def test_file_reparsed_after_change(self, temp_config_file):
+        """Test that a modified file is parsed again."""
+        loader = ConfigLoader(temp_config_file)
+        assert loader.load_backup_config()['retention_days'] == 3
+
+        with open(temp_config_file, 'w') as f:
+            yaml.dump({**SAMPLE_CONFIG, 'backup': {'retention_days': 9}}, f)
+        stat = os.stat(temp_config_file)
+        os.utime(temp_config_file, (stat.st_atime, stat.st_mtime + 10))
+
+        assert loader.load_backup_config()['retention_days'] == 9
+
+    def test_create_database_configs(self, shared_config_file):
+        """Test creating configuration objects from YAML."""
+        configs = ConfigLoader(shared_config_file).create_database_configs()
+
+        assert len(configs) == 3
+        assert isinstance(configs[0][0], PostgreSQLConfig)
+        assert configs[0][1] == 'pgsql-01'
+        assert configs[1][0].port == 5432
+        assert isinstance(configs[2][0], MongoDBConfig)
+        assert configs[2][0].uri == 'mongodb://localhost:27017/mongodb_db'
+
+    def test_create_database_configs_skips_unsupported_type(self):
+        """Test that entries with an unknown type are skipped."""
+        loader = ConfigLoader()
+        databases = [
+            {'type': 'mysql', 'host': 'localhost', 'database': 'skipped'},
+            {'type': 'mongodb', 'host': 'localhost', 'database': 'kept'}
+        ]
+
+        with patch.object(loader, 'load_databases', return_value=databases):
+            configs = loader.create_database_configs()
+
+        assert [(config.database, config.port) for config, _ in configs] == [('kept', 27017)]
+        assert configs[0][1] == 'mongodb_kept'
@@ -4,10 +4,12 @@ Unit tests for main application.
 import pytest
 import tempfile
 import os
+import threading
 from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime
 
-from main import DatabaseBackupApp
+import main
+from main import DatabaseBackupApp, configure_logging, _create_service, _load_env, BACKUP_ENV, FTP_ENV
 
 
 class TestDatabaseBackupApp:
@@ -39,6 +41,16 @@ class TestDatabaseBackupApp:
         assert app.report_view is not None
         assert app.logger is not None
     
+    @patch('main.logging.basicConfig')
+    def test_logging_configured_once(self, mock_basic_config):
+        """Test that creating several apps configures logging only once."""
+        configure_logging.cache_clear()
+        
+        DatabaseBackupApp()
+        DatabaseBackupApp()
+        
+        mock_basic_config.assert_called_once()
+    
     @patch('main.FTPService')
     @patch('main.TelegramService')
     def test_app_initialization_with_services(self, mock_telegram, mock_ftp):
@@ -141,7 +153,7 @@ class TestDatabaseBackupApp:
     def test_backup_all_databases(self, mock_telegram, mock_backup_all):
         """Test backing up all databases."""
         # Setup mocks
-        mock_results = [Mock(), Mock()]
+        mock_results = [Mock(is_successful=True), Mock(is_successful=False)]
         mock_backup_all.return_value = mock_results
         
         app = DatabaseBackupApp()
@@ -156,8 +168,10 @@ class TestDatabaseBackupApp:
         
         results = app.backup_all_databases()
         
-        assert results == mock_results
+        assert results == [True, False]
         mock_backup_all.assert_called_once()
+        assert app.telegram_service.notify_backup_started.call_count == 2
+        assert app.telegram_service.notify_backup_completed.call_count == 2
         app.telegram_service.notify_backup_summary.assert_called_once()
     
     @patch('main.FTPService')
@@ -204,7 +218,7 @@ class TestDatabaseBackupApp:
     @patch('main.BackupManager.cleanup_all_backups')
     def test_cleanup_old_backups(self, mock_cleanup):
         """Test cleanup of old backups."""
-        mock_cleanup.return_value = {"mongodb_testdb": ["old1.tar.gz", "old2.tar.gz"]}
+        mock_cleanup.return_value = ({"mongodb_testdb": ["old1.tar.gz", "old2.tar.gz"]}, 2048)
         
         app = DatabaseBackupApp()
         app.backup_manager.cleanup_all_backups = mock_cleanup
@@ -274,3 +288,251 @@ class TestDatabaseBackupApp:
             mock_print.assert_called()
             mock_telegram_instance.test_connection.assert_called_once()
 
+
+class TestYamlBackupConfig:
+    """Test that the YAML backup section reaches the backup manager and controllers."""
+    
+    def setup_method(self):
+        """Setup test fixtures."""
+        import yaml
+        self.temp_dir = tempfile.mkdtemp()
+        self.config_file = os.path.join(self.temp_dir, 'config.yaml')
+        with open(self.config_file, 'w') as f:
+            yaml.dump({
+                'pgsql': [{'id': 'pgsql-01', 'host': 'localhost', 'database': 'app',
+                           'username': 'user', 'password': 'pass'}],
+                'backup': {'directory': self.temp_dir, 'pg_format': 'plain', 'dedup': True}
+            }, f)
+    
+    def teardown_method(self):
+        """Cleanup test fixtures."""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    @pytest.mark.parametrize('databases_first', [False, True])
+    def test_yaml_backup_settings_reach_controllers(self, databases_first):
+        """Test that YAML pg_format and dedup apply whichever section is loaded first."""
+        app = DatabaseBackupApp(self.config_file)
+        if databases_first:
+            app.load_databases_from_config()
+            app.load_services_from_config()
+        else:
+            app.load_services_from_config()
+            app.load_databases_from_config()
+        
+        controller = app.backup_manager.controllers['pgsql-01']
+        assert controller.backup_config.pg_format == 'plain'
+        assert controller.backup_config.dedup is True
+        assert controller.backup_config.backup_dir == self.temp_dir
+        assert app.backup_manager.chunk_store is not None
+    
+    def test_unset_yaml_keys_keep_environment(self):
+        """Test that settings missing from YAML keep their environment values."""
+        with patch.dict(os.environ, {'RETENTION_DAYS': '30'}):
+            app = DatabaseBackupApp(self.config_file)
+        app.load_services_from_config()
+        
+        assert app.backup_config.retention_days == 30
+        assert app.backup_manager.backup_config is app.backup_config
+    
+    def test_yaml_app_settings_applied(self):
+        """Test that log_level and verbose in the backup section configure the app instead of being ignored."""
+        import logging
+        import yaml
+        with open(self.config_file, 'w') as f:
+            yaml.dump({'backup': {'directory': self.temp_dir, 'log_level': 'warning', 'verbose': True}}, f)
+        app = DatabaseBackupApp(self.config_file)
+        root_level = logging.getLogger().level
+        
+        try:
+            with patch.object(app.logger, 'warning') as mock_warning:
+                app.load_services_from_config()
+            
+            mock_warning.assert_not_called()
+            assert logging.getLogger().level == logging.WARNING
+            assert app.verbose is True
+            assert app.view.verbose is True
+        finally:
+            logging.getLogger().setLevel(root_level)
+    
+    def test_cli_max_parallel_overrides_yaml(self):
+        """Test that --max-parallel beats max_parallel_backups from YAML."""
+        import yaml
+        with open(self.config_file, 'w') as f:
+            yaml.dump({'backup': {'directory': self.temp_dir, 'max_parallel_backups': 4}}, f)
+        argv = ['main.py', '--config', self.config_file, '--backup-all', '--max-parallel', '2']
+        
+        with patch('sys.argv', argv), \
+             patch.object(DatabaseBackupApp, 'backup_all_databases', autospec=True, return_value=[True]) as mock_backup:
+            main.main()
+        
+        app = mock_backup.call_args[0][0]
+        assert app.backup_config.max_parallel_backups == 2
+        assert app.backup_manager.backup_config.max_parallel_backups == 2
+    
+    @patch('services.s3_service.boto3', None)
+    def test_broken_service_does_not_skip_other_sections(self):
+        """Test that an S3 section that cannot be built leaves Telegram and backup settings loaded."""
+        import yaml
+        with open(self.config_file, 'w') as f:
+            yaml.dump({
+                's3': {'bucket': 'backups'},
+                'telegram': {'bot_token': 'token', 'chat_id': 'chat', 'enabled': True},
+                'backup': {'directory': self.temp_dir, 'retention_days': 3}
+            }, f)
+        app = DatabaseBackupApp(self.config_file)
+        
+        app.load_services_from_config()
+        
+        assert app.s3_service is None
+        assert app.telegram_service is not None
+        assert app.backup_config.backup_dir == self.temp_dir
+        assert app.backup_config.retention_days == 3
+        app.close()
+
+
+class TestLoadEnv:
+    """Test table-driven environment parsing."""
+    
+    def test_defaults_and_parsing(self):
+        """Test that unset or empty variables take defaults and set ones are parsed."""
+        env = {'BACKUP_DIR': '/data/backups', 'RETENTION_DAYS': '14', 'COMPRESSION_LEVEL': '',
+               'DEDUP': 'yes', 'COMPRESSION': 'False'}
+        with patch.dict(os.environ, env, clear=True):
+            settings = _load_env(BACKUP_ENV)
+        
+        assert settings['backup_dir'] == '/data/backups'
+        assert settings['retention_days'] == 14
+        assert settings['compression_level'] is None
+        assert settings['dedup'] is True
+        assert settings['compression'] is False
+        assert settings['pg_format'] == 'custom'
+    
+    def test_unset_key_variable(self):
+        """Test that an unset host leaves the FTP settings empty."""
+        with patch.dict(os.environ, {'FTP_PORT': '2121'}, clear=True):
+            settings = _load_env(FTP_ENV)
+        
+        assert settings['host'] is None
+        assert settings['port'] == 2121
+
+
+class TestLazyServices:
+    """Test on-demand service imports."""
+    
+    def test_unconfigured_service_not_imported(self):
+        """Test that a service without configuration is never imported."""
+        mock_import = Mock()
+        with patch.dict(main._SERVICE_IMPORTS, {'S3Service': mock_import}):
+            assert _create_service('S3Service', None) is None
+        
+        mock_import.assert_not_called()
+    
+    def test_service_imports_resolve_classes(self):
+        """Test that each service import returns the service class it names."""
+        for name, import_service in main._SERVICE_IMPORTS.items():
+            assert import_service().__name__ == name
+    
+    def test_service_class_resolved_as_module_attribute(self):
+        """Test that service classes stay reachable (and patchable) as main attributes."""
+        from services.ftp_service import FTPService
+        
+        assert main.FTPService is FTPService
+
+
+class TestProbeConnection:
+    """Test database connection probes."""
+    
+    def test_probe_connection(self):
+        """Test that probe results and errors are captured rather than raised."""
+        ok, failing = Mock(), Mock()
+        ok.test_connection.return_value = True
+        failing.test_connection.side_effect = Exception("Connection refused")
+        
+        assert main._probe_connection(ok) == (True, None)
+        assert main._probe_connection(failing) == (False, "Connection refused")
+
+
+class TestMainEntryPoint:
+    """Test command-line entry point."""
+    
+    @patch('main.DatabaseBackupApp')
+    def test_no_action_prints_help_without_app(self, mock_app):
+        """Test that running without a command prints help and never builds the app."""
+        with patch('sys.argv', ['main.py', '--verbose']), patch('builtins.print'):
+            with patch.object(main.build_parser(), 'print_help') as mock_help:
+                main.main()
+        
+        mock_help.assert_called_once()
+        mock_app.assert_not_called()
+
+
+class TestShipBackup:
+    """Test shipping finished backups to their destinations."""
+    
+    def test_ftp_and_s3_uploads_overlap(self):
+        """Test that the S3 upload runs while the FTP upload is in progress."""
+        app = DatabaseBackupApp.__new__(DatabaseBackupApp)
+        app.ftp_service, app.s3_service = Mock(), Mock()
+        s3_started = threading.Event()
+        
+        def upload_files_to_ftp(file_paths):
+            assert s3_started.wait(timeout=5)
+            return {file_path: True for file_path in file_paths}
+        
+        def upload_files_to_s3(file_paths):
+            s3_started.set()
+            return {file_path: True for file_path in file_paths}
+        
+        app.upload_files_to_ftp = Mock(side_effect=upload_files_to_ftp)
+        app.upload_files_to_s3 = Mock(side_effect=upload_files_to_s3)
+        
+        app._ship_backups(["/tmp/a.dump", "/tmp/b.dump"])
+        
+        app.upload_files_to_ftp.assert_called_once_with(["/tmp/a.dump", "/tmp/b.dump"])
+        app.upload_files_to_s3.assert_called_once_with(["/tmp/a.dump", "/tmp/b.dump"])
+    
+    def test_ftp_upload_notifications_sent_together(self):
+        """Test that the FTP upload notifications of a batch go to Telegram in one call."""
+        app = DatabaseBackupApp.__new__(DatabaseBackupApp)
+        app.ftp_service = MagicMock(is_connected=False)
+        app.ftp_service.upload_files.return_value = {"/tmp/a.dump": True, "/tmp/b.dump": False}
+        app.telegram_service, app.view = Mock(), Mock()
+        
+        app.upload_files_to_ftp(["/tmp/a.dump", "/tmp/b.dump"])
+        
+        app.telegram_service.notify_ftp_uploads.assert_called_once_with({"a.dump": True, "b.dump": False})
+        app.telegram_service.notify_ftp_upload.assert_not_called()
+    
+    def _streaming_app(self, keep_local_copy):
+        """App that streams backups to FTP with S3 also configured."""
+        app = DatabaseBackupApp.__new__(DatabaseBackupApp)
+        app.backup_config = Mock(stream_uploads=True, keep_local_copy=keep_local_copy)
+        app.ftp_service = MagicMock(is_connected=False)
+        app.s3_service, app.telegram_service, app.view = Mock(), None, Mock()
+        app.logger = Mock()
+        app.backup_manager = Mock()
+        app.backup_manager.controllers = {'pg': Mock(supports_streaming=True)}
+        app.upload_files_to_s3 = Mock()
+        return app
+    
+    def test_streamed_backup_local_copy_uploaded_to_s3(self):
+        """Test that a streamed backup's local copy still reaches S3."""
+        app = self._streaming_app(keep_local_copy=True)
+        app.backup_manager.backup_database.return_value = Mock(is_successful=True, backup_file_path="/tmp/a.dump")
+        
+        assert app.backup_database('pg') is True
+        
+        app.upload_files_to_s3.assert_called_once_with(["/tmp/a.dump"])
+    
+    def test_streaming_without_local_copy_warns_about_s3(self):
+        """Test that S3 combined with streaming and no local copy is reported."""
+        app = self._streaming_app(keep_local_copy=False)
+        
+        app._check_destinations()
+        
+        app.logger.warning.assert_called_once()
+        
+        app = self._streaming_app(keep_local_copy=True)
+        app._check_destinations()
+        app.logger.warning.assert_not_called()
@@ -2,12 +2,13 @@
 Unit tests for models.
 """
 import unittest
+import pytest
 from datetime import datetime
 from pathlib import Path
 
 from models.database_config import (
     DatabaseType, DatabaseConfig, MongoDBConfig, PostgreSQLConfig,
-    BackupConfig, FTPConfig, TelegramConfig
+    BackupConfig, FTPConfig, S3Config, TelegramConfig
 )
 from models.backup_result import (
     BackupResult, BackupStatus, BackupSummary
@@ -32,6 +33,12 @@ class TestDatabaseConfig:
         assert config.username is None
         assert config.password is None
     
+    def test_database_type_is_string(self):
+        """Test that database types format and compare as their plain values."""
+        assert DatabaseType.MONGODB == "mongodb"
+        assert f"{DatabaseType.POSTGRESQL}_testdb" == "postgresql_testdb"
+        assert BackupStatus.SUCCESS == "success"
+    
     def test_mongodb_config_with_auth(self):
         """Test MongoDB configuration with authentication."""
         config = MongoDBConfig(
@@ -73,6 +80,17 @@ class TestDatabaseConfig:
         assert config.username == "user"
         assert config.password == "pass"
     
+    def test_extra_flags(self):
+        """Test that additional_params are flattened into command-line flags once."""
+        config = PostgreSQLConfig(
+            host="localhost",
+            database="testdb",
+            additional_params={"verbose": True, "quiet": False, "compress": 6}
+        )
+        
+        assert config.extra_flags == ("--verbose", "--compress", "6")
+        assert config.extra_flags is config.extra_flags
+    
     def test_database_config_validation(self):
         """Test database configuration validation."""
         with self.assertRaises(ValueError):
@@ -104,6 +122,37 @@ class TestDatabaseConfig:
         with self.assertRaises(ValueError):
             BackupConfig(backup_dir="", retention_days=7)
     
+    def test_backup_config_compression_level(self):
+        """Test compression level validation."""
+        assert BackupConfig(backup_dir="/tmp", compression_level=9).compression_level == 9
+        with pytest.raises(ValueError, match="Compression level"):
+            BackupConfig(backup_dir="/tmp", compression_level=0)
+        assert BackupConfig(backup_dir="/tmp", compression_level=19).compression_level == 19
+        with pytest.raises(ValueError, match="for gzip"):
+            BackupConfig(backup_dir="/tmp", compression_level=12, compressor="gzip")
+        with pytest.raises(ValueError, match="Compression threads"):
+            BackupConfig(backup_dir="/tmp", compression_threads=0)
+        with pytest.raises(ValueError, match="Max parallel backups"):
+            BackupConfig(backup_dir="/tmp", max_parallel_backups=0)
+        assert BackupConfig(backup_dir="/tmp").compressor == "auto"
+        with pytest.raises(ValueError, match="Compressor"):
+            BackupConfig(backup_dir="/tmp", compressor="xz")
+    
+    def test_backup_config_dump_options(self):
+        """Test PostgreSQL dump format and parallelism options."""
+        config = BackupConfig(backup_dir="/tmp", pg_format="directory", parallel_jobs=4)
+        
+        assert config.pg_format == "directory"
+        assert config.parallel_jobs == 4
+        assert BackupConfig(backup_dir="/tmp").pg_format == "custom"
+        assert BackupConfig(backup_dir="/tmp", pg_format="copy").pg_format == "copy"
+        
+        with pytest.raises(ValueError):
+            BackupConfig(backup_dir="/tmp", pg_format="tar")
+        
+        with pytest.raises(ValueError):
+            BackupConfig(backup_dir="/tmp", parallel_jobs=0)
+    
     def test_ftp_config_creation(self):
         """Test FTP configuration creation."""
         config = FTPConfig(
@@ -146,6 +195,16 @@ class TestDatabaseConfig:
         )
         
         assert config.enabled is False
+    
+    def test_s3_config_validation(self):
+        """Test S3 configuration validation."""
+        assert S3Config(bucket="backups").prefix == ""
+        
+        with pytest.raises(ValueError, match="S3 bucket is required"):
+            S3Config(bucket="")
+        
+        with pytest.raises(ValueError, match="S3 max concurrency must be at least 1"):
+            S3Config(bucket="backups", max_concurrency=0)
 
 
 class TestBackupResult:
@@ -200,6 +259,38 @@ class TestBackupResult:
         assert result.is_successful is False
         assert result.error_message == "Connection failed"
     
+    def test_backup_result_finalize(self):
+        """Test that finalize records the end time and caches duration and outcome."""
+        start_time = datetime(2024, 1, 1, 12, 0, 0)
+        result = BackupResult(
+            backup_id="test_123",
+            database_type="mongodb",
+            database_name="testdb",
+            status=BackupStatus.SUCCESS,
+            start_time=start_time
+        )
+        
+        result.finalize(datetime(2024, 1, 1, 12, 0, 30))
+        
+        assert result.end_time == datetime(2024, 1, 1, 12, 0, 30)
+        assert result.duration_seconds == 30.0
+        assert result.is_successful is True
+        assert result.to_dict()['duration_seconds'] == 30.0
+    
+    def test_backup_result_has_no_instance_dict(self):
+        """Test that results use slots so a long backup history stays compact."""
+        result = BackupResult(
+            backup_id="test_123",
+            database_type="mongodb",
+            database_name="testdb",
+            status=BackupStatus.SUCCESS,
+            start_time=datetime.now()
+        )
+        
+        assert not hasattr(result, '__dict__')
+        with pytest.raises(AttributeError):
+            result.unknown_field = True
+    
     def test_backup_result_to_dict(self):
         """Test backup result serialization."""
         start_time = datetime.now()
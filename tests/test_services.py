@@ -2,14 +2,20 @@
 Unit tests for services.
 """
 import pytest
+import io
 import tempfile
 import os
+import socket
 from unittest.mock import Mock, patch, MagicMock
 from pathlib import Path
+from datetime import datetime, timezone
 
-from models.database_config import FTPConfig, TelegramConfig
-from services.ftp_service import FTPService
+from models.database_config import FTPConfig, S3Config, TelegramConfig
+from services.ftp_service import FTPService, STREAM_BLOCK_SIZE, UPLOAD_BLOCK_SIZE, DOWNLOAD_BLOCK_SIZE
+from services.s3_service import S3Service, MULTIPART_CHUNK_SIZE
 from services.telegram_service import TelegramService
+from services.chunk_store import ChunkStore
+import services.chunk_store as chunk_store
 
 
 class TestFTPService:
@@ -45,6 +51,7 @@ class TestFTPService:
         mock_ftp.connect.assert_called_once_with("ftp.example.com", 21)
         mock_ftp.login.assert_called_once_with("testuser", "testpass")
         mock_ftp.cwd.assert_called_once_with("/backup")
+        mock_ftp.sock.setsockopt.assert_called_once_with(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
     
     @patch('services.ftp_service.FTP')
     def test_connect_failure(self, mock_ftp_class):
@@ -91,12 +98,38 @@ class TestFTPService:
         assert self.ftp_service._connection is None
     
     @patch('services.ftp_service.FTP')
-    def test_upload_file_success(self, mock_ftp_class):
-        """Test successful file upload."""
+    def test_keepalive(self, mock_ftp_class):
+        """Test that keepalive sends NOOP on a live session."""
         mock_ftp = Mock()
         mock_ftp_class.return_value = mock_ftp
         self.ftp_service.connect()
         
+        assert self.ftp_service.keepalive() is True
+        
+        mock_ftp.voidcmd.assert_called_once_with("NOOP")
+        assert mock_ftp.login.call_count == 1
+    
+    @patch('services.ftp_service.FTP')
+    def test_keepalive_reconnects_dropped_session(self, mock_ftp_class):
+        """Test that keepalive logs in again when the server dropped the session."""
+        stale_ftp, fresh_ftp = Mock(), Mock()
+        stale_ftp.voidcmd.side_effect = EOFError()
+        mock_ftp_class.side_effect = [stale_ftp, fresh_ftp]
+        self.ftp_service.connect()
+        
+        assert self.ftp_service.keepalive() is True
+        
+        stale_ftp.close.assert_called_once()
+        fresh_ftp.login.assert_called_once()
+        assert self.ftp_service._connection is fresh_ftp
+    
+    @patch('services.ftp_service.FTP')
+    def test_upload_file_success(self, mock_ftp_class):
+        """Test that plain FTP uploads hand the file to sendfile on the data socket."""
+        mock_ftp = MagicMock()
+        mock_ftp_class.return_value = mock_ftp
+        self.ftp_service.connect()
+        
         # Create a temporary file
         with tempfile.NamedTemporaryFile(delete=False) as temp_file:
             temp_file.write(b"test content")
@@ -106,10 +139,71 @@ class TestFTPService:
             result = self.ftp_service.upload_file(temp_file_path, "remote_file.tar.gz")
             
             assert result is True
-            mock_ftp.storbinary.assert_called_once()
+            mock_ftp.transfercmd.assert_called_once_with('STOR remote_file.tar.gz')
+            data_socket = mock_ftp.transfercmd.return_value.__enter__.return_value
+            data_socket.sendfile.assert_called_once()
+            mock_ftp.voidresp.assert_called_once()
+            mock_ftp.storbinary.assert_not_called()
         finally:
             os.unlink(temp_file_path)
     
+    @patch('services.ftp_service.FTP')
+    def test_upload_files_parallel_sessions(self, mock_ftp_class):
+        """Test that a batch is spread over extra sessions that are closed afterwards."""
+        sessions = [MagicMock() for _ in range(3)]
+        mock_ftp_class.side_effect = sessions
+        self.ftp_config.max_connections = 3
+        self.ftp_service.connect()
+        
+        temp_paths = []
+        for _ in range(4):
+            with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+                temp_paths.append(temp_file.name)
+        
+        try:
+            results = self.ftp_service.upload_files(temp_paths)
+        finally:
+            for path in temp_paths:
+                os.unlink(path)
+        
+        assert results == {path: True for path in temp_paths}
+        assert sum(session.transfercmd.call_count for session in sessions) == 4
+        for extra_session in sessions[1:]:
+            extra_session.login.assert_called_once()
+            extra_session.quit.assert_called_once()
+        sessions[0].quit.assert_not_called()
+    
+    @patch('services.ftp_service.FTP_TLS')
+    def test_upload_file_tls(self, mock_ftp_tls_class):
+        """Test that TLS uploads go through storbinary in large blocks."""
+        mock_ftp = MagicMock()
+        mock_ftp_tls_class.return_value = mock_ftp
+        self.ftp_config.ssl_enabled = True
+        self.ftp_service.connect()
+        
+        with tempfile.NamedTemporaryFile() as temp_file:
+            result = self.ftp_service.upload_file(temp_file.name, "remote_file.tar.gz")
+        
+        assert result is True
+        mock_ftp.storbinary.assert_called_once()
+        assert mock_ftp.storbinary.call_args[1]['blocksize'] == UPLOAD_BLOCK_SIZE
+        mock_ftp.transfercmd.assert_not_called()
+    
+    @patch('services.ftp_service.FTP')
+    def test_upload_stream_success(self, mock_ftp_class):
+        """Test uploading a stream in large blocks."""
+        mock_ftp = Mock()
+        mock_ftp_class.return_value = mock_ftp
+        self.ftp_service.connect()
+        stream = io.BytesIO(b"dump data")
+        
+        result = self.ftp_service.upload_stream(stream, "backup.archive.zst")
+        
+        assert result is True
+        mock_ftp.storbinary.assert_called_once_with(
+            'STOR backup.archive.zst', stream, blocksize=STREAM_BLOCK_SIZE
+        )
+    
     @patch('services.ftp_service.FTP')
     def test_upload_file_not_connected(self, mock_ftp_class):
         """Test file upload without connection."""
@@ -127,6 +221,7 @@ class TestFTPService:
         result = self.ftp_service.upload_file("/nonexistent/file.txt")
         
         assert result is False
+        mock_ftp.transfercmd.assert_not_called()
     
     @patch('services.ftp_service.FTP')
     def test_download_file_success(self, mock_ftp_class):
@@ -141,6 +236,7 @@ class TestFTPService:
             
             assert result is True
             mock_ftp.retrbinary.assert_called_once()
+            assert mock_ftp.retrbinary.call_args[1]['blocksize'] == DOWNLOAD_BLOCK_SIZE
     
     @patch('services.ftp_service.FTP')
     def test_list_files_success(self, mock_ftp_class):
@@ -149,17 +245,58 @@ class TestFTPService:
         mock_ftp_class.return_value = mock_ftp
         self.ftp_service.connect()
         
-        # Mock LIST response
-        mock_ftp.retrlines.side_effect = lambda cmd, callback: [
-            callback("drwxr-xr-x 2 user group 4096 Jan 1 12:00 backup1.tar.gz"),
-            callback("drwxr-xr-x 2 user group 4096 Jan 1 12:00 backup2.tar.gz")
-        ]
+        mock_ftp.nlst.return_value = ["backup1.tar.gz", "/backup/backup 2.tar.gz", "notes.txt"]
         
         files = self.ftp_service.list_files()
         
-        assert len(files) == 2
-        assert "backup1.tar.gz" in files
-        assert "backup2.tar.gz" in files
+        assert files == ["backup1.tar.gz", "backup 2.tar.gz", "notes.txt"]
+        assert self.ftp_service.list_files("*.tar.gz") == ["backup1.tar.gz", "backup 2.tar.gz"]
+    
+    @patch('services.ftp_service.FTP')
+    def test_list_files_empty_directory(self, mock_ftp_class):
+        """Test that a 550 reply to NLST is treated as an empty directory."""
+        from ftplib import error_perm
+        mock_ftp = Mock()
+        mock_ftp_class.return_value = mock_ftp
+        mock_ftp.nlst.side_effect = error_perm("550 No files found")
+        self.ftp_service.connect()
+        
+        assert self.ftp_service.list_files() == []
+    
+    @patch('services.ftp_service.FTP')
+    def test_cleanup_old_files_uses_mlsd(self, mock_ftp_class):
+        """Test that cleanup reads modification times from one MLSD listing."""
+        mock_ftp = Mock()
+        mock_ftp_class.return_value = mock_ftp
+        mock_ftp.mlsd.return_value = [
+            ("old.dump", {"type": "file", "modify": "20200101120000"}),
+            ("new.dump", {"type": "file", "modify": datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S.123")}),
+            ("notes.txt", {"type": "file", "modify": "20200101120000"}),
+            ("archive.dump", {"type": "dir", "modify": "20200101120000"})
+        ]
+        self.ftp_service.connect()
+        
+        deleted = self.ftp_service.cleanup_old_files(retention_days=7)
+        
+        assert deleted == ["old.dump"]
+        mock_ftp.delete.assert_called_once_with("old.dump")
+        mock_ftp.voidcmd.assert_not_called()
+    
+    @patch('services.ftp_service.FTP')
+    def test_cleanup_old_files_falls_back_to_mdtm(self, mock_ftp_class):
+        """Test that cleanup asks MDTM per file when the server lacks MLSD."""
+        from ftplib import error_perm
+        mock_ftp = Mock()
+        mock_ftp_class.return_value = mock_ftp
+        mock_ftp.mlsd.side_effect = error_perm("500 Unknown command")
+        mock_ftp.nlst.return_value = ["old.dump"]
+        mock_ftp.voidcmd.return_value = "213 20200101120000"
+        self.ftp_service.connect()
+        
+        deleted = self.ftp_service.cleanup_old_files(retention_days=7)
+        
+        assert deleted == ["old.dump"]
+        mock_ftp.voidcmd.assert_called_once_with("MDTM old.dump")
     
     @patch('services.ftp_service.FTP')
     def test_delete_file_success(self, mock_ftp_class):
@@ -187,6 +324,134 @@ class TestFTPService:
             mock_disconnect.assert_called_once()
 
 
+@patch('services.s3_service.BotoConfig', Mock())
+@patch('services.s3_service.TransferConfig')
+@patch('services.s3_service.boto3')
+class TestS3Service:
+    """Test S3 service."""
+    
+    def test_upload_file(self, mock_boto3, mock_transfer_config):
+        """Test that files are uploaded under the prefix with the multipart transfer config."""
+        s3_service = S3Service(S3Config(bucket="backups", prefix="/db/", max_concurrency=4))
+        
+        with tempfile.NamedTemporaryFile(suffix=".dump") as temp_file:
+            result = s3_service.upload_file(temp_file.name)
+        
+        assert result is True
+        mock_transfer_config.assert_called_once()
+        assert mock_transfer_config.call_args[1]['multipart_chunksize'] == MULTIPART_CHUNK_SIZE
+        assert mock_transfer_config.call_args[1]['max_concurrency'] == 4
+        mock_boto3.client.return_value.upload_fileobj.assert_called_once()
+        args, kwargs = mock_boto3.client.return_value.upload_fileobj.call_args
+        assert args[0].name == temp_file.name
+        assert args[1:] == ("backups", f"db/{os.path.basename(temp_file.name)}")
+        assert kwargs == {"Config": mock_transfer_config.return_value}
+    
+    def test_download_file(self, mock_boto3, mock_transfer_config):
+        """Test that downloads share the multipart transfer config."""
+        s3_service = S3Service(S3Config(bucket="backups"))
+        local_path = os.path.join(tempfile.mkdtemp(), "restore", "backup.dump")
+        
+        assert s3_service.download_file("db/backup.dump", local_path) is True
+        
+        mock_boto3.client.return_value.download_file.assert_called_once_with(
+            "backups", "db/backup.dump", local_path, Config=mock_transfer_config.return_value
+        )
+        assert os.path.isdir(os.path.dirname(local_path))
+    
+    @patch('services.s3_service.DELETE_BATCH_SIZE', 2)
+    def test_cleanup_old_files_batches_deletes(self, mock_boto3, mock_transfer_config):
+        """Test that expired backups are deleted in batches and failed keys are not reported."""
+        from datetime import datetime, timedelta, timezone
+        old = datetime.now(timezone.utc) - timedelta(days=30)
+        new = datetime.now(timezone.utc)
+        client = mock_boto3.client.return_value
+        client.get_paginator.return_value.paginate.return_value = [
+            {"Contents": [{"Key": "db/a.dump", "Size": 1, "LastModified": old},
+                          {"Key": "db/b.dump", "Size": 1, "LastModified": old}]},
+            {"Contents": [{"Key": "db/c.dump", "Size": 1, "LastModified": old},
+                          {"Key": "db/d.dump", "Size": 1, "LastModified": new},
+                          {"Key": "db/notes.txt", "Size": 1, "LastModified": old}]}
+        ]
+        client.delete_objects.side_effect = [{}, {"Errors": [{"Key": "db/c.dump", "Message": "Access denied"}]}]
+        s3_service = S3Service(S3Config(bucket="backups", prefix="db"))
+        
+        deleted = s3_service.cleanup_old_files(retention_days=7)
+        
+        assert deleted == ["db/a.dump", "db/b.dump"]
+        client.get_paginator.return_value.paginate.assert_called_once_with(
+            Bucket="backups", Prefix="db/", PaginationConfig={"PageSize": 1000}
+        )
+        assert client.delete_objects.call_count == 2
+        assert client.delete_objects.call_args_list[1][1]["Delete"]["Objects"] == [{"Key": "db/c.dump"}]
+    
+    def test_list_files_reads_every_page(self, mock_boto3, mock_transfer_config):
+        """Test that listings are not truncated to the first page."""
+        now = datetime.now()
+        client = mock_boto3.client.return_value
+        client.get_paginator.return_value.paginate.return_value = [
+            {"Contents": [{"Key": f"backup{i}.dump", "Size": i, "LastModified": now} for i in range(1000)]},
+            {"Contents": [{"Key": "backup1000.dump", "Size": 1000, "LastModified": now}]},
+            {}
+        ]
+        s3_service = S3Service(S3Config(bucket="backups"))
+        
+        files = s3_service.list_files("*.dump")
+        
+        assert len(files) == 1001
+        assert files[-1] == {"key": "backup1000.dump", "size": 1000, "last_modified": now}
+        client.get_paginator.assert_called_once_with("list_objects_v2")
+    
+    def test_list_files_matches_pattern(self, mock_boto3, mock_transfer_config):
+        """Test that patterns match object names like FTP listings, with the literal part sent as the prefix."""
+        now = datetime.now()
+        client = mock_boto3.client.return_value
+        client.get_paginator.return_value.paginate.return_value = [
+            {"Contents": [{"Key": f"db/{name}", "Size": 1, "LastModified": now}
+                          for name in ("backup_app_1.dump", "backup_app_1.dump.chunks.json", "backup_app_2.sql.gz")]}
+        ]
+        s3_service = S3Service(S3Config(bucket="backups", prefix="db"))
+        
+        files = s3_service.list_files("backup_app_*.dump")
+        
+        assert [f["key"] for f in files] == ["db/backup_app_1.dump"]
+        client.get_paginator.return_value.paginate.assert_called_once_with(
+            Bucket="backups", Prefix="db/backup_app_", PaginationConfig={"PageSize": 1000}
+        )
+    
+    def test_upload_files(self, mock_boto3, mock_transfer_config):
+        """Test that several files are uploaded with a result per path."""
+        s3_service = S3Service(S3Config(bucket="backups"))
+        
+        with tempfile.NamedTemporaryFile(suffix=".dump") as first, \
+             tempfile.NamedTemporaryFile(suffix=".dump") as second:
+            outcomes = s3_service.upload_files([first.name, "/nonexistent/backup.dump", second.name])
+        
+        assert outcomes == {first.name: True, "/nonexistent/backup.dump": False, second.name: True}
+        assert mock_boto3.client.return_value.upload_fileobj.call_count == 2
+    
+    def test_upload_missing_file(self, mock_boto3, mock_transfer_config):
+        """Test that uploading a missing file fails without calling S3."""
+        s3_service = S3Service(S3Config(bucket="backups"))
+        
+        assert s3_service.upload_file("/nonexistent/backup.dump") is False
+        mock_boto3.client.return_value.upload_fileobj.assert_not_called()
+    
+    def test_upload_file_failure(self, mock_boto3, mock_transfer_config):
+        """Test S3 upload failure."""
+        mock_boto3.client.return_value.upload_fileobj.side_effect = Exception("Access denied")
+        s3_service = S3Service(S3Config(bucket="backups"))
+        
+        with tempfile.NamedTemporaryFile() as temp_file:
+            assert s3_service.upload_file(temp_file.name) is False
+    
+    def test_requires_boto3(self, mock_boto3, mock_transfer_config):
+        """Test that S3 uploads without boto3 installed are rejected."""
+        with patch('services.s3_service.boto3', None):
+            with pytest.raises(ValueError, match="boto3"):
+                S3Service(S3Config(bucket="backups"))
+
+
 class TestTelegramService:
     """Test Telegram service."""
     
@@ -204,7 +469,22 @@ class TestTelegramService:
         assert self.telegram_service.base_url == f"https://api.telegram.org/bot{self.telegram_config.bot_token}"
         assert self.telegram_service.logger is not None
     
-    @patch('services.telegram_service.requests.post')
+    def test_session_pools_connections(self):
+        """Test that API requests share a pooled, retrying adapter."""
+        adapter = self.telegram_service.session.get_adapter(self.telegram_service.base_url)
+        
+        assert adapter._pool_maxsize == 16
+        assert adapter.max_retries.total == 3
+    
+    @patch('services.telegram_service.requests.Session.close')
+    def test_context_manager_closes_session(self, mock_close):
+        """Test that leaving the context releases the session."""
+        with TelegramService(self.telegram_config) as telegram_service:
+            assert telegram_service.session is not None
+        
+        mock_close.assert_called_once()
+    
+    @patch('services.telegram_service.requests.Session.post')
     def test_send_message_success(self, mock_post):
         """Test successful message sending."""
         mock_response = Mock()
@@ -219,7 +499,7 @@ class TestTelegramService:
         assert call_args[1]['data']['chat_id'] == "-1001234567890"
         assert call_args[1]['data']['text'] == "Test message"
     
-    @patch('services.telegram_service.requests.post')
+    @patch('services.telegram_service.requests.Session.post')
     def test_send_message_failure(self, mock_post):
         """Test message sending failure."""
         mock_post.side_effect = Exception("Network error")
@@ -237,7 +517,7 @@ class TestTelegramService:
         
         assert result is True  # Should return True when disabled
     
-    @patch('services.telegram_service.requests.post')
+    @patch('services.telegram_service.requests.Session.post')
     def test_notify_backup_started(self, mock_post):
         """Test backup started notification."""
         mock_response = Mock()
@@ -253,7 +533,7 @@ class TestTelegramService:
         assert "testdb" in call_args[1]['data']['text']
         assert "mongodb" in call_args[1]['data']['text']
     
-    @patch('services.telegram_service.requests.post')
+    @patch('services.telegram_service.requests.Session.post')
     def test_notify_backup_completed_success(self, mock_post):
         """Test successful backup completion notification."""
         mock_response = Mock()
@@ -281,7 +561,7 @@ class TestTelegramService:
         assert "Backup Completed - Success" in call_args[1]['data']['text']
         assert "testdb" in call_args[1]['data']['text']
     
-    @patch('services.telegram_service.requests.post')
+    @patch('services.telegram_service.requests.Session.post')
     def test_notify_backup_completed_failure(self, mock_post):
         """Test failed backup completion notification."""
         mock_response = Mock()
@@ -309,7 +589,7 @@ class TestTelegramService:
         assert "Backup Completed - Failed" in call_args[1]['data']['text']
         assert "Connection failed" in call_args[1]['data']['text']
     
-    @patch('services.telegram_service.requests.post')
+    @patch('services.telegram_service.requests.Session.post')
     def test_notify_backup_summary(self, mock_post):
         """Test backup summary notification."""
         mock_response = Mock()
@@ -337,7 +617,7 @@ class TestTelegramService:
         assert "Total Backups: 10" in call_args[1]['data']['text']
         assert "Success Rate: 80.0%" in call_args[1]['data']['text']
     
-    @patch('services.telegram_service.requests.post')
+    @patch('services.telegram_service.requests.Session.post')
     def test_notify_ftp_upload(self, mock_post):
         """Test FTP upload notification."""
         mock_response = Mock()
@@ -352,7 +632,7 @@ class TestTelegramService:
         assert "FTP Upload - Uploaded" in call_args[1]['data']['text']
         assert "backup.tar.gz" in call_args[1]['data']['text']
     
-    @patch('services.telegram_service.requests.post')
+    @patch('services.telegram_service.requests.Session.post')
     def test_notify_cleanup(self, mock_post):
         """Test cleanup notification."""
         mock_response = Mock()
@@ -368,7 +648,7 @@ class TestTelegramService:
         assert "Deleted Files: 5" in call_args[1]['data']['text']
         assert "Space Freed: 1024.50 MB" in call_args[1]['data']['text']
     
-    @patch('services.telegram_service.requests.post')
+    @patch('services.telegram_service.requests.Session.post')
     def test_notify_error(self, mock_post):
         """Test error notification."""
         mock_response = Mock()
@@ -384,7 +664,7 @@ class TestTelegramService:
         assert "Database connection failed" in call_args[1]['data']['text']
         assert "Backup operation" in call_args[1]['data']['text']
     
-    @patch('services.telegram_service.requests.get')
+    @patch('services.telegram_service.requests.Session.get')
     def test_test_connection_success(self, mock_get):
         """Test successful connection test."""
         mock_response = Mock()
@@ -400,7 +680,7 @@ class TestTelegramService:
         assert result is True
         mock_get.assert_called_once()
     
-    @patch('services.telegram_service.requests.get')
+    @patch('services.telegram_service.requests.Session.get')
     def test_test_connection_failure(self, mock_get):
         """Test connection test failure."""
         mock_get.side_effect = Exception("Network error")
@@ -408,4 +688,148 @@ class TestTelegramService:
         result = self.telegram_service.test_connection()
         
         assert result is False
+    
+    @patch('services.telegram_service.requests.Session.post')
+    def test_send_message_background(self, mock_post):
+        """Test that background messages are sent by the worker before flush returns."""
+        telegram_service = TelegramService(self.telegram_config, background=True)
+        
+        assert telegram_service.send_message("First") is True
+        assert telegram_service.send_message("Second") is True
+        telegram_service.flush()
+        
+        sent = "\n\n".join(call[1]['data']['text'] for call in mock_post.call_args_list)
+        assert sent == "First\n\nSecond"
+    
+    @patch('services.telegram_service.requests.Session.post')
+    def test_completions_sent_as_digest(self, mock_post):
+        """Test that background completion notifications are held and sent as one digest."""
+        from models.backup_result import BackupResult, BackupStatus
+        telegram_service = TelegramService(self.telegram_config, background=True)
+        results = [
+            BackupResult(backup_id=f"backup_{i}", database_type="mongodb", database_name=f"db{i}",
+                         status=BackupStatus.SUCCESS, start_time=datetime.now(), end_time=datetime.now())
+            for i in range(3)
+        ]
+        
+        for result in results:
+            assert telegram_service.notify_backup_completed(result) is True
+        assert telegram_service._digest != []
+        telegram_service.flush()
+        
+        mock_post.assert_called_once()
+        text = mock_post.call_args[1]['data']['text']
+        assert text.count("\n\n---\n\n") == 2
+        assert "db0" in text and "db2" in text
+    
+    @patch('services.telegram_service.requests.Session.post')
+    def test_send_many(self, mock_post):
+        """Test that several messages are posted concurrently with per-message results."""
+        mock_post.side_effect = lambda url, data, timeout: (
+            Mock() if data['text'] != "Bad" else Mock(raise_for_status=Mock(side_effect=Exception("Bad Request")))
+        )
+        
+        results = self.telegram_service.send_many(["One", "Bad", "Three"])
+        
+        assert results == [True, False, True]
+        assert sorted(call[1]['data']['text'] for call in mock_post.call_args_list) == ["Bad", "One", "Three"]
+    
+    @patch('services.telegram_service.requests.Session.post')
+    def test_send_many_background_posts_directly(self, mock_post):
+        """Test that send_many posts in the background instead of only queueing."""
+        telegram_service = TelegramService(self.telegram_config, background=True)
+        
+        results = telegram_service.send_many(["One", "Two"])
+        
+        assert results == [True, True]
+        assert mock_post.call_count == 2
+        assert telegram_service._queue is None
+    
+    @patch('services.telegram_service.TelegramService.send_many', return_value=[True, True])
+    def test_notify_ftp_uploads(self, mock_send_many):
+        """Test that FTP upload notifications for several files are sent as one batch."""
+        self.telegram_service.notify_ftp_uploads({"a.dump": True, "b.dump": False})
+        
+        messages = mock_send_many.call_args[0][0]
+        assert "FTP Upload - Uploaded" in messages[0] and "a.dump" in messages[0]
+        assert "FTP Upload - Failed" in messages[1] and "b.dump" in messages[1]
+    
+    @patch('services.telegram_service.DIGEST_LIMIT', 2)
+    @patch('services.telegram_service.TelegramService.send_message', return_value=True)
+    def test_digest_sent_when_full(self, mock_send):
+        """Test that a full digest is sent without waiting for a flush."""
+        telegram_service = TelegramService(self.telegram_config, background=True)
+        
+        telegram_service._add_to_digest("First")
+        mock_send.assert_not_called()
+        telegram_service._add_to_digest("Second")
+        
+        mock_send.assert_called_once_with("First\n\n---\n\nSecond")
+        assert telegram_service._digest == []
+    
+    def test_batch_respects_length_limit(self):
+        """Test that batching joins messages only up to Telegram's length limit."""
+        long_message = "x" * 4093
+        pending = [("a", "HTML"), ("b", "HTML"), (long_message, "HTML"), ("c", "Markdown")]
+        
+        batches = TelegramService._batch(pending)
+        
+        assert batches == [("a\n\nb", "HTML"), (long_message, "HTML"), ("c", "Markdown")]
+
 
+class TestChunkStore:
+    """Test content-addressed chunk store."""
+    
+    def setup_method(self):
+        """Setup test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = ChunkStore(os.path.join(self.temp_dir, "chunks"))
+    
+    def _write(self, name, data):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+    
+    def _chunk_files(self):
+        return [path for path in Path(self.store.root_dir).glob("*/*")]
+    
+    @patch.object(chunk_store, 'fastcdc', None)
+    @patch.object(chunk_store, 'AVG_CHUNK_SIZE', 4)
+    def test_store_and_reassemble(self):
+        """Test that a stored file is reassembled byte for byte."""
+        manifest_path = self.store.store(self._write("backup_1.dump", b"abcdefghij"))
+        output_path = os.path.join(self.temp_dir, "restored")
+        
+        self.store.reassemble(manifest_path, output_path)
+        
+        with open(output_path, "rb") as f:
+            assert f.read() == b"abcdefghij"
+        assert len(self._chunk_files()) == 3
+    
+    @patch.object(chunk_store, 'fastcdc', None)
+    @patch.object(chunk_store, 'AVG_CHUNK_SIZE', 4)
+    def test_store_deduplicates_repeated_chunks(self):
+        """Test that chunks already in the store are not stored again."""
+        self.store.store(self._write("backup_1.dump", b"aaaabbbb"))
+        self.store.store(self._write("backup_2.dump", b"aaaabbbbcccc"))
+        
+        assert len(self._chunk_files()) == 3
+    
+    @patch.object(chunk_store, 'GC_GRACE_SECONDS', -1)
+    def test_collect_garbage(self):
+        """Test that only unreferenced chunks are deleted."""
+        kept = self.store.store(self._write("backup_1.dump", b"kept"))
+        self.store.store(self._write("backup_2.dump", b"dropped"))
+        
+        assert self.store.collect_garbage([kept]) == 1
+        self.store.reassemble(kept, os.path.join(self.temp_dir, "restored"))
+    
+    def test_reassemble_missing_chunk(self):
+        """Test that a missing chunk fails the reassembly."""
+        manifest_path = self.store.store(self._write("backup_1.dump", b"data"))
+        for chunk_file in self._chunk_files():
+            chunk_file.unlink()
+        
+        with pytest.raises(ValueError, match="is missing"):
+            self.store.reassemble(manifest_path, os.path.join(self.temp_dir, "restored"))
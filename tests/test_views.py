@@ -8,7 +8,7 @@ from unittest.mock import Mock, patch
 from datetime import datetime
 from pathlib import Path
 
-from models.backup_result import BackupResult, BackupStatus, BackupSummary
+from models.backup_result import BackupResult, BackupStatus, BackupSummary, BackupFileInfo
 from views.backup_view import BackupView, BackupReportView
 
 
@@ -142,19 +142,22 @@ class TestBackupView:
     @patch('builtins.print')
     def test_display_backup_files(self, mock_print):
         """Test display backup files."""
+        now = datetime.now().timestamp()
         files = [
-            {
-                'filename': 'backup1.tar.gz',
-                'size_bytes': 1024,
-                'created_time': datetime.now(),
-                'modified_time': datetime.now()
-            },
-            {
-                'filename': 'backup2.tar.gz',
-                'size_bytes': 2048,
-                'created_time': datetime.now(),
-                'modified_time': datetime.now()
-            }
+            BackupFileInfo(
+                filename='backup1.tar.gz',
+                path='/tmp/backup1.tar.gz',
+                size_bytes=1024,
+                created_timestamp=now,
+                modified_timestamp=now
+            ),
+            BackupFileInfo(
+                filename='backup2.tar.gz',
+                path='/tmp/backup2.tar.gz',
+                size_bytes=2048,
+                created_timestamp=now,
+                modified_timestamp=now
+            )
         ]
         
         self.view.display_backup_files(files)
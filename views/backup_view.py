@@ -6,7 +6,7 @@ from datetime import datetime
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 
-from models.backup_result import BackupResult, BackupSummary
+from models.backup_result import BackupResult, BackupSummary, BackupFileInfo
 
 
 class BackupView:
@@ -53,7 +53,7 @@ class BackupView:
                 print(f"  Error: {result.error_message}")
         
         if self.verbose:
-            self.logger.info(f"Backup result: {result.status.value} for {result.database_name}")
+            self.logger.info(f"Backup result: {result.status} for {result.database_name}")
     
     def display_backup_summary(self, summary: BackupSummary):
         """Display backup summary."""
@@ -110,7 +110,7 @@ class BackupView:
         print(f"Total files deleted: {total_deleted}")
         print("="*60)
     
-    def display_backup_files(self, files: List[Dict[str, Any]], controller_id: Optional[str] = None):
+    def display_backup_files(self, files: List[BackupFileInfo], controller_id: Optional[str] = None):
         """Display list of backup files."""
         if not files:
             print("No backup files found.")
@@ -126,11 +126,11 @@ class BackupView:
         print("-"*80)
         
         for file_info in files:
-            size_mb = file_info['size_bytes'] / (1024 * 1024)
-            created_str = file_info['created_time'].strftime('%Y-%m-%d %H:%M:%S')
-            modified_str = file_info['modified_time'].strftime('%Y-%m-%d %H:%M:%S')
+            size_mb = file_info.size_bytes / (1024 * 1024)
+            created_str = file_info.created_time.strftime('%Y-%m-%d %H:%M:%S')
+            modified_str = file_info.modified_time.strftime('%Y-%m-%d %H:%M:%S')
             
-            print(f"{file_info['filename']:<40} {size_mb:<12.2f} {created_str:<20} {modified_str:<20}")
+            print(f"{file_info.filename:<40} {size_mb:<12.2f} {created_str:<20} {modified_str:<20}")
         
         print("="*80)
     